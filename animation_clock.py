@@ -0,0 +1,110 @@
+import time
+from PySide6.QtCore import QObject, QTimer
+
+class Animation:
+    """Une animation inscrite auprès de l'horloge"""
+    __slots__ = ('callback', 'interval', 'next_due', 'active', 'owner')
+
+    def __init__(self, callback, interval, owner=None):
+        self.callback = callback
+        self.interval = interval
+        self.next_due = time.monotonic() + interval / 1000.0
+        self.active = True
+        self.owner = owner  # Clé du propriétaire dans AnimationClock._owned
+
+class AnimationClock(QObject):
+    def __init__(self, parent=None):
+        """
+        Horloge unique qui cadence toutes les animations de l'interface.
+
+        Chaque animation fournit un callback appelé à sa propre cadence ; le callback retourne
+        False quand l'animation est terminée, elle est alors désinscrite. Le timer s'arrête
+        dès qu'il n'y a plus rien à animer et ne se réveille qu'à la cadence la plus rapide.
+        """
+        super().__init__(parent)
+        self._animations = []
+        # Animations de chaque propriétaire : une seule connexion à destroyed par objet, quel que
+        # soit le nombre d'animations qu'il inscrit au fil du temps
+        self._owned = {}
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    def register(self, callback, interval, owner=None):
+        """
+        Inscrit une animation.
+
+        :param callback: Fonction appelée à chaque échéance ; retourne False pour s'arrêter
+        :param interval: Cadence souhaitée en millisecondes
+        :param owner: QObject dont la destruction désinscrit l'animation
+        :return: Animation (à passer à unregister / set_interval)
+        """
+        animation = Animation(callback, interval, None if owner is None else id(owner))
+        self._animations.append(animation)
+        if owner is not None:
+            owned = self._owned.get(animation.owner)
+            if owned is None:
+                owned = self._owned[animation.owner] = []
+                owner.destroyed.connect(lambda *args, key=animation.owner: self._owner_destroyed(key))
+            owned.append(animation)
+        self._reschedule()
+        return animation
+
+    def _owner_destroyed(self, key):
+        for animation in self._owned.pop(key, []):
+            self.unregister(animation)
+
+    def unregister(self, animation):
+        """Désinscrit une animation (sans effet si elle l'est déjà)"""
+        if animation is None or not animation.active:
+            return
+        animation.active = False
+        self._animations.remove(animation)
+        owned = self._owned.get(animation.owner)
+        if owned is not None:
+            owned.remove(animation)
+        self._reschedule()
+
+    def set_interval(self, animation, interval):
+        """Change la cadence d'une animation inscrite"""
+        if animation is None or not animation.active or animation.interval == interval:
+            return
+        animation.interval = interval
+        animation.next_due = min(animation.next_due, time.monotonic() + interval / 1000.0)
+        self._reschedule()
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def active_count(self):
+        return len(self._animations)
+
+    def _reschedule(self):
+        if not self._animations:
+            self._timer.stop()
+            return
+        interval = min(animation.interval for animation in self._animations)
+        if self._timer.interval() != interval or not self._timer.isActive():
+            self._timer.start(interval)
+
+    def _tick(self):
+        now = time.monotonic()
+        for animation in list(self._animations):
+            if not animation.active or animation.next_due > now:
+                continue
+            animation.next_due = now + animation.interval / 1000.0
+            try:
+                keep = animation.callback()
+            except RuntimeError:
+                # Objet Qt sous-jacent déjà détruit
+                keep = False
+            if keep is False:
+                self.unregister(animation)
+
+_shared_clock = None
+
+def shared_clock():
+    """Retourne l'horloge commune de l'application (créée au premier appel)"""
+    global _shared_clock
+    if _shared_clock is None:
+        _shared_clock = AnimationClock()
+    return _shared_clock
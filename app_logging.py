@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import argparse
+import threading
+import logging.handlers
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+_listener = None
+_verbose_prompts = False
+
+class StructuredFormatter(logging.Formatter):
+    """Format texte habituel suivi des champs structurés : ... message clé=valeur"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par événement (pour les outils d'analyse de logs)"""
+
+    def format(self, record):
+        event = {
+            'ts': round(record.created, 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            event.update(fields)
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, interval=1.0):
+        """
+        Échantillonne les événements fréquents : au plus un par intervalle et par clé.
+
+        Seuls les enregistrements portant une clé (extra=sampled('clé')) sont concernés ; le
+        nombre d'événements écartés depuis le dernier est ajouté au suivant (champ suppressed).
+
+        :param interval: Intervalle minimal entre deux événements d'une même clé (secondes)
+        """
+        super().__init__()
+        self.interval = interval
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            fields = dict(getattr(record, 'fields', None) or {})
+            fields['suppressed'] = suppressed
+            record.fields = fields
+        return True
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Dépose l'enregistrement brut dans la file : la mise en forme du message (arguments %)
+    se fait dans le thread d'écriture, pas dans le thread appelant (interface, callback audio).
+    """
+
+    def prepare(self, record):
+        return record
+
+def sampled(key, **fields):
+    """Argument extra pour un événement échantillonné : logger.debug("...", extra=sampled('audio.status'))"""
+    return {'sample': key, 'fields': fields}
+
+def with_fields(**fields):
+    """Argument extra pour des champs structurés : logger.info("...", extra=with_fields(durée_ms=12))"""
+    return {'fields': fields}
+
+def verbose_prompts():
+    """Affichage complet des prompts par les chaînes LangChain (désactivé par défaut)"""
+    return _verbose_prompts
+
+def setup_logging(argv=None, level=None, log_file=None, json_format=None, verbose=None, sample_interval=1.0):
+    """
+    Configure les logs de l'application : écriture non bloquante via une file et un thread dédié.
+
+    Les options viennent des arguments (--log-level, --log-file, --log-json, --verbose-prompts),
+    puis des variables d'environnement ARYADAI_LOG_LEVEL, ARYADAI_LOG_FILE, ARYADAI_LOG_FORMAT=json
+    et ARYADAI_VERBOSE_PROMPTS=1.
+
+    :return: Le QueueListener démarré (arrêté automatiquement à la sortie)
+    """
+    global _listener, _verbose_prompts
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--log-level', default=None)
+    parser.add_argument('--log-file', default=None)
+    parser.add_argument('--log-json', action='store_true', default=None)
+    parser.add_argument('--verbose-prompts', action='store_true', default=None)
+    options, _ = parser.parse_known_args((argv or [])[1:])
+
+    level = (level or options.log_level or os.getenv('ARYADAI_LOG_LEVEL') or 'INFO').upper()
+    log_file = log_file or options.log_file or os.getenv('ARYADAI_LOG_FILE')
+    if json_format is None:
+        json_format = options.log_json or os.getenv('ARYADAI_LOG_FORMAT', '').lower() == 'json'
+    if verbose is None:
+        verbose = options.verbose_prompts or os.getenv('ARYADAI_VERBOSE_PROMPTS', '') in ('1', 'true', 'oui')
+    _verbose_prompts = bool(verbose)
+
+    formatter = JsonFormatter() if json_format else StructuredFormatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024,
+                                                             backupCount=3, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _stop_listener()
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_interval))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def _stop_listener():
+    """Vide la file et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(_stop_listener)
@@ -1,6 +1,5 @@
 import speech_recognition as sr
 import pyttsx3
-import sounddevice as sd
 import numpy as np
 import scipy.io.wavfile as wav
 import tempfile
@@ -8,23 +7,43 @@ import os
 from queue import Queue
 import threading
 import wave
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from audio_meter import AudioMeter
+from startup_profiler import timed
+from turn_tracer import shared_tracer
+from app_logging import sampled
+
+logger = logging.getLogger(__name__)
+
+# Locales de reconnaissance vocale associées aux modèles de langue (noms des fichiers .pkl)
+STT_LOCALES = {
+    'français': 'fr-FR',
+    'anglais': 'en-US',
+    'espagnol': 'es-ES',
+    'arabe': 'ar-MA',
+    'russe': 'ru-RU',
+}
+DEFAULT_STT_LOCALE = 'fr-FR'
+
+def to_pcm16(audio_data):
+    """Convertit un signal float (-1..1) en PCM 16 bits"""
+    return np.int16(audio_data * 32767)
 
 class AudioHandler:
-    def __init__(self):
+    def __init__(self, language_detector=None):
         # Initialiser le recognizer avec des paramètres optimisés
         self.recognizer = sr.Recognizer()
         self.recognizer.energy_threshold = 300
         self.recognizer.dynamic_energy_threshold = True
         self.recognizer.pause_threshold = 0.8
 
-        # Initialiser le moteur de synthèse vocale
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
-        self.engine.setProperty('volume', 1.0)
-
-        # Configuration des voix par langue
+        # Le moteur de synthèse vocale (lent à créer) est initialisé par init_tts,
+        # en arrière-plan au démarrage ou au plus tard à la première synthèse
+        self.engine = None
         self.voices = {}
-        self.setup_voices()
+        self._tts_lock = threading.Lock()
+        self._speech_lock = threading.Lock()  # Une seule synthèse à la fois sur le moteur
 
         # Configuration de l'enregistrement
         self.sample_rate = 44100
@@ -33,6 +52,37 @@ class AudioHandler:
         self.audio_queue = Queue()
         self.audio_buffer = []
 
+        # Mesures audio calculées une fois par bloc dans le callback
+        self.meter = AudioMeter(sample_rate=self.sample_rate)
+
+        # Routage de la reconnaissance selon la langue détectée
+        self.language_detector = language_detector
+        self.detection_duration = 1.0  # Secondes analysées au début de l'enregistrement
+        self.detection_confidence_threshold = 0.6
+        self.last_detected_language = None
+        self.tracer = shared_tracer()
+
+    @timed('AudioHandler.init_tts')
+    def init_tts(self):
+        """Crée le moteur de synthèse vocale et associe les voix aux langues (une seule fois)"""
+        with self._tts_lock:
+            if self.engine is not None:
+                return self.engine
+            engine = pyttsx3.init()
+            engine.setProperty('rate', 150)
+            engine.setProperty('volume', 1.0)
+            self.engine = engine
+            self.setup_voices()
+            return engine
+
+    def probe_input_device(self):
+        """Vérifie qu'un micro est disponible et retourne son nom"""
+        # sounddevice charge PortAudio à l'import : seulement quand on a besoin du micro
+        import sounddevice as sd
+        device = sd.query_devices(kind='input')
+        return device['name']
+
+    @timed('AudioHandler.setup_voices')
     def setup_voices(self):
         """Configure les voix disponibles pour chaque langue"""
         voices = self.engine.getProperty('voices')
@@ -61,21 +111,26 @@ class AudioHandler:
         """Change la voix en fonction de la langue"""
         if language in self.voices:
             self.engine.setProperty('voice', self.voices[language])
-            print(f"Voix configurée pour la langue : {language}")
+            logger.debug("Voix configurée pour la langue : %s", language)
         else:
-            print(f"Aucune voix spécifique trouvée pour la langue : {language}")
+            logger.debug("Aucune voix spécifique trouvée pour la langue : %s", language)
 
     def start_recording(self):
         """Démarre l'enregistrement audio"""
         self.recording = True
         self.audio_buffer = []
+        self.meter.reset()
 
         def callback(indata, frames, time, status):
             if status:
-                print(f"Status: {status}")
+                # Appelé à chaque bloc : un seul message par seconde au plus
+                logger.warning("Statut du flux audio : %s", status, extra=sampled('audio.status'))
             if self.recording:
-                self.audio_buffer.append(indata.copy())
+                block = indata.copy()
+                self.audio_buffer.append(block)
+                self.meter.process_block(block)
 
+        import sounddevice as sd
         self.stream = sd.InputStream(
             samplerate=self.sample_rate,
             channels=self.channels,
@@ -84,43 +139,46 @@ class AudioHandler:
         )
         self.stream.start()
 
-    def stop_recording(self):
-        """Arrête l'enregistrement et retourne le texte transcrit"""
+    def stop_recording(self, turn=None):
+        """Arrête l'enregistrement et retourne le texte transcrit (étapes tracées dans turn)"""
         self.recording = False
         if hasattr(self, 'stream'):
             self.stream.stop()
             self.stream.close()
 
         if self.audio_buffer:
-            audio_data = np.concatenate(self.audio_buffer, axis=0)
-            audio_data = np.int16(audio_data * 32767)
+            return self.transcribe(self.collect_buffer(), turn=turn)
+        return "Aucun audio enregistré"
+
+    def transcribe(self, audio_data, turn=None):
+        """Transcrit un signal float32 (détection de langue puis reconnaissance, étapes tracées dans turn)"""
+        if len(audio_data):
+            stt_span = self.tracer.start_span(turn, 'stt')
+            with self.tracer.span(turn, 'stt.detect') as span:
+                locales = self.select_locales(audio_data)
+                if span is not None:
+                    span.attributes['locales'] = locales
+            audio_data = to_pcm16(audio_data)
 
             temp_file = None
             try:
-                temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-                temp_file.close()
+                with self.tracer.span(turn, 'stt.wav'):
+                    temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+                    temp_file.close()
 
-                with wave.open(temp_file.name, 'wb') as wf:
-                    wf.setnchannels(self.channels)
-                    wf.setsampwidth(2)
-                    wf.setframerate(self.sample_rate)
-                    wf.writeframes(audio_data.tobytes())
+                    with wave.open(temp_file.name, 'wb') as wf:
+                        wf.setnchannels(self.channels)
+                        wf.setsampwidth(2)
+                        wf.setframerate(self.sample_rate)
+                        wf.writeframes(audio_data.tobytes())
 
                 with sr.AudioFile(temp_file.name) as source:
                     self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
                     audio = self.recognizer.record(source)
-                    try:
-                        text = self.recognizer.recognize_google(
-                            audio,
-                            language='fr-FR',
-                            show_all=False
-                        )
-                        return text
-                    except sr.UnknownValueError:
-                        return "Je n'ai pas compris l'audio"
-                    except sr.RequestError as e:
-                        return f"Erreur de service: {e}"
+                    with self.tracer.span(turn, 'stt.recognize'):
+                        return self.recognize(audio, locales)
             finally:
+                self.tracer.end_span(stt_span)
                 if temp_file and os.path.exists(temp_file.name):
                     try:
                         os.unlink(temp_file.name)
@@ -128,21 +186,112 @@ class AudioHandler:
                         pass
         return "Aucun audio enregistré"
 
-    def speak(self, text, language='Français', callback=None):
+    def collect_buffer(self):
+        """Assemble les blocs enregistrés en un seul signal float32"""
+        return np.concatenate(self.audio_buffer, axis=0)
+
+    def select_locales(self, audio_data):
+        """Choisit la ou les locales de reconnaissance à partir de la première seconde d'audio"""
+        self.last_detected_language = None
+        if self.language_detector is None:
+            return [DEFAULT_STT_LOCALE]
+
+        head = audio_data[:int(self.detection_duration * self.sample_rate)]
+        ranking = self.language_detector.rank_languages_from_signal(
+            head.reshape(-1), self.sample_rate, max_duration=self.detection_duration
+        )
+        ranking = [entry for entry in ranking if entry[0] in STT_LOCALES]
+        if not ranking:
+            return [DEFAULT_STT_LOCALE]
+
+        language, _, probability = ranking[0]
+        self.last_detected_language = language
+        logger.debug("Langue détectée : %s (confiance %.2f)", language, probability)
+
+        # Confiance faible : on tente les deux langues les plus probables
+        if probability < self.detection_confidence_threshold and len(ranking) > 1:
+            return [STT_LOCALES[language], STT_LOCALES[ranking[1][0]]]
+        return [STT_LOCALES[language]]
+
+    def recognize(self, audio, locales):
+        """Transcrit l'audio ; avec plusieurs locales, les essaie en parallèle et garde la meilleure"""
+        if len(locales) == 1:
+            try:
+                return self.recognizer.recognize_google(
+                    audio,
+                    language=locales[0],
+                    show_all=False
+                )
+            except sr.UnknownValueError:
+                return "Je n'ai pas compris l'audio"
+            except sr.RequestError as e:
+                return f"Erreur de service: {e}"
+
+        with ThreadPoolExecutor(max_workers=len(locales)) as executor:
+            results = list(executor.map(lambda locale: self._recognize_candidate(audio, locale), locales))
+
+        candidates = [result for result in results if isinstance(result, tuple)]
+        if candidates:
+            text, confidence, locale = max(candidates, key=lambda x: x[1])
+            logger.debug("Transcription retenue : %s (confiance %.2f)", locale, confidence)
+            for language, language_locale in STT_LOCALES.items():
+                if language_locale == locale:
+                    self.last_detected_language = language
+            return text
+
+        errors = [result for result in results if isinstance(result, sr.RequestError)]
+        if errors:
+            return f"Erreur de service: {errors[0]}"
+        return "Je n'ai pas compris l'audio"
+
+    def _recognize_candidate(self, audio, locale):
+        """Retourne (texte, confiance, locale), l'exception de service, ou None si rien n'est reconnu"""
+        try:
+            response = self.recognizer.recognize_google(audio, language=locale, show_all=True)
+        except sr.RequestError as e:
+            return e
+        except sr.UnknownValueError:
+            return None
+
+        alternatives = response.get('alternative', []) if isinstance(response, dict) else []
+        alternatives = [alt for alt in alternatives if alt.get('transcript')]
+        if not alternatives:
+            return None
+        best = max(alternatives, key=lambda alt: alt.get('confidence', 0.0))
+        # Google ne renseigne pas toujours la confiance : valeur neutre par défaut
+        return best['transcript'], best.get('confidence', 0.5), locale
+
+    def speak(self, text, language='Français', callback=None, turn=None):
         """Synthétise et joue le texte en parole avec la voix appropriée"""
         def speak_thread():
-            self.set_voice_for_language(language)
-            self.engine.say(text)
-            self.engine.runAndWait()
+            self.say(text, language, turn)
             if callback:
                 callback()
 
         threading.Thread(target=speak_thread).start()
 
+    def say(self, text, language='Français', turn=None):
+        """Synthétise et joue le texte dans le thread appelant (bloquant jusqu'à la fin de la lecture)"""
+        with self._speech_lock:
+            tts_span = self.tracer.start_span(turn, 'tts', language=language)
+            first_audio = self.tracer.start_span(turn, 'tts.first_audio')
+            self.init_tts()
+            self.set_voice_for_language(language)
+            # Début de la première phrase prononcée
+            token = self.engine.connect('started-utterance', lambda name: self.tracer.end_span(first_audio))
+            try:
+                self.engine.say(text)
+                self.engine.runAndWait()
+            finally:
+                self.engine.disconnect(token)
+                self.tracer.end_span(tts_span)
+
     def get_audio_level(self):
         """Retourne le niveau audio actuel pour l'animation"""
-        if self.recording and self.audio_buffer:
-            current_buffer = self.audio_buffer[-1]
-            rms = np.sqrt(np.mean(current_buffer ** 2))
-            return min(1.0, (rms * 15) ** 0.5)
+        if self.recording:
+            return self.meter.snapshot().level
         return 0.0
+
+    def get_meter_snapshot(self):
+        """Retourne le dernier instantané des mesures (niveau, enveloppe, bandes)"""
+        return self.meter.snapshot()
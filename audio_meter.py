@@ -0,0 +1,106 @@
+import numpy as np
+from collections import namedtuple
+
+# Instantané publié par le callback audio et lu par l'interface
+MeterSnapshot = namedtuple('MeterSnapshot', ['rms', 'level', 'envelope', 'bands', 'sequence'])
+
+class AudioMeter:
+    def __init__(self, sample_rate=44100, num_bands=40, min_freq=80.0, max_freq=8000.0,
+                 attack=0.6, release=0.15, floor_db=-70.0):
+        """
+        Calcule les mesures audio (RMS, enveloppe lissée, spectre par bandes) une fois par bloc.
+
+        :param sample_rate: Fréquence d'échantillonnage du flux
+        :param num_bands: Nombre de bandes de fréquence (espacées logarithmiquement)
+        :param min_freq: Fréquence basse de la première bande
+        :param max_freq: Fréquence haute de la dernière bande
+        :param attack: Coefficient de lissage quand le niveau monte
+        :param release: Coefficient de lissage quand le niveau descend
+        :param floor_db: Niveau (dB) en dessous duquel une bande est considérée vide
+        """
+        self.sample_rate = sample_rate
+        self.num_bands = num_bands
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+        self.attack = attack
+        self.release = release
+        self.floor_db = floor_db
+        # Caches dépendant de la taille de bloc (fenêtre de Hann et bornes des bandes)
+        self._windows = {}
+        self._band_edges = {}
+        self.reset()
+
+    def reset(self):
+        """Remet les mesures à zéro (début d'un nouvel enregistrement)"""
+        self._envelope = 0.0
+        self._smoothed_bands = np.zeros(self.num_bands)
+        self._publish(MeterSnapshot(0.0, 0.0, 0.0, self._frozen(self._smoothed_bands), 0))
+
+    def snapshot(self):
+        """Retourne le dernier instantané publié (lecture sans verrou)"""
+        return self._snapshot
+
+    def process_block(self, block):
+        """Met à jour les mesures à partir d'un bloc de la carte son (appelé depuis le callback)"""
+        samples = np.asarray(block, dtype=np.float32)
+        if samples.ndim > 1:
+            samples = samples.mean(axis=1)
+        if samples.size == 0:
+            return
+
+        rms = float(np.sqrt(np.mean(samples ** 2)))
+        level = min(1.0, (rms * 15) ** 0.5)
+        self._envelope = self._smooth(self._envelope, level)
+
+        bands = self._band_levels(samples)
+        coefficients = np.where(bands > self._smoothed_bands, self.attack, self.release)
+        self._smoothed_bands = self._smoothed_bands + coefficients * (bands - self._smoothed_bands)
+
+        previous = self._snapshot
+        self._publish(MeterSnapshot(rms, level, self._envelope,
+                                    self._frozen(self._smoothed_bands), previous.sequence + 1))
+
+    def _publish(self, snapshot):
+        # L'affectation d'une référence est atomique : le lecteur voit l'ancien ou le nouvel instantané
+        self._snapshot = snapshot
+
+    def _smooth(self, current, target):
+        coefficient = self.attack if target > current else self.release
+        return current + coefficient * (target - current)
+
+    def _band_levels(self, samples):
+        """Spectre par bandes normalisé entre 0 et 1"""
+        n = samples.size
+        window = self._windows.get(n)
+        if window is None:
+            window = np.hanning(n).astype(np.float32)
+            # Normalisation pour qu'une sinusoïde pleine échelle donne environ 0 dB
+            window *= 2.0 / max(window.sum(), 1e-9)
+            self._windows[n] = window
+
+        power = np.abs(np.fft.rfft(samples * window)) ** 2
+        lo, hi = self._edges(n, power.size)
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        band_power = (cumulative[hi] - cumulative[lo]) / (hi - lo)
+
+        db = 10.0 * np.log10(band_power + 1e-12)
+        return np.clip((db - self.floor_db) / -self.floor_db, 0.0, 1.0)
+
+    def _edges(self, n, n_bins):
+        edges = self._band_edges.get(n)
+        if edges is None:
+            frequencies = np.geomspace(self.min_freq, min(self.max_freq, self.sample_rate / 2), self.num_bands + 1)
+            bins = np.clip(np.round(frequencies * n / self.sample_rate).astype(int), 0, n_bins - 1)
+            lo = bins[:-1]
+            # Chaque bande couvre au moins un bin (les petites tailles de bloc partagent les bins graves)
+            hi = np.minimum(np.maximum(bins[1:], lo + 1), n_bins)
+            lo = np.minimum(lo, hi - 1)
+            edges = (lo, hi)
+            self._band_edges[n] = edges
+        return edges
+
+    @staticmethod
+    def _frozen(array):
+        array = np.array(array, copy=True)
+        array.flags.writeable = False
+        return array
@@ -0,0 +1,316 @@
+import os
+import time
+import wave
+import shutil
+import itertools
+import tempfile
+import contextlib
+import numpy as np
+from benchmarks.harness import benchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 1024  # Taille de bloc typique du callback sounddevice
+
+def synthetic_speech(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """Signal voisé synthétique et reproductible : harmoniques d'une fondamentale variable, syllabes, bruit"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    signal = 0.3 * voiced * syllables + 0.02 * rng.standard_normal(t.size)
+    return (signal / np.abs(signal).max() * 0.8).astype(np.float32)
+
+def write_wav(signal, sample_rate=SAMPLE_RATE):
+    """Écrit le signal dans un WAV 16 bits temporaire (supprimé à la fin du processus)"""
+    temp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+    temp_file.close()
+    with wave.open(temp_file.name, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(np.int16(signal * 32767).tobytes())
+    _temp_files.append(temp_file.name)
+    return temp_file.name
+
+def recorded_blocks(seconds):
+    """Blocs (BLOCK_SIZE, 1) tels que les accumule le callback d'enregistrement"""
+    signal = synthetic_speech(seconds)
+    usable = len(signal) // BLOCK_SIZE * BLOCK_SIZE
+    return [block.reshape(-1, 1).copy() for block in np.split(signal[:usable], usable // BLOCK_SIZE)]
+
+_temp_files = []
+_shared = {}
+
+def cleanup():
+    for path in _temp_files:
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+    if 'ubm_dir' in _shared:
+        shutil.rmtree(_shared['ubm_dir'], ignore_errors=True)
+    if 'registry_dir' in _shared:
+        shutil.rmtree(_shared['registry_dir'], ignore_errors=True)
+
+def _detector():
+    if 'detector' not in _shared:
+        from language_detector import LanguageDetector
+        _shared['detector'] = LanguageDetector(models_dir=os.path.join(ROOT, "models_langues"))
+        if not _shared['detector'].models:
+            raise OSError("aucun modèle dans models_langues")
+    return _shared['detector']
+
+def _qt_app():
+    if 'app' not in _shared:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PySide6.QtWidgets import QApplication
+        _shared['app'] = QApplication.instance() or QApplication([])
+    return _shared['app']
+
+@benchmark("language_detector.preprocess_audio (wav 3 s)")
+def bench_preprocess_audio():
+    detector = _detector()
+    path = write_wav(synthetic_speech(3))
+    return lambda: detector.preprocess_audio(path)
+
+@benchmark("language_detector.detect_language (wav 3 s)")
+def bench_detect_language():
+    detector = _detector()
+    path = write_wav(synthetic_speech(3))
+    return lambda: detector.detect_language(path)
+
+@benchmark("language_detector.rank_languages_from_signal (1 s)")
+def bench_rank_from_signal():
+    detector = _detector()
+    signal = synthetic_speech(1)
+    return lambda: detector.rank_languages_from_signal(signal, SAMPLE_RATE, max_duration=1)
+
+@benchmark("audio_handler.collect_buffer + to_pcm16 (10 s)")
+def bench_buffer_to_pcm16():
+    from audio_handler import AudioHandler, to_pcm16
+    handler = AudioHandler()
+    handler.audio_buffer = recorded_blocks(10)
+    return lambda: to_pcm16(handler.collect_buffer())
+
+@benchmark("audio_handler.get_audio_level")
+def bench_get_audio_level():
+    from audio_handler import AudioHandler
+    handler = AudioHandler()
+    handler.recording = True
+    handler.meter.process_block(recorded_blocks(1)[10])
+    return handler.get_audio_level
+
+@benchmark("audio_meter.process_block (1024 échantillons)")
+def bench_meter_process_block():
+    from audio_meter import AudioMeter
+    meter = AudioMeter(sample_rate=SAMPLE_RATE)
+    blocks = recorded_blocks(1)
+    position = [0]
+
+    def run():
+        meter.process_block(blocks[position[0] % len(blocks)])
+        position[0] += 1
+    return run
+
+@benchmark("RecordingAnimation.paintEvent (offscreen)")
+def bench_recording_animation_paint():
+    _qt_app()
+    from PySide6.QtGui import QPixmap
+    from frame import RecordingAnimation
+    from audio_meter import AudioMeter
+
+    class MeterSource:
+        # Remplace AudioHandler : mêmes attributs lus par l'animation
+        recording = True
+
+        def __init__(self):
+            self.meter = AudioMeter(sample_rate=SAMPLE_RATE)
+
+        def get_meter_snapshot(self):
+            return self.meter.snapshot()
+
+    source = MeterSource()
+    blocks = recorded_blocks(1)
+    animation = RecordingAnimation()
+    animation.set_audio_handler(source)
+    target = QPixmap(animation.size())
+    position = [0]
+
+    def run():
+        # Un tick complet : nouveau bloc, niveaux des barres, rendu de tout le widget
+        source.meter.process_block(blocks[position[0] % len(blocks)])
+        position[0] += 1
+        animation._levels = animation._compute_levels()[1]
+        animation.render(target)
+    return run
+
+@benchmark("ChatHistoryModel reveal (pas + rendu, 2000 caractères)")
+def bench_chat_reveal():
+    _qt_app()
+    from PySide6.QtCore import QRect
+    from PySide6.QtGui import QPixmap, QPainter
+    from PySide6.QtWidgets import QStyleOptionViewItem
+    from animation_clock import AnimationClock
+    from chat_view import ChatHistoryModel, ChatHistoryView
+
+    model = ChatHistoryModel(clock=AnimationClock())
+    view = ChatHistoryView(model)
+    view.resize(900, 600)
+    words = ("L'intelligence artificielle transforme la manière dont nous communiquons "
+             "et apprenons chaque jour ").split()
+    text = " ".join(words[i % len(words)] for i in range(320))[:2000]
+    model.append_message(text, is_user=False, reveal=True)
+    message = model.message_at(model.rowCount() - 1)
+    index = model.index(model.rowCount() - 1)
+    option = QStyleOptionViewItem()
+    option.rect = QRect(0, 0, 860, view.delegate.sizeHint(option, index).height())
+    target = QPixmap(option.rect.size())
+    step = [0]
+
+    def run():
+        # Avance d'une trame (16 ms) dans la révélation, en bouclant sur le message
+        step[0] = (step[0] + 1) % int(model.MAX_REVEAL_DURATION * 1000 / model.FRAME_INTERVAL)
+        message.revealed = 0
+        message.reveal_started = time.monotonic() - step[0] * model.FRAME_INTERVAL / 1000
+        model._reveal_step()
+        painter = QPainter(target)
+        view.delegate.paint(painter, option, index)
+        painter.end()
+    return run
+
+@benchmark("GeminiAgent.get_response (LLM factice)")
+def bench_get_response():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from gemini_agent import GeminiAgent
+
+    agent = GeminiAgent(llm=FakeListChatModel(responses=["Bonjour, je suis AryadAI."]))
+    devnull = open(os.devnull, 'w')
+    _shared['devnull'] = devnull
+
+    def run():
+        # Avec ARYADAI_VERBOSE_PROMPTS, LangChain imprime le prompt : la sortie est écartée, pas son coût
+        with contextlib.redirect_stdout(devnull):
+            agent.get_response("Bonjour, qui es-tu ?")
+        # Mémoire bornée pour que chaque appel voie le même contexte
+        agent.reset_memory()
+    return run
+
+@benchmark("GeminiAgent.get_response (identité en cache, fournisseur local)")
+def bench_get_response_cached_context():
+    from prompt_cache import ContextCache
+    from gemini_agent import GeminiAgent
+    from benchmarks.stand_in import RecordingChatModel
+
+    llm = RecordingChatModel()
+    agent = GeminiAgent(llm=llm, context_cache=ContextCache(llm.create_context))
+
+    def run():
+        agent.get_response("Bonjour, qui es-tu ?")
+        agent.reset_memory()
+        llm.requests.clear()
+    return run
+
+@benchmark("FaqCache.lookup (question hors FAQ)")
+def bench_faq_lookup():
+    from faq_cache import FaqCache
+    with open(os.path.join(ROOT, "agent_identity.txt"), 'r', encoding='utf-8') as f:
+        faq = FaqCache.from_identity(f.read())
+    # Reformulations reconnues, et questions proches qui demandent autre chose (réponse du LLM)
+    expected = {
+        "Comment t'appelles-tu ?": True,
+        "Tu es qui": True,
+        "Qui a fondé AryadAcademie ?": True,
+        "Que peux-tu faire en Python ?": False,
+        "Quel est ton nom de famille ?": False,
+        "Quelle est ta mission aujourd hui ?": False,
+    }
+    wrong = [question for question, hit in expected.items() if (faq.lookup(question) is not None) != hit]
+    if wrong:
+        raise RuntimeError(f"réponses FAQ inattendues : {wrong}")
+    return lambda: faq.lookup("Peux-tu m'expliquer la différence entre l'apprentissage supervisé et non supervisé ?")
+
+@benchmark("ImagePipeline.process (photo JPEG 4000x3000, sans cache)")
+def bench_image_pipeline():
+    _qt_app()
+    from PySide6.QtGui import QImage, QPainter, QLinearGradient, QColor
+    from image_pipeline import ImagePipeline
+
+    photo = QImage(4000, 3000, QImage.Format_RGB32)
+    gradient = QLinearGradient(0, 0, 4000, 3000)
+    gradient.setColorAt(0, QColor('#E07A5F'))
+    gradient.setColorAt(1, QColor('#3D405B'))
+    painter = QPainter(photo)
+    painter.fillRect(photo.rect(), gradient)
+    painter.end()
+    temp_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+    temp_file.close()
+    photo.save(temp_file.name, 'JPEG', 92)
+    _temp_files.append(temp_file.name)
+
+    pipeline = ImagePipeline(cache_dir=None)
+    return lambda: pipeline.process(temp_file.name, use_cache=False)
+
+def _ubm_dir():
+    # UBM et modèles adaptés dérivés des modèles livrés (trames tirées de chaque GMM)
+    if 'ubm_dir' not in _shared:
+        from gmm_scoring import main as build_ubm
+        directory = tempfile.mkdtemp(prefix="ubm")
+        if build_ubm(['build', '--from-models', os.path.join(ROOT, "models_langues"),
+                      '--output', directory, '--frames', '5000']) != 0:
+            raise OSError("UBM non construit")
+        _shared['ubm_dir'] = directory
+    return _shared['ubm_dir']
+
+@benchmark("LanguageDetector.rank_languages (modèles complets, 5 s de MFCC)")
+def bench_rank_full():
+    detector = _detector()
+    mfcc = detector.preprocess_signal(synthetic_speech(5), SAMPLE_RATE)
+    return lambda: detector.rank_languages(mfcc)
+
+@benchmark("LanguageDetector.rank_languages (UBM 64, top 5, 5 s de MFCC)")
+def bench_rank_ubm():
+    from language_detector import LanguageDetector
+    from gmm_scoring import UbmScorer, load_ubm_models
+    detector = LanguageDetector(models_dir=os.path.join(ROOT, "models_langues"), scoring='full')
+    ubm, models = load_ubm_models(_ubm_dir())
+    detector.ubm_scorer = UbmScorer(ubm, models, top_c=5)
+    mfcc = detector.preprocess_signal(synthetic_speech(5), SAMPLE_RATE)
+    return lambda: detector.rank_languages(mfcc)
+
+@benchmark("ModelRegistry.check (rechargement de modèles avec UBM)")
+def bench_registry_reload_ubm():
+    from gmm_scoring import main as build_ubm
+    from model_registry import ModelRegistry
+    directory = tempfile.mkdtemp(prefix="registry")
+    _shared['registry_dir'] = directory
+    for filename in os.listdir(os.path.join(ROOT, "models_langues")):
+        if filename.endswith('.pkl'):
+            shutil.copy(os.path.join(ROOT, "models_langues", filename), directory)
+    # Deux UBM (tirages différents) construits une fois ; seul le rechargement est mesuré
+    variants = [os.path.join(directory, "ubm_a"), os.path.join(directory, "ubm_b")]
+    shutil.copytree(_ubm_dir(), variants[0])
+    if build_ubm(['build', '--from-models', directory, '--output', variants[1], '--frames', '4000']) != 0:
+        raise OSError("UBM non construit")
+    ubm_dir = os.path.join(directory, "ubm")
+    shutil.copytree(variants[0], ubm_dir)
+    registry = ModelRegistry(directory, watch=False)
+    turns = itertools.cycle([1, 0])
+
+    def swap(variant):
+        # Lien puis renommage : les fichiers servis sont remplacés d'un coup, sans copie
+        for filename in os.listdir(variant):
+            temporary = os.path.join(ubm_dir, filename + ".tmp")
+            os.link(os.path.join(variant, filename), temporary)
+            os.replace(temporary, os.path.join(ubm_dir, filename))
+
+    def run():
+        swap(variants[next(turns)])
+        registry.check(settle=False)
+
+    # Le rechargement d'un autre UBM doit être accepté, pas écarté
+    for _ in range(2):
+        swap(variants[next(turns)])
+        if not registry.check(settle=False):
+            raise RuntimeError(f"rechargement de l'UBM écarté ({registry.rejected} rejet(s))")
+    return run
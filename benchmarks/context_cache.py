@@ -0,0 +1,69 @@
+"""
+Taille et latence des requêtes du mode conversation selon la façon d'envoyer l'identité,
+contre le fournisseur local de benchmarks.stand_in (aucun appel réseau).
+
+    python -m benchmarks.context_cache --turns 10 --latency-per-kb 0.002
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+QUESTIONS = [
+    "Bonjour, qui es-tu ?",
+    "Qui t'a créé ?",
+    "Peux-tu m'expliquer ce qu'est un réseau de neurones ?",
+    "Et la différence avec l'apprentissage profond ?",
+    "Traduis « bonjour » en anglais, s'il te plaît.",
+]
+
+def run_mode(mode, turns, base_latency, seconds_per_kb):
+    from prompt_cache import ContextCache
+    from gemini_agent import GeminiAgent
+    from benchmarks.stand_in import RecordingChatModel
+
+    llm = RecordingChatModel(
+        responses=["Je suis AryadAI, créé par AryadAcademie. " * 4],
+        base_latency=base_latency,
+        seconds_per_kb=seconds_per_kb,
+    )
+    # FAQ désactivée : chaque tour doit atteindre le modèle, sinon les réponses locales (~0 ms) faussent la moyenne
+    with mock.patch.dict(os.environ, {'ARYADAI_PROMPT_CACHE': 'auto' if mode == 'cache' else mode,
+                                      'ARYADAI_FAQ_CACHE': 'off'}):
+        agent = GeminiAgent(llm=llm, context_cache=ContextCache(llm.create_context) if mode == 'cache' else None)
+
+    wall = []
+    for turn in range(turns):
+        start = time.perf_counter()
+        agent.get_response(QUESTIONS[turn % len(QUESTIONS)])
+        wall.append((time.perf_counter() - start) * 1000)
+    return {
+        'bytes': statistics.mean(request['bytes'] for request in llm.requests),
+        'first_bytes': llm.requests[0]['bytes'],
+        'latency_ms': statistics.mean(wall),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Identité complète, compacte ou en cache")
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--base-latency', type=float, default=0.05, help="Latence fixe simulée (s)")
+    parser.add_argument('--latency-per-kb', type=float, default=0.002, help="Latence simulée par Ko envoyé (s)")
+    options = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    logging.disable(logging.INFO)
+    print(f"{'mode':10s} {'octets/requête':>15s} {'1re requête':>12s} {'latence moy.':>13s}")
+    for mode in ('off', 'compact', 'cache'):
+        result = run_mode(mode, options.turns, options.base_latency, options.latency_per_kb)
+        print(f"{mode:10s} {result['bytes']:15.0f} {result['first_bytes']:12d} {result['latency_ms']:10.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import time
+import json
+import platform
+import statistics
+
+# Cas enregistrés par le décorateur benchmark, dans l'ordre de déclaration
+BENCHMARKS = []
+
+class Benchmark:
+    __slots__ = ('name', 'setup')
+
+    def __init__(self, name, setup):
+        self.name = name
+        self.setup = setup
+
+def benchmark(name):
+    """
+    Déclare un cas : la fonction décorée prépare les entrées et retourne la fonction à chronométrer.
+
+    Une ImportError ou OSError pendant la préparation (dépendance absente) fait ignorer le cas.
+    """
+    def decorator(setup):
+        BENCHMARKS.append(Benchmark(name, setup))
+        return setup
+    return decorator
+
+def measure(function, min_round_time=0.05, rounds=7):
+    """
+    Chronomètre une fonction sans argument.
+
+    Le nombre d'appels par tour est calibré pour qu'un tour dure au moins min_round_time ;
+    on retient la médiane et le minimum du temps par appel sur les tours.
+
+    :return: Dictionnaire median_ms, min_ms, max_ms, number, rounds
+    """
+    function()  # Échauffement (caches, imports paresseux)
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_time or number >= 1 << 20:
+            break
+        number = max(number * 2, int(number * min_round_time / max(elapsed, 1e-9)))
+
+    per_call = [elapsed / number]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        per_call.append((time.perf_counter() - start) / number)
+
+    return {
+        'median_ms': statistics.median(per_call) * 1000,
+        'min_ms': min(per_call) * 1000,
+        'max_ms': max(per_call) * 1000,
+        'number': number,
+        'rounds': rounds,
+    }
+
+def machine():
+    """Description de la machine, enregistrée avec la référence"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+def load_baseline(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'machine': machine(), 'results': results}, f, indent=2)
+
+def compare(results, baseline, threshold, min_delta_ms=0.001):
+    """
+    Compare les meilleurs temps (moins sensibles au bruit que la médiane) à la référence.
+
+    :param threshold: Ralentissement relatif toléré
+    :param min_delta_ms: Écart absolu en dessous duquel on ne signale rien (cas très courts)
+    :return: Liste de (nom, temps, temps de référence, rapport, régression)
+    """
+    rows = []
+    reference = baseline['results'] if baseline else {}
+    for name, result in results.items():
+        previous = reference.get(name)
+        if previous is None:
+            rows.append((name, result['min_ms'], None, None, False))
+            continue
+        ratio = result['min_ms'] / max(previous['min_ms'], 1e-9)
+        regression = ratio > 1 + threshold and result['min_ms'] - previous['min_ms'] > min_delta_ms
+        rows.append((name, result['min_ms'], previous['min_ms'], ratio, regression))
+    return rows
@@ -0,0 +1,93 @@
+"""
+Interprétation continue d'un orateur simulé : retard de la pipeline par étapes comparé à un
+traitement strictement en série (chaque énoncé reconnu, traduit puis prononcé avant le suivant).
+
+Reconnaissance, traduction et synthèse sont remplacées par des attentes de durée réaliste
+(aucun appel réseau) ; --speed accélère l'orateur et les étapes d'autant.
+
+    python -m benchmarks.interpreter_pipeline --utterances 12 --speed 4
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.cases import SAMPLE_RATE, synthetic_speech
+
+def speaker(utterances, pause, seed=0):
+    """Énoncés de 1,5 à 3 s séparés de pause secondes de silence ; retourne le signal et les durées"""
+    rng = np.random.default_rng(seed)
+    durations = rng.uniform(1.5, 3.0, utterances)
+    silence = np.zeros(int(pause * SAMPLE_RATE), dtype=np.float32)
+    parts = [silence]
+    for i, duration in enumerate(durations):
+        parts += [synthetic_speech(duration, seed=i), silence]
+    return np.concatenate(parts), durations
+
+def serial_lags(durations, pause, stt, translate, tts):
+    """Retard de chaque énoncé quand chaque étape attend la fin complète de la précédente"""
+    lags, clock, arrival = [], 0.0, pause
+    for duration in durations:
+        ended = arrival + duration + 0.8   # Fin détectée après la pause de fin d'énoncé
+        start = max(clock, ended)
+        speaking = start + stt(duration) + translate(duration)
+        lags.append(speaking - ended)
+        clock = speaking + tts(duration)
+        arrival += duration + pause
+    return lags
+
+def main(argv=None):
+    from interpreter_pipeline import ArraySource, InterpreterPipeline
+    parser = argparse.ArgumentParser(description="Retard de l'interprétation continue, en série ou par étapes")
+    parser.add_argument('--utterances', type=int, default=12)
+    parser.add_argument('--pause', type=float, default=1.0, help="Silence entre deux énoncés (s)")
+    parser.add_argument('--speed', type=float, default=4.0, help="Accélération de l'orateur et des étapes")
+    parser.add_argument('--queue-size', type=int, default=2)
+    parser.add_argument('--stt-workers', type=int, default=2)
+    options = parser.parse_args(argv)
+
+    # Latences en secondes de temps réel, en fonction de la durée de l'énoncé
+    stt = lambda duration: 0.5 + 0.3 * duration
+    translate = lambda duration: 0.9
+    tts = lambda duration: 0.9 * duration
+    signal, durations = speaker(options.utterances, options.pause)
+
+    def simulated(latency):
+        def stage(value, turn):
+            duration = len(value) / SAMPLE_RATE if isinstance(value, np.ndarray) else float(value.split()[-1])
+            time.sleep(latency(duration) / options.speed)
+            return f"énoncé {duration:.3f}"
+        return stage
+
+    logging.disable(logging.INFO)
+    pipeline = InterpreterPipeline(ArraySource(signal, SAMPLE_RATE, speed=options.speed),
+                                   simulated(stt), simulated(translate), simulated(tts),
+                                   queue_size=options.queue_size, stt_workers=options.stt_workers,
+                                   echo_tail=None)  # Synthèse simulée : rien ne revient dans la source
+    start = time.perf_counter()
+    pipeline.start()
+    pipeline.wait()
+    elapsed = (time.perf_counter() - start) * options.speed
+    metrics = pipeline.metrics()
+
+    print(f"{'étape':10s} {'reçus':>6s} {'transmis':>9s} {'perdus':>7s} {'débit/s':>8s} {'occupation':>11s} {'p95':>9s} {'bloquée':>8s}")
+    for name in ('capture', 'vad', 'stt', 'translate', 'tts'):
+        stage = metrics[name]
+        print(f"{name:10s} {stage['received']:6d} {stage['emitted']:9d} {stage['dropped']:7d} "
+              f"{stage['throughput'] / options.speed:8.2f} {stage['utilization'] * 100:10.0f}% "
+              f"{stage['p95_ms'] * options.speed:7.0f}ms {stage['blocked_s'] * options.speed:7.1f}s")
+    lags = sorted(lag * options.speed for lag in pipeline.lags)
+    serial = serial_lags(durations, options.pause, stt, translate, tts)
+    print(f"\nOrateur : {len(signal) / SAMPLE_RATE:.1f} s, interprétation terminée en {elapsed:.1f} s")
+    print(f"Retard par étapes : médiane {lags[len(lags) // 2]:.1f} s, max {lags[-1]:.1f} s ({len(lags)} énoncés)")
+    print(f"Retard en série   : médiane {sorted(serial)[len(serial) // 2]:.1f} s, max {max(serial):.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Charge simulée : N sessions simultanées de tours vocaux et textuels, de la reconnaissance à la réponse.
+
+Chaque session enchaîne des tours séparés d'un temps de réflexion : un tour vocal passe par
+AudioHandler.transcribe (détection de langue réelle, WAV, reconnaissance) puis par l'agent ; un tour
+textuel va directement à l'agent. Les sessions sont servies par un SessionManager. Le service de
+reconnaissance et le LLM sont remplacés par des fournisseurs locaux dont la latence suit une
+distribution (aucun appel réseau, pas de carte son).
+
+Pour chaque nombre de sessions : débit, percentiles de chaque étape (traceur des tours) et point de
+saturation, le premier palier où le débit ne progresse plus ou où le p95 des tours dépasse --slo.
+
+    python -m benchmarks.load_test --sessions 1,2,4,8,16,32 --duration 20
+    python -m benchmarks.load_test --llm-latency lognormal:1.2,0.5 --audio enregistrement.wav
+
+Distributions (secondes) : 0.8, uniform:a,b, normal:moyenne,écart, lognormal:médiane,sigma, exp:moyenne
+"""
+import os
+import sys
+import json
+import time
+import wave
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.cases import SAMPLE_RATE, synthetic_speech
+
+STAGES = ('turn', 'stt', 'stt.detect', 'stt.wav', 'stt.recognize', 'llm', 'faq')
+
+QUESTIONS = [
+    "Peux-tu me résumer les avantages du télétravail ?",
+    "Quelle est la différence entre un virus et une bactérie ?",
+    "Donne-moi une idée de recette rapide pour ce soir.",
+    "Comment fonctionne une pompe à chaleur ?",
+    "Explique-moi la photosynthèse simplement.",
+    "Qui es-tu ?",
+]
+
+def parse_latency(spec, seed=0):
+    """Fonction sans argument qui tire une latence (s) selon spec ; voir la documentation du module"""
+    rng = random.Random(seed)
+    kind, _, values = spec.partition(':')
+    if not values:
+        value = float(kind)
+        return lambda: value
+    params = [float(value) for value in values.split(',')]
+    if kind == 'uniform':
+        return lambda: rng.uniform(*params)
+    if kind == 'normal':
+        return lambda: max(0.0, rng.gauss(*params))
+    if kind == 'lognormal':
+        median, sigma = params
+        return lambda: rng.lognormvariate(np.log(median), sigma)
+    if kind == 'exp':
+        return lambda: rng.expovariate(1 / params[0])
+    raise ValueError(f"distribution inconnue : {spec}")
+
+def offline_recognizer(latency):
+    """Recognizer dont recognize_google attend une latence tirée au lieu d'appeler le service"""
+    import speech_recognition as sr
+
+    class OfflineRecognizer(sr.Recognizer):
+        def recognize_google(self, audio_data, key=None, language="fr-FR", show_all=False, **kwargs):
+            time.sleep(latency())
+            transcript = random.choice(QUESTIONS[:-1])
+            if show_all:
+                return {'alternative': [{'transcript': transcript, 'confidence': 0.9}]}
+            return transcript
+
+    recognizer = OfflineRecognizer()
+    recognizer.energy_threshold = 300
+    recognizer.dynamic_energy_threshold = True
+    recognizer.pause_threshold = 0.8
+    return recognizer
+
+def read_wav(path):
+    """Signal float32 mono à SAMPLE_RATE d'un WAV 16 bits enregistré"""
+    with wave.open(path, 'rb') as wf:
+        channels, rate = wf.getnchannels(), wf.getframerate()
+        signal = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    signal = signal.reshape(-1, channels).mean(axis=1).astype(np.float32) / 32768
+    if rate != SAMPLE_RATE:
+        import librosa
+        signal = librosa.resample(signal, orig_sr=rate, target_sr=SAMPLE_RATE)
+    return signal
+
+def utterances(paths, count=8):
+    """Énoncés rejoués : enregistrements donnés, sinon parole synthétique de 1,5 à 4 s"""
+    if paths:
+        return [read_wav(path) for path in paths]
+    rng = np.random.default_rng(0)
+    return [synthetic_speech(rng.uniform(1.5, 4.0), seed=i) for i in range(count)]
+
+def build_detector(kind, workers, sound):
+    """Détecteur partagé par les sessions, déjà sollicité une fois (imports, compilation) avant les mesures"""
+    if kind == 'none':
+        return None
+    if kind == 'service':
+        from detector_service import DetectorService
+        service = DetectorService(os.path.join(ROOT, "models_langues"), workers=workers)
+        service.warm_up(signal=True)
+        return service
+    from language_detector import LanguageDetector
+    detector = LanguageDetector(models_dir=os.path.join(ROOT, "models_langues"))
+    if not detector.models:
+        return None
+    detector.rank_languages_from_signal(sound, SAMPLE_RATE)
+    return detector
+
+class Session(threading.Thread):
+    """Utilisateur simulé : tours vocaux ou textuels jusqu'à l'échéance"""
+
+    def __init__(self, index, load, deadline):
+        super().__init__(name=f"session-{index}", daemon=True)
+        self.session_id = f"session-{index}"
+        self.load = load
+        self.deadline = deadline
+        self.rng = random.Random(index)
+        self.completed = 0
+        self.errors = 0
+
+    def run(self):
+        from audio_handler import AudioHandler
+        load = self.load
+        handler = AudioHandler(language_detector=load.detector)
+        handler.recognizer = offline_recognizer(load.stt_latency)
+        handler.tracer = load.tracer
+        # Arrivées étalées : les sessions ne démarrent pas toutes au même instant
+        time.sleep(self.rng.uniform(0, load.think))
+        while time.monotonic() < self.deadline:
+            voice = self.rng.random() < load.voice_ratio
+            turn = load.tracer.begin_turn('voix' if voice else 'texte')
+            if voice:
+                message = handler.transcribe(self.rng.choice(load.utterances), turn)
+            else:
+                message = self.rng.choice(QUESTIONS)
+            response = load.manager.get_response(self.session_id, message, turn=turn)
+            load.tracer.end_turn(turn)
+            # Seuls les tours terminés dans la fenêtre comptent pour le débit
+            if time.monotonic() <= self.deadline:
+                self.completed += 1
+                self.errors += response.startswith("Erreur")
+            time.sleep(self.rng.expovariate(1 / load.think) if load.think else 0)
+
+class Load:
+    """Configuration commune aux sessions d'un palier"""
+
+    def __init__(self, options, detector, sounds, sessions_dir):
+        import turn_tracer
+        from gemini_agent import GeminiAgent
+        from session_manager import SessionManager
+        from benchmarks.stand_in import RecordingChatModel
+
+        self.detector = detector
+        self.utterances = sounds
+        self.voice_ratio = options.voice_ratio
+        self.think = options.think
+        self.stt_latency = parse_latency(options.stt_latency, seed=1)
+        # Traceur du palier : percentiles de chaque étape, sans fichier de traces
+        self.tracer = turn_tracer.TurnTracer(path=None, window=100000)
+        turn_tracer._shared_tracer = self.tracer
+        self.llm = RecordingChatModel(responses=["Voici une réponse détaillée à votre question."],
+                                      seconds_per_kb=options.llm_seconds_per_kb,
+                                      extra_latency=parse_latency(options.llm_latency, seed=2))
+        self.manager = SessionManager(GeminiAgent(llm=self.llm), sessions_dir=sessions_dir,
+                                      max_sessions=options.resident, idle_timeout=None)
+
+def run_level(count, options, detector, sounds):
+    """Lance count sessions pendant options.duration secondes ; retourne les mesures du palier"""
+    with tempfile.TemporaryDirectory(prefix="load_sessions_") as sessions_dir:
+        load = Load(options, detector, sounds, sessions_dir)
+        start = time.monotonic()
+        sessions = [Session(i, load, start + options.duration) for i in range(count)]
+        cpu = time.process_time()
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        elapsed = time.monotonic() - start
+        cpu = time.process_time() - cpu
+        completed = sum(session.completed for session in sessions)
+        return {
+            'sessions': count,
+            'turns': completed,
+            'errors': sum(session.errors for session in sessions),
+            'throughput': completed / options.duration,
+            # Le dernier tour de chaque session peut dépasser l'échéance
+            'elapsed_s': elapsed,
+            'cpu': cpu / elapsed,
+            'stages': {stage: load.tracer.percentiles(stage) for stage in STAGES},
+            'evicted': load.manager.stats()['evicted'],
+        }
+
+def saturation(results, slo_ms, min_gain):
+    """Premier palier saturé : p95 des tours au-delà du SLO, ou débit qui progresse de moins de min_gain"""
+    for previous, current in zip([None] + results, results):
+        p95 = (current['stages']['turn'] or {}).get('p95')
+        if p95 is not None and p95 > slo_ms:
+            return current['sessions'], f"p95 des tours {p95 / 1000:.1f} s > {slo_ms / 1000:.1f} s"
+        if previous is not None:
+            expected = current['sessions'] / previous['sessions']
+            gain = current['throughput'] / max(previous['throughput'], 1e-9)
+            # Gain rapporté à celui qu'apporterait un passage à l'échelle parfait
+            if gain - 1 < min_gain * (expected - 1):
+                return current['sessions'], f"débit x{gain:.2f} pour x{expected:.2f} sessions"
+    return None, None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sessions vocales et textuelles simultanées, hors ligne")
+    parser.add_argument('--sessions', default="1,2,4,8,16", help="Paliers de sessions simultanées (virgules)")
+    parser.add_argument('--duration', type=float, default=20, help="Durée de chaque palier (s)")
+    parser.add_argument('--voice-ratio', type=float, default=0.5, help="Part des tours vocaux")
+    parser.add_argument('--think', type=float, default=1.0, help="Temps de réflexion moyen entre deux tours (s)")
+    parser.add_argument('--stt-latency', default="lognormal:0.6,0.4", help="Latence du service de reconnaissance")
+    parser.add_argument('--llm-latency', default="lognormal:0.8,0.5", help="Latence du LLM")
+    parser.add_argument('--llm-seconds-per-kb', type=float, default=0.0, help="Latence du LLM par Ko de requête")
+    parser.add_argument('--detector', choices=('local', 'service', 'none'), default='local',
+                        help="Détection de langue : dans le processus, DetectorService, ou aucune")
+    parser.add_argument('--detector-workers', type=int, default=None)
+    parser.add_argument('--resident', type=int, default=100, help="Sessions gardées en mémoire (SessionManager)")
+    parser.add_argument('--audio', nargs='*', default=None, help="WAV enregistrés rejoués (sinon parole synthétique)")
+    parser.add_argument('--slo', type=float, default=5.0, help="p95 maximal d'un tour (s)")
+    parser.add_argument('--min-gain', type=float, default=0.5,
+                        help="Part minimale du gain de débit idéal entre deux paliers")
+    parser.add_argument('--json', default=None, help="Fichier où écrire les résultats")
+    options = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    logging.disable(logging.INFO)
+    levels = [int(part) for part in options.sessions.split(',')]
+    sounds = utterances(options.audio)
+    detector = build_detector(options.detector, options.detector_workers, sounds[0])
+
+    results = []
+    try:
+        print(f"{'sessions':>8s} {'tours':>6s} {'tours/s':>8s} {'p50':>7s} {'p95':>7s} {'p99':>7s} "
+              f"{'stt p95':>8s} {'llm p95':>8s} {'erreurs':>8s} {'cpu':>5s}")
+        for count in levels:
+            result = run_level(count, options, detector, sounds)
+            results.append(result)
+            stages = {stage: values or {} for stage, values in result['stages'].items()}
+            print(f"{count:8d} {result['turns']:6d} {result['throughput']:8.2f} "
+                  f"{stages['turn'].get('p50', 0) / 1000:6.2f}s {stages['turn'].get('p95', 0) / 1000:6.2f}s "
+                  f"{stages['turn'].get('p99', 0) / 1000:6.2f}s {stages['stt'].get('p95', 0) / 1000:7.2f}s "
+                  f"{stages['llm'].get('p95', 0) / 1000:7.2f}s {result['errors']:8d} {result['cpu'] * 100:4.0f}%")
+    finally:
+        if hasattr(detector, 'shutdown'):
+            detector.shutdown()
+
+    print(f"\n{'étape (ms)':14s}" + "".join(f"{f'{count} sess. p50/p95/p99':>26s}" for count in levels))
+    for stage in STAGES:
+        cells = []
+        for result in results:
+            values = result['stages'][stage]
+            cells.append(f"{values['p50']:.0f}/{values['p95']:.0f}/{values['p99']:.0f}" if values else "-")
+        print(f"{stage:14s}" + "".join(f"{cell:>26s}" for cell in cells))
+
+    point, reason = saturation(results, options.slo * 1000, options.min_gain)
+    if point is None:
+        print(f"\nPas de saturation jusqu'à {levels[-1]} sessions")
+    else:
+        print(f"\nSaturation à {point} sessions : {reason}")
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(options), 'results': results, 'saturation': point}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
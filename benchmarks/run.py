@@ -0,0 +1,75 @@
+"""
+Microbenchmarks des chemins critiques, sans réseau, sans carte son ni affichage.
+
+    python -m benchmarks.run                  # compare à benchmarks/baseline.json
+    python -m benchmarks.run --save           # enregistre la référence
+    python -m benchmarks.run -k detect        # seulement les cas dont le nom contient "detect"
+
+Code de sortie 1 si un cas est plus lent que la référence au-delà du seuil (--threshold, 25 % par défaut).
+"""
+import os
+import sys
+import logging
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.harness import BENCHMARKS, measure, load_baseline, save_baseline, compare, machine
+from benchmarks import cases
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks AryadAI")
+    parser.add_argument('-k', dest='filter', default=None, help="Ne lancer que les cas contenant ce texte")
+    parser.add_argument('--baseline', default=os.path.join(ROOT, "benchmarks", "baseline.json"))
+    parser.add_argument('--save', action='store_true', help="Enregistrer les résultats comme référence")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Ralentissement toléré (0.25 = +25 %%)")
+    parser.add_argument('--min-round-time', type=float, default=0.05)
+    parser.add_argument('--rounds', type=int, default=7)
+    options = parser.parse_args(argv)
+
+    # Les modules de l'application lisent leurs fichiers (identité, modèles) depuis la racine
+    os.chdir(ROOT)
+    logging.disable(logging.INFO)
+
+    results = {}
+    for bench in BENCHMARKS:
+        if options.filter and options.filter.lower() not in bench.name.lower():
+            continue
+        try:
+            function = bench.setup()
+        except (ImportError, OSError) as e:
+            print(f"{bench.name:60s} ignoré ({e})")
+            continue
+        result = measure(function, options.min_round_time, options.rounds)
+        results[bench.name] = result
+        print(f"{bench.name:60s} {result['median_ms']:10.4f} ms  (min {result['min_ms']:.4f}, "
+              f"{result['number']} x {result['rounds']})")
+    cases.cleanup()
+
+    if options.save:
+        save_baseline(options.baseline, results)
+        print(f"Référence enregistrée dans {options.baseline}")
+        return 0
+
+    baseline = load_baseline(options.baseline)
+    if baseline is None:
+        print(f"Pas de référence ({options.baseline}) : lancer avec --save pour en créer une")
+        return 0
+    if baseline.get('machine') != machine():
+        print(f"Attention : référence mesurée sur une autre machine ({baseline.get('machine')})")
+
+    regressions = 0
+    print()
+    for name, best, reference, ratio, regression in compare(results, baseline, options.threshold):
+        if reference is None:
+            print(f"{name:60s} nouveau")
+            continue
+        status = "RÉGRESSION" if regression else "ok"
+        print(f"{name:60s} {reference:10.4f} -> {best:10.4f} ms  ({ratio:5.2f}x)  {status}")
+        regressions += regression
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import json
+import time
+import itertools
+from typing import Any, Dict, List, Optional
+from pydantic import Field, PrivateAttr
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+class RecordingChatModel(BaseChatModel):
+    """
+    Fournisseur local qui remplace Gemini : sérialise chaque requête comme l'API (instruction système,
+    historique, handle de contexte), note sa taille et simule une latence proportionnelle.
+
+    Les contextes créés par create_context sont référencés par cached_content ; un handle inconnu
+    ou expiré fait échouer la requête, comme côté fournisseur.
+    """
+    responses: List[str] = Field(default_factory=lambda: ["Bonjour, je suis AryadAI."])
+    base_latency: float = 0.0
+    seconds_per_kb: float = 0.0
+    # Part du coût d'un préfixe déjà en cache (lecture au lieu de traitement)
+    cached_cost: float = 0.25
+    # Fonction sans argument tirée à chaque requête : latence supplémentaire en secondes (distribution)
+    extra_latency: Any = None
+    requests: List[Dict[str, Any]] = Field(default_factory=list)
+    contexts: Dict[str, str] = Field(default_factory=dict)
+    _responses: Any = PrivateAttr(default=None)
+    _ids: Any = PrivateAttr(default_factory=lambda: itertools.count(1))
+
+    @property
+    def _llm_type(self):
+        return "recording-stand-in"
+
+    def create_context(self, system_instruction, ttl):
+        """Même signature que la fonction de création de ContextCache"""
+        name = f"cachedContents/local-{next(self._ids)}"
+        self.contexts[name] = system_instruction
+        return name
+
+    def expire(self, name):
+        self.contexts.pop(name, None)
+
+    def _generate(self, messages, stop=None, run_manager=None, cached_content: Optional[str] = None, **kwargs):
+        if cached_content is not None and cached_content not in self.contexts:
+            raise ValueError(f"404 CachedContent not found: {cached_content}")
+        system = "\n".join(message.content for message in messages if isinstance(message, SystemMessage))
+        contents = [{'role': 'user' if isinstance(message, HumanMessage) else 'model', 'parts': [{'text': message.content}]}
+                    for message in messages if not isinstance(message, SystemMessage)]
+        payload = {'contents': contents}
+        if system:
+            payload['system_instruction'] = {'parts': [{'text': system}]}
+        if cached_content is not None:
+            payload['cached_content'] = cached_content
+        size = len(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+
+        # Latence : envoi de la requête + traitement du préfixe en cache, à coût réduit
+        cached_size = len(self.contexts[cached_content].encode('utf-8')) if cached_content else 0
+        latency = self.base_latency + self.seconds_per_kb * (size + self.cached_cost * cached_size) / 1024
+        if self.extra_latency is not None:
+            latency += self.extra_latency()
+        if latency:
+            time.sleep(latency)
+        self.requests.append({'bytes': size, 'cached_bytes': cached_size, 'latency_ms': latency * 1000,
+                              'cached_content': cached_content})
+
+        if self._responses is None:
+            self._responses = itertools.cycle(self.responses)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=next(self._responses)))])
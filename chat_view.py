@@ -0,0 +1,534 @@
+import time
+from collections import OrderedDict
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, QSize, QRectF, QPointF, Signal
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView
+from PySide6.QtGui import QColor, QPainter, QPainterPath, QPen, QFont, QPixmap, QTextLayout, QTextOption
+from animation_clock import shared_clock
+
+class ChatMessage:
+    """Une entrée de l'historique (message utilisateur, réponse de l'agent, message système ou indicateur de frappe)"""
+    __slots__ = ('id', 'text', 'is_user', 'kind', 'revealed', 'reveal_started', 'reveal_speed', 'store_id', 'image')
+
+    def __init__(self, message_id, text, is_user, kind='message', revealed=None, store_id=None):
+        self.id = message_id
+        self.store_id = store_id  # Identifiant dans l'historique persistant
+        self.text = text
+        self.is_user = is_user
+        self.kind = kind
+        # Nombre de caractères affichés (animation de frappe)
+        self.revealed = len(text) if revealed is None else revealed
+        self.reveal_started = None
+        self.reveal_speed = None  # Caractères par seconde
+        self.image = None  # Vignette (QPixmap) affichée au-dessus du texte
+
+    @property
+    def is_revealing(self):
+        return self.revealed < len(self.text)
+
+class ChatHistoryModel(QAbstractListModel):
+    MessageRole = Qt.UserRole + 1
+    # Changement purement visuel d'une ligne (animation) : QListView relance toute sa mise en page
+    # sur dataChanged, on se contente donc de repeindre la ligne
+    rowAnimated = Signal(int)
+    # Messages les plus anciens retirés par la limite MAX_ROWS (à recharger depuis l'historique)
+    rowsTrimmed = Signal(int)
+    FRAME_INTERVAL = 16  # ms
+    REVEAL_SPEED = 33.0  # Caractères par seconde pour une réponse courte
+    MAX_REVEAL_DURATION = 3.0  # Les longues réponses s'affichent plus vite
+    MAX_WORD_EXTENSION = 24
+    MAX_ROWS = 500  # Au-delà, les plus anciens messages sont retirés (ils restent sur disque)
+
+    def __init__(self, parent=None, clock=None):
+        super().__init__(parent)
+        self._messages = []
+        self._next_id = 0
+
+        # Animations cadencées par l'horloge commune, inscrites seulement quand elles sont utiles
+        self._clock = clock or shared_clock()
+        self._reveal_animation = None  # Toutes les réponses en cours d'affichage
+        self._typing_animation = None  # Points de l'indicateur de frappe
+        self.typing_dots = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._messages)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._messages):
+            return None
+        message = self._messages[index.row()]
+        if role == self.MessageRole:
+            return message
+        if role == Qt.DisplayRole:
+            return message.text
+        return None
+
+    def message_at(self, row):
+        return self._messages[row]
+
+    def append_message(self, text, is_user, reveal=False, store_id=None, kind='message'):
+        """
+        Ajoute un message ; avec reveal, le texte apparaît mot par mot selon un budget de temps.
+        kind vaut 'notice' pour un message système (bulle distincte)
+        """
+        message = ChatMessage(self._new_id(), text, is_user, kind=kind, revealed=0 if reveal and text else None,
+                              store_id=store_id)
+        if message.is_revealing:
+            message.reveal_started = time.monotonic()
+            message.reveal_speed = max(self.REVEAL_SPEED, len(text) / self.MAX_REVEAL_DURATION)
+            if self._reveal_animation is None:
+                self._reveal_animation = self._clock.register(self._reveal_step, self.FRAME_INTERVAL, owner=self)
+        return self._append(message)
+
+    def prepend_messages(self, stored_messages):
+        """Insère en tête une page de messages relus depuis l'historique (du plus ancien au plus récent)"""
+        if not stored_messages:
+            return
+        messages = [ChatMessage(self._new_id(), stored.text, stored.is_user,
+                                kind='notice' if stored.is_notice else 'message', store_id=stored.id)
+                    for stored in stored_messages]
+        self.beginInsertRows(QModelIndex(), 0, len(messages) - 1)
+        self._messages[0:0] = messages
+        self.endInsertRows()
+
+    def oldest_store_id(self):
+        """Identifiant persistant du plus ancien message affiché (curseur de pagination)"""
+        for message in self._messages:
+            if message.store_id is not None:
+                return message.store_id
+        return None
+
+    def row_for_store_id(self, store_id):
+        """Ligne affichant un message persistant donné, ou None"""
+        for row, message in enumerate(self._messages):
+            if message.store_id == store_id:
+                return row
+        return None
+
+    def set_image(self, message, image):
+        """Attache une vignette (QImage) à un message affiché (sans effet s'il a été retiré)"""
+        try:
+            row = self._messages.index(message)
+        except ValueError:
+            return
+        message.image = QPixmap.fromImage(image)
+        # La hauteur de la ligne change : ici, la mise en page complète de dataChanged est voulue
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def reveal_all(self):
+        """Affiche immédiatement la totalité des réponses en cours d'animation"""
+        for row, message in enumerate(self._messages):
+            if message.is_revealing:
+                message.revealed = len(message.text)
+                self._changed(row)
+        self._update_animations()
+
+    def append_typing_indicator(self):
+        """Ajoute l'indicateur de frappe de l'agent"""
+        message = self._append(ChatMessage(self._new_id(), "", False, kind='typing'))
+        if self._typing_animation is None:
+            self.typing_dots = 0
+            self._typing_animation = self._clock.register(self._animate_dots, 500, owner=self)
+        return message
+
+    def remove_message(self, message):
+        """Retire un message (sans effet s'il a déjà été retiré)"""
+        try:
+            row = self._messages.index(message)
+        except ValueError:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._messages[row]
+        self.endRemoveRows()
+        self._update_animations()
+
+    def clear(self):
+        """Efface tout l'historique"""
+        self.beginResetModel()
+        self._messages = []
+        self.endResetModel()
+        self._update_animations()
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def _append(self, message):
+        row = len(self._messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._messages.append(message)
+        self.endInsertRows()
+        self._trim()
+        return message
+
+    def _trim(self):
+        # Mémoire bornée : retirer les plus anciens messages terminés (relisibles depuis l'historique)
+        excess = len(self._messages) - self.MAX_ROWS
+        if excess <= 0:
+            return
+        count = 0
+        while count < excess and self._messages[count].kind != 'typing' and not self._messages[count].is_revealing:
+            count += 1
+        if count:
+            self.beginRemoveRows(QModelIndex(), 0, count - 1)
+            del self._messages[:count]
+            self.endRemoveRows()
+            self.rowsTrimmed.emit(count)
+
+    def _changed(self, row):
+        self.rowAnimated.emit(row)
+
+    def _reveal_step(self):
+        now = time.monotonic()
+        # Les réponses en cours d'animation sont toujours en fin d'historique
+        for row in range(len(self._messages) - 1, -1, -1):
+            message = self._messages[row]
+            if message.kind != 'message' or message.is_user:
+                continue
+            if not message.is_revealing:
+                break
+            target = int((now - message.reveal_started) * message.reveal_speed)
+            if target <= message.revealed:
+                # Cadencé par le temps écoulé, pas par le nombre d'images
+                continue
+            message.revealed = self._word_end(message.text, target)
+            self._changed(row)
+        return self._update_animations()
+
+    def _word_end(self, text, position):
+        """Avance jusqu'à la fin du mot courant (sans dépasser MAX_WORD_EXTENSION caractères)"""
+        if position >= len(text):
+            return len(text)
+        limit = min(len(text), position + self.MAX_WORD_EXTENSION)
+        for index in range(position, limit):
+            if text[index].isspace():
+                return index
+        return limit
+
+    def _animate_dots(self):
+        self.typing_dots = (self.typing_dots + 1) % 4
+        for row, message in enumerate(self._messages):
+            if message.kind == 'typing':
+                self._changed(row)
+        return self._typing_animation is not None
+
+    def _update_animations(self):
+        """Désinscrit les animations qui n'ont plus rien à animer ; retourne True s'il reste une réponse à afficher"""
+        revealing = any(message.is_revealing for message in self._messages)
+        if not revealing and self._reveal_animation is not None:
+            self._clock.unregister(self._reveal_animation)
+            self._reveal_animation = None
+        if not any(message.kind == 'typing' for message in self._messages) and self._typing_animation is not None:
+            self._clock.unregister(self._typing_animation)
+            self._typing_animation = None
+        return revealing
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    SPACING = 16
+    MAX_BUBBLE_WIDTH = 700
+    PADDING_H = 16
+    PADDING_V = 12
+    IMAGE_GAP = 8
+    CACHE_SIZE = 512
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.font = QFont()
+        self.font.setPixelSize(14)
+        # Mise en page du texte par (message, largeur disponible)
+        self._layouts = OrderedDict()
+
+    def invalidate(self):
+        self._layouts.clear()
+
+    @staticmethod
+    def _has_bubble(message):
+        # Messages de l'utilisateur et messages système ; les réponses de l'agent sont du texte libre
+        return message.is_user or message.kind == 'notice'
+
+    def _text_width(self, message, available):
+        if self._has_bubble(message):
+            return max(1, min(self.MAX_BUBBLE_WIDTH, available) - 2 * self.PADDING_H)
+        return max(1, available)
+
+    def _build_layout(self, text, width):
+        layout = QTextLayout(text, self.font)
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapAtWordBoundaryOrAnywhere)
+        layout.setTextOption(option)
+        height = 0.0
+        natural_width = 0.0
+        layout.beginLayout()
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(width)
+            line.setPosition(QPointF(0, height))
+            height += line.height()
+            natural_width = max(natural_width, line.naturalTextWidth())
+        layout.endLayout()
+        return layout, height, natural_width
+
+    def _cached_layout(self, message, width):
+        key = (message.id, width)
+        entry = self._layouts.get(key)
+        if entry is None:
+            entry = self._build_layout(message.text, width)
+            self._layouts[key] = entry
+            if len(self._layouts) > self.CACHE_SIZE:
+                self._layouts.popitem(last=False)
+        else:
+            self._layouts.move_to_end(key)
+        return entry
+
+    def _available_width(self):
+        return self.parent().viewport().width()
+
+    def sizeHint(self, option, index):
+        message = index.data(ChatHistoryModel.MessageRole)
+        if message is None:
+            return QSize(0, 0)
+        available = self._available_width()
+        if message.kind == 'typing':
+            return QSize(available, 30 + self.SPACING)
+        # La hauteur est celle du texte complet : la ligne ne grandit pas pendant l'animation
+        _, height, _ = self._cached_layout(message, self._text_width(message, available))
+        padding = 2 * self.PADDING_V if self._has_bubble(message) else 0
+        if message.image is not None:
+            padding += message.image.height() + self.IMAGE_GAP
+        return QSize(available, int(height + padding) + 1 + self.SPACING)
+
+    def revealed_height(self, message, available):
+        """Hauteur du texte déjà affiché : pendant l'animation, jusqu'à la dernière ligne entamée"""
+        layout, height, _ = self._cached_layout(message, self._text_width(message, available))
+        if message.is_revealing:
+            if message.revealed == 0:
+                return 0.0
+            line = layout.lineForTextPosition(message.revealed - 1)
+            if line.isValid():
+                return line.y() + line.height()
+        return height
+
+    def paint(self, painter, option, index):
+        message = index.data(ChatHistoryModel.MessageRole)
+        if message is None:
+            return
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = QRectF(option.rect).adjusted(0, self.SPACING / 2, 0, -self.SPACING / 2)
+        if message.kind == 'typing':
+            self._paint_typing(painter, rect, index.model().typing_dots)
+        else:
+            self._paint_message(painter, rect, message)
+        painter.restore()
+
+    def _paint_typing(self, painter, rect, dots):
+        painter.setBrush(QColor(200, 200, 200))
+        painter.setPen(Qt.NoPen)
+        dot_radius = 4
+        spacing = 8
+        start_x = rect.left() + (50 - (3 * dot_radius * 2 + 2 * spacing)) // 2 + dot_radius
+        center_y = rect.top() + 15
+        for i in range(dots):
+            x = start_x + i * (dot_radius * 2 + spacing)
+            painter.drawEllipse(QPointF(x, center_y), dot_radius, dot_radius)
+
+    def _paint_message(self, painter, rect, message):
+        if message.image is not None:
+            rect = self._paint_image(painter, rect, message)
+        width = self._text_width(message, int(rect.width()))
+        layout, height, natural_width = self._cached_layout(message, width)
+
+        if self._has_bubble(message):
+            bubble_width = natural_width + 2 * self.PADDING_H
+            if message.is_user:
+                bubble = QRectF(rect.right() - bubble_width, rect.top(), bubble_width, height + 2 * self.PADDING_V)
+                background, border, text_color = '#2B2D42', '#3B3D52', '#E2E8F0'
+            else:
+                # Message système (enregistrement, image...) : bulle sombre à gauche
+                bubble = QRectF(rect.left(), rect.top(), bubble_width, height + 2 * self.PADDING_V)
+                background, border, text_color = '#1E1F2B', '#2A2B3A', '#F8FAFC'
+            painter.setBrush(QColor(background))
+            painter.setPen(QPen(QColor(border), 1))
+            painter.drawRoundedRect(bubble.adjusted(0.5, 0.5, -0.5, -0.5), 12, 12)
+            origin = QPointF(bubble.left() + self.PADDING_H, bubble.top() + self.PADDING_V)
+            painter.setPen(QColor(text_color))
+        else:
+            origin = rect.topLeft()
+            painter.setPen(QColor('white'))
+        if message.is_revealing:
+            self._draw_prefix(painter, layout, origin, message.revealed)
+        else:
+            layout.draw(painter, origin)
+
+    def _paint_image(self, painter, rect, message):
+        """Dessine la vignette en haut de la ligne ; retourne la zone restante pour le texte"""
+        image = message.image
+        left = rect.right() - image.width() if message.is_user else rect.left()
+        target = QRectF(left, rect.top(), image.width(), image.height())
+        path = QPainterPath()
+        path.addRoundedRect(target, 12, 12)
+        painter.save()
+        painter.setClipPath(path, Qt.IntersectClip)
+        painter.drawPixmap(target.topLeft(), image)
+        painter.restore()
+        return rect.adjusted(0, image.height() + self.IMAGE_GAP, 0, 0)
+
+    def _draw_prefix(self, painter, layout, origin, revealed):
+        """Dessine les `revealed` premiers caractères en réutilisant la mise en page complète"""
+        for i in range(layout.lineCount()):
+            line = layout.lineAt(i)
+            if line.textStart() >= revealed:
+                break
+            if line.textStart() + line.textLength() <= revealed:
+                line.draw(painter, origin)
+                continue
+            # Dernière ligne partiellement visible : découper à la position du curseur
+            cut_x, _ = line.cursorToX(revealed)
+            line_rect = line.rect().translated(origin)
+            painter.save()
+            painter.setClipRect(QRectF(line_rect.left(), line_rect.top(), cut_x, line_rect.height()), Qt.IntersectClip)
+            line.draw(painter, origin)
+            painter.restore()
+            break
+
+class ChatHistoryView(QListView):
+    # L'utilisateur a fait défiler jusqu'en haut : charger la page précédente
+    reached_top = Signal()
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.delegate = ChatMessageDelegate(self)
+        self.setItemDelegate(self.delegate)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setResizeMode(QListView.Adjust)
+        # Mise en page par lots : seules les lignes proches de la zone visible sont calculées d'abord
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(50)
+        self.setViewportMargins(20, 20, 20, 20)
+        self.setStyleSheet("""
+            QListView {
+                border: none;
+                background-color: #1A1B26;
+            }
+            QScrollBar:vertical {
+                border: none;
+                background: #1A1B26;
+                width: 8px;
+                margin: 0px;
+            }
+            QScrollBar::handle:vertical {
+                background: #3B3D52;
+                min-height: 20px;
+                border-radius: 4px;
+            }
+            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
+                height: 0px;
+            }
+        """)
+
+        # Défilement vers le bas regroupé : au plus un par image
+        self._scroll_pending = False
+        self._scrolling = False
+        self._follow_bottom = True
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        # La mise en page par lots fait grandir la zone après l'insertion
+        self.verticalScrollBar().rangeChanged.connect(self._on_range_changed)
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.rowAnimated.connect(self._on_row_animated)
+        model.modelReset.connect(self._on_model_reset)
+        self._revealed_heights = {}
+
+    def scroll_to_bottom(self):
+        """Demande un défilement vers le bas, regroupé avec les autres demandes de la même image"""
+        self._follow_bottom = True
+        self._request_scroll()
+
+    def _request_scroll(self):
+        if not self._scroll_pending:
+            self._scroll_pending = True
+            QTimer.singleShot(16, self._do_scroll)
+
+    def _do_scroll(self):
+        self._scroll_pending = False
+        if self._follow_bottom:
+            self._scrolling = True
+            scroll_bar = self.verticalScrollBar()
+            target = self._revealing_target()
+            if target is None:
+                self.scrollToBottom()
+            else:
+                scroll_bar.setValue(max(scroll_bar.value(), min(target, scroll_bar.maximum())))
+            self._scrolling = False
+
+    def _revealing_target(self):
+        """Position de défilement qui garde visible la dernière ligne affichée d'une réponse en cours"""
+        model = self.model()
+        for row in range(model.rowCount() - 1, -1, -1):
+            message = model.message_at(row)
+            if message.kind == 'message' and message.is_revealing:
+                rect = self.visualRect(model.index(row))
+                bottom = rect.top() + self.delegate.SPACING / 2 + self.delegate.revealed_height(message, self.viewport().width())
+                return self.verticalScrollBar().value() + int(bottom) + self.delegate.SPACING - self.viewport().height()
+            if message.kind != 'typing':
+                return None
+        return None
+
+    def _on_scrolled(self, value):
+        if self._scrolling:
+            return
+        self._follow_bottom = value >= self.verticalScrollBar().maximum()
+        if not self._follow_bottom:
+            # L'utilisateur remonte dans l'historique : inutile de continuer l'animation
+            self.model().reveal_all()
+        if value == self.verticalScrollBar().minimum() and self.verticalScrollBar().maximum() > 0:
+            self.reached_top.emit()
+
+    def keep_row_at_top(self, row):
+        """Garde une ligne en haut de la zone visible (après insertion d'une page au-dessus)"""
+        self._scrolling = True
+        self.scrollTo(self.model().index(row), QAbstractItemView.PositionAtTop)
+        self._scrolling = False
+
+    def scroll_to_row(self, row):
+        """Amène une ligne en haut de la vue et cesse de suivre le bas (résultat de recherche)"""
+        self._follow_bottom = False
+        self.keep_row_at_top(row)
+
+    def _on_range_changed(self, minimum, maximum):
+        if self._follow_bottom:
+            self._request_scroll()
+
+    def _on_model_reset(self):
+        self._revealed_heights.clear()
+        self._follow_bottom = True
+
+    def _on_row_animated(self, row):
+        self.viewport().update(self.visualRect(self.model().index(row)))
+        # La hauteur des lignes ne change pas pendant l'animation (aucune remise en page) ;
+        # on ne fait défiler que lorsqu'une réponse entame une nouvelle ligne ou se termine
+        message = self.model().message_at(row)
+        if not self._follow_bottom or message.kind != 'message':
+            return
+        if not message.is_revealing:
+            self._revealed_heights.pop(message.id, None)
+            self._request_scroll()
+            return
+        height = self.delegate.revealed_height(message, self.viewport().width())
+        if self._revealed_heights.get(message.id) != height:
+            self._revealed_heights[message.id] = height
+            self._request_scroll()
+
+    def _on_rows_inserted(self, parent, first, last):
+        if self._follow_bottom:
+            self._request_scroll()
+
+    def resizeEvent(self, event):
+        # Les mises en page en cache dépendent de la largeur
+        self.delegate.invalidate()
+        super().resizeEvent(event)
@@ -0,0 +1,407 @@
+import re
+import sqlite3
+import threading
+import time
+import logging
+import unicodedata
+from queue import Queue
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    mode TEXT NOT NULL DEFAULT 'conversation',
+    target_language TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id),
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_conversation ON messages(conversation_id, id);
+"""
+
+# Index plein texte tenu à jour par des triggers (insertion incrémentale)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Index inversé équivalent quand SQLite est compilé sans FTS5
+TERMS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS message_terms (
+    term TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (term, message_id)
+) WITHOUT ROWID;
+"""
+
+SEARCH_COLUMNS = "m.id, m.conversation_id, m.role, m.text, m.created_at, c.mode, c.target_language"
+
+def normalize_term(word):
+    """Minuscules et sans accents"""
+    word = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(char for char in word if not unicodedata.combining(char))
+
+def search_terms(text):
+    """Découpe un texte en termes normalisés (minuscules, sans accents)"""
+    return re.findall(r"\w+", normalize_term(text))
+
+def make_snippet(text, terms, width=12):
+    """Extrait autour de la première occurrence, termes trouvés entre crochets (le dernier terme est un préfixe)"""
+    words = list(re.finditer(r"\w+", text))
+    exact, prefix = set(terms[:-1]), terms[-1] if terms else None
+    hits = []
+    for index, word in enumerate(words):
+        term = normalize_term(word.group())
+        if term in exact or (prefix is not None and term.startswith(prefix)):
+            hits.append(index)
+    if not hits:
+        return text if len(words) <= width else text[:words[width].start()].rstrip() + '…'
+    first = max(0, min(hits[0] - width // 4, len(words) - width))
+    last = min(len(words), first + width)
+    pieces = []
+    cursor = words[first].start()
+    for index in range(first, last):
+        word = words[index]
+        pieces.append(text[cursor:word.start()])
+        pieces.append(f"[{word.group()}]" if index in hits else word.group())
+        cursor = word.end()
+    snippet = ''.join(pieces)
+    if last == len(words):
+        snippet += text[cursor:]
+    return ('…' if first > 0 else '') + snippet + ('…' if last < len(words) else '')
+
+class StoredMessage:
+    """Un message relu depuis la base"""
+    __slots__ = ('id', 'conversation_id', 'role', 'text', 'created_at')
+
+    def __init__(self, id, conversation_id, role, text, created_at):
+        self.id = id
+        self.conversation_id = conversation_id
+        self.role = role
+        self.text = text
+        self.created_at = created_at
+
+    @property
+    def is_user(self):
+        return self.role == 'user'
+
+    @property
+    def is_notice(self):
+        """Message de l'application (enregistrement, image...), ni de l'utilisateur ni de l'agent"""
+        return self.role == 'notice'
+
+class SearchResult:
+    """Un message trouvé par la recherche, avec le contexte de sa conversation"""
+    __slots__ = ('message_id', 'conversation_id', 'role', 'text', 'created_at', 'mode', 'target_language', 'snippet')
+
+    def __init__(self, message_id, conversation_id, role, text, created_at, mode, target_language, snippet=None):
+        self.message_id = message_id
+        self.conversation_id = conversation_id
+        self.role = role
+        self.text = text
+        self.created_at = created_at
+        self.mode = mode
+        self.target_language = target_language
+        self.snippet = snippet or text
+
+    @property
+    def is_translation(self):
+        return self.mode == 'interprète' and self.role == 'agent'
+
+class ConversationStore:
+    RANKED_SEARCH_LIMIT = 5000
+
+    def __init__(self, path="conversations.db"):
+        """
+        Historique des conversations persistant (SQLite en mode WAL).
+
+        Les écritures passent par un thread dédié qui les regroupe en transactions ;
+        les lectures utilisent une connexion par thread et ne bloquent pas l'écrivain.
+
+        :param path: Chemin du fichier de base de données
+        """
+        self.path = path
+        self._local = threading.local()
+        self._queue = Queue()
+        self._closed = False
+
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        self.full_text = self._create_search_index(connection)
+        connection.commit()
+        # Identifiants attribués ici pour que l'ajout asynchrone puisse les retourner immédiatement
+        self._id_lock = threading.Lock()
+        self._next_message_id = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM messages").fetchone()[0]
+
+        self._writer = threading.Thread(target=self._write_loop, name="conversation-store", daemon=True)
+        self._writer.start()
+
+    def _create_search_index(self, connection):
+        """Crée l'index de recherche (FTS5, sinon table de termes) ; retourne True si FTS5 est utilisé"""
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name IN ('messages_fts', 'message_terms')"
+        ).fetchone()
+        try:
+            connection.executescript(FTS_SCHEMA)
+            if not exists:
+                # Indexer les messages déjà présents
+                connection.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError:
+            logger.warning("FTS5 indisponible : recherche par index de termes")
+            connection.executescript(TERMS_SCHEMA)
+            if not exists:
+                for message_id, text in connection.execute("SELECT id, text FROM messages").fetchall():
+                    self._index_terms(connection, message_id, text)
+            return False
+
+    def _index_terms(self, connection, message_id, text):
+        connection.executemany(
+            "INSERT OR IGNORE INTO message_terms (term, message_id) VALUES (?, ?)",
+            [(term, message_id) for term in set(search_terms(text))]
+        )
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    # --- Écritures (thread écrivain) ---
+
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            # Regrouper tout ce qui est en attente dans une seule transaction
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stop = False
+            try:
+                with connection:
+                    connection.execute("BEGIN")
+                    for operation, done in batch:
+                        if operation is None:
+                            stop = True
+                            continue
+                        # Un point de sauvegarde par opération : un échec n'annule pas le reste du lot
+                        connection.execute("SAVEPOINT operation")
+                        try:
+                            result = operation(connection)
+                        except Exception as e:
+                            connection.execute("ROLLBACK TO operation")
+                            logger.error("Erreur lors de l'écriture de l'historique : %s", e)
+                            result = None
+                        connection.execute("RELEASE operation")
+                        if done is not None:
+                            done.result = result
+            except Exception as e:
+                logger.error("Erreur lors de l'écriture de l'historique : %s", e)
+            finally:
+                for operation, done in batch:
+                    if done is not None:
+                        done.set()
+            if stop:
+                connection.close()
+                return
+
+    def _submit(self, operation, wait=False):
+        if self._closed:
+            return None
+        if not wait:
+            self._queue.put((operation, None))
+            return None
+        done = threading.Event()
+        done.result = None
+        self._queue.put((operation, done))
+        done.wait()
+        return done.result
+
+    def new_conversation(self, mode='conversation', target_language=None):
+        """Crée une conversation et retourne son identifiant"""
+        def insert(connection):
+            cursor = connection.execute(
+                "INSERT INTO conversations (created_at, mode, target_language) VALUES (?, ?, ?)",
+                (time.time(), mode, target_language)
+            )
+            return cursor.lastrowid
+        return self._submit(insert, wait=True)
+
+    def append_message(self, conversation_id, role, text):
+        """Ajoute un message de façon asynchrone et retourne immédiatement son identifiant"""
+        with self._id_lock:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        created_at = time.time()
+
+        def insert(connection):
+            connection.execute(
+                "INSERT INTO messages (id, conversation_id, role, text, created_at) VALUES (?, ?, ?, ?, ?)",
+                (message_id, conversation_id, role, text, created_at)
+            )
+            if not self.full_text:
+                self._index_terms(connection, message_id, text)
+        self._submit(insert)
+        return message_id
+
+    def flush(self):
+        """Attend que toutes les écritures en attente soient enregistrées"""
+        self._submit(lambda connection: None, wait=True)
+
+    def close(self):
+        """Enregistre les écritures en attente et arrête le thread écrivain"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((None, None))
+        self._writer.join()
+
+    # --- Lectures ---
+
+    def latest_conversation(self, mode=None):
+        """Retourne (id, mode, langue cible) de la conversation la plus récente, ou None"""
+        query = "SELECT id, mode, target_language FROM conversations"
+        params = ()
+        if mode is not None:
+            query += " WHERE mode = ?"
+            params = (mode,)
+        return self._reader().execute(query + " ORDER BY id DESC LIMIT 1", params).fetchone()
+
+    def load_page(self, conversation_id, before_id=None, limit=50):
+        """
+        Charge une page de messages, du plus ancien au plus récent.
+
+        :param conversation_id: Conversation à lire
+        :param before_id: Ne retourner que les messages antérieurs à cet identifiant (page précédente)
+        :param limit: Taille de la page
+        :return: Liste de StoredMessage
+        """
+        query = "SELECT id, conversation_id, role, text, created_at FROM messages WHERE conversation_id = ?"
+        params = [conversation_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        rows = self._reader().execute(query, params).fetchall()
+        return [StoredMessage(*row) for row in reversed(rows)]
+
+    def recent_turns(self, conversation_id, limit=20):
+        """Derniers messages d'une conversation (pour reconstruire la mémoire de l'agent)"""
+        return self.load_page(conversation_id, limit=limit)
+
+    def conversation(self, conversation_id):
+        """Retourne (id, mode, langue cible) d'une conversation, ou None"""
+        return self._reader().execute(
+            "SELECT id, mode, target_language FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+
+    def search(self, query, limit=20, offset=0, mode=None):
+        """
+        Recherche plein texte dans les messages, réponses et traductions.
+
+        Chaque mot de la requête doit apparaître (le dernier peut être un début de mot) ;
+        les résultats sont classés par pertinence puis du plus récent au plus ancien.
+
+        :param query: Texte saisi par l'utilisateur
+        :param limit: Taille de la page de résultats
+        :param offset: Nombre de résultats à sauter (pagination)
+        :param mode: Restreindre à un mode de conversation ('conversation' ou 'interprète')
+        :return: Liste de SearchResult
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        if self.full_text:
+            return self._search_fts(terms, limit, offset, mode)
+        return self._search_terms(terms, limit, offset, mode)
+
+    def _search_fts(self, terms, limit, offset, mode):
+        # Chaque terme est cité pour neutraliser la syntaxe FTS5 ; le dernier est un préfixe
+        match = ' '.join(f'"{term}"' for term in terms[:-1])
+        match = (match + f' "{terms[-1]}"*').strip()
+        reader = self._reader()
+
+        # Classer par pertinence (bm25) oblige à noter toutes les correspondances : au-delà d'un
+        # seuil, la requête est trop générale pour que ce classement ait un sens, on trie par date
+        probe = reader.execute(
+            "SELECT COUNT(*) FROM (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? LIMIT ?)",
+            (match, self.RANKED_SEARCH_LIMIT + 1)
+        ).fetchone()[0]
+        order = "messages_fts.rowid DESC" if probe > self.RANKED_SEARCH_LIMIT else "rank, messages_fts.rowid DESC"
+
+        query = "SELECT messages_fts.rowid FROM messages_fts"
+        params = [match]
+        if mode is not None:
+            query += """
+                JOIN messages m ON m.id = messages_fts.rowid
+                JOIN conversations c ON c.id = m.conversation_id"""
+        query += " WHERE messages_fts MATCH ?"
+        if mode is not None:
+            query += " AND c.mode = ?"
+            params.append(mode)
+        query += f" ORDER BY {order} LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        ids = [row[0] for row in reader.execute(query, params).fetchall()]
+        return self._load_results(ids, terms)
+
+    def _load_results(self, ids, terms):
+        """Charge le contexte des messages d'une page de résultats, dans l'ordre donné"""
+        if not ids:
+            return []
+        rows = self._reader().execute(f"""
+            SELECT {SEARCH_COLUMNS}
+            FROM messages m JOIN conversations c ON c.id = m.conversation_id
+            WHERE m.id IN ({','.join('?' * len(ids))})""", ids
+        ).fetchall()
+        position = {message_id: index for index, message_id in enumerate(ids)}
+        rows.sort(key=lambda row: position[row[0]])
+        # Extraits calculés uniquement pour la page demandée
+        return [SearchResult(*row, snippet=make_snippet(row[3], terms)) for row in rows]
+
+    def _search_terms(self, terms, limit, offset, mode):
+        exact = list(dict.fromkeys(terms[:-1]))
+        conditions = ["t.term = ?"] * len(exact) + ["t.term >= ? AND t.term < ?"]
+        params = exact + [terms[-1], terms[-1] + "\uffff"]
+        # Un même terme peut satisfaire un mot exact et le préfixe : les deux sont comptés séparément
+        query = f"""
+            SELECT {SEARCH_COLUMNS}
+            FROM (
+                SELECT t.message_id,
+                       COUNT(DISTINCT CASE WHEN t.term IN ({','.join('?' * len(exact)) or "''"}) THEN t.term END) AS hits,
+                       MAX(t.term >= ? AND t.term < ?) AS prefix_hit
+                FROM message_terms t
+                WHERE {' OR '.join(f'({condition})' for condition in conditions)}
+                GROUP BY t.message_id
+                HAVING hits = ? AND prefix_hit = 1
+            ) found
+            JOIN messages m ON m.id = found.message_id
+            JOIN conversations c ON c.id = m.conversation_id"""
+        params = exact + [terms[-1], terms[-1] + "\uffff"] + params + [len(exact)]
+        if mode is not None:
+            query += " WHERE c.mode = ?"
+            params.append(mode)
+        query += " ORDER BY m.id DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        rows = self._reader().execute(query, params).fetchall()
+        return [SearchResult(*row, snippet=make_snippet(row[3], terms)) for row in rows]
@@ -0,0 +1,262 @@
+"""
+Détection de langue servie par plusieurs processus qui partagent les mêmes paramètres de modèles.
+
+Les GMM sont préparés une fois (DiagonalGmm) et leurs tableaux écrits dans un seul fichier, projeté
+en mémoire en lecture seule par chaque processus de travail : les pages sont celles du cache du
+système, communes à tous les processus. Un processus supplémentaire ne recopie aucun modèle.
+
+Les processus de travail n'importent que numpy et gmm_scoring, chargés une fois dans le forkserver
+dont ils sont des copies : environ 6 Mo de mémoire privée mesurés par processus pour des MFCC (20 Mo
+avec spawn). librosa n'est chargé que pour des signaux (submit_signal) : environ 110 Mo de plus par
+processus, mieux vaut alors extraire les MFCC dans le processus appelant.
+
+Les extraits (signal ou MFCC) passent par la file d'attente d'un ProcessPoolExecutor.
+
+    # Débit et mémoire selon le nombre de processus
+    python detector_service.py --workers 1,2,4 --clips 64 [--input signal]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import weakref
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from gmm_scoring import DiagonalGmm, rank_scores, select_frames
+
+logger = logging.getLogger(__name__)
+
+ALIGNMENT = 64
+
+def pack_models(models, path, dtype=np.float32):
+    """
+    Écrit les tableaux préparés de chaque modèle dans un fichier brut.
+
+    :param models: Dictionnaire langue -> GaussianMixture diag
+    :param dtype: Type de stockage des paramètres (comme GmmSetScorer)
+    :return: Disposition : liste de (langue, champ, décalage en octets, forme, type)
+    """
+    layout = []
+    offset = 0
+    with open(path, 'wb') as f:
+        for language, model in models.items():
+            for field, array in DiagonalGmm.from_sklearn(model, dtype).arrays().items():
+                array = np.ascontiguousarray(array)
+                padding = -offset % ALIGNMENT
+                f.write(b'\0' * padding)
+                offset += padding
+                f.write(array.tobytes())
+                layout.append((language, field, offset, array.shape, array.dtype.str))
+                offset += array.nbytes
+    return layout
+
+def attach_models(path, layout):
+    """Modèles en lecture seule sur le fichier projeté en mémoire (aucune copie des paramètres)"""
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for language, field, offset, shape, dtype in layout:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        arrays.setdefault(language, {})[field] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                                                offset=offset).reshape(shape)
+    return {language: DiagonalGmm.from_arrays(**fields) for language, fields in arrays.items()}
+
+# État de chaque processus de travail, fixé par _initialize
+_worker = {}
+
+def _initialize(path, layout, frame_step, max_frames):
+    _worker['models'] = attach_models(path, layout)
+    _worker['frame_step'] = frame_step
+    _worker['max_frames'] = max_frames
+
+def _rank_mfcc(mfcc):
+    if mfcc is None or len(mfcc) == 0:
+        return []
+    mfcc = select_frames(mfcc, _worker['frame_step'], _worker['max_frames'])
+    models = _worker['models']
+    X = np.asarray(mfcc, dtype=next(iter(models.values())).compute_dtype)
+    return rank_scores({language: model.score(X) for language, model in models.items()})
+
+def _rank_signal(y, sr, max_duration):
+    # librosa n'est chargé que dans les processus qui reçoivent des signaux
+    from language_detector import extract_mfcc
+    return _rank_mfcc(extract_mfcc(y, sr, max_duration))
+
+def _worker_memory():
+    """
+    Mémoire du processus courant (Ko, Linux) : Private (pages propres au processus), Shared (pages
+    communes à plusieurs processus : fichier projeté, runtime hérité du forkserver) et Pss
+    """
+    memory = {'Private': 0, 'Shared': 0}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Private_Clean', 'Private_Dirty'):
+                    memory['Private'] += int(value.split()[0])
+                elif key in ('Shared_Clean', 'Shared_Dirty'):
+                    memory['Shared'] += int(value.split()[0])
+                elif key in ('Rss', 'Pss'):
+                    memory[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return os.getpid(), memory
+
+def _context(start_method):
+    """
+    Contexte multiprocessing des processus de travail. Par défaut forkserver (Linux) : le serveur
+    importe numpy et gmm_scoring une fois, chaque processus en est une copie qui partage ces pages ;
+    spawn ailleurs. Jamais de fork direct d'un processus qui a des threads Qt.
+    """
+    if start_method is None:
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(start_method)
+    if start_method == 'forkserver':
+        context.set_forkserver_preload(['numpy', 'gmm_scoring'])
+    return context
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+class DetectorService:
+    def __init__(self, models_dir="models_langues", workers=None, precision='float32', frame_step=1,
+                 max_frames=None, start_method=None):
+        """
+        Classement des langues dans un pool de processus partageant les paramètres des modèles.
+
+        S'utilise comme un LanguageDetector (rank_languages, rank_languages_from_signal), ou de façon
+        asynchrone avec submit_signal / submit_mfcc qui retournent des Future. Évaluation complète de
+        chaque modèle (pas d'UBM).
+
+        :param models_dir: Dossier des modèles .pkl
+        :param workers: Nombre de processus (par défaut : nombre de cœurs)
+        :param precision: Stockage des paramètres : 'float64', 'float32' ou 'float16'
+        :param frame_step: N'évaluer qu'une trame sur frame_step
+        :param max_frames: Nombre maximal de trames évaluées (None : toutes)
+        :param start_method: Démarrage des processus ('forkserver' par défaut s'il est disponible, sinon 'spawn')
+        """
+        from language_detector import LanguageDetector
+        models = LanguageDetector(models_dir, scoring='full').models
+        if not models:
+            raise OSError(f"aucun modèle dans {models_dir}")
+        self.languages = list(models)
+        handle, self.path = tempfile.mkstemp(prefix="language_models_", suffix=".bin")
+        os.close(handle)
+        # Fichier supprimé par shutdown, ou à la destruction du service / à la sortie de l'interpréteur
+        self._cleanup = weakref.finalize(self, _remove, self.path)
+        try:
+            self.layout = pack_models(models, self.path, precision)
+        except Exception:
+            self._cleanup()
+            raise
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=_context(start_method),
+            initializer=_initialize, initargs=(self.path, self.layout, frame_step, max_frames))
+        logger.info("Service de détection : %d processus, %d langues, %d octets de paramètres partagés",
+                    self.workers, len(self.languages), os.path.getsize(self.path))
+
+    def submit_mfcc(self, mfcc):
+        """Future du classement de MFCC (T, n_mfcc)"""
+        return self._executor.submit(_rank_mfcc, np.asarray(mfcc, dtype=np.float32))
+
+    def submit_signal(self, y, sr, max_duration=5):
+        """Future du classement d'un signal mono (MFCC extraits dans le processus de travail)"""
+        return self._executor.submit(_rank_signal, np.asarray(y, dtype=np.float32).reshape(-1), sr, max_duration)
+
+    def rank_languages(self, mfcc):
+        return self.submit_mfcc(mfcc).result()
+
+    def rank_languages_from_signal(self, y, sr, max_duration=1):
+        try:
+            return self.submit_signal(y, sr, max_duration).result()
+        except Exception as e:
+            logger.error("Erreur lors du classement des langues : %s", e)
+            return []
+
+    def warm_up(self, signal=False):
+        """
+        Démarre tous les processus ; retourne leur mémoire (pid -> Ko)
+
+        :param signal: Charger aussi librosa (extraction des MFCC dans les processus, submit_signal)
+        """
+        # Quelques classements par processus pour que les imports soient faits avant les mesures
+        n_features = next(shape[1] for _, field, _, shape, _ in self.layout if field == 'stored_means')
+        if signal:
+            task = (_rank_signal, np.zeros(2048, dtype=np.float32), 44100, 1)
+        else:
+            task = (_rank_mfcc, np.zeros((16, n_features), dtype=np.float32))
+        for future in [self._executor.submit(*task) for _ in range(self.workers * 4)]:
+            future.result()
+        return self.worker_memory()
+
+    def worker_memory(self):
+        """Mémoire des processus de travail (pid -> Ko, voir _worker_memory)"""
+        return dict(future.result() for future in [self._executor.submit(_worker_memory)
+                                                   for _ in range(self.workers * 4)])
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+def main(argv=None):
+    from language_detector import SAMPLE_RATE, extract_mfcc
+    parser = argparse.ArgumentParser(description="Débit du service de détection selon le nombre de processus")
+    parser.add_argument('--models-dir', default="models_langues")
+    parser.add_argument('--workers', default="1,2,4", help="Nombres de processus comparés (séparés par des virgules)")
+    parser.add_argument('--clips', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--precision', default='float32')
+    parser.add_argument('--input', choices=('mfcc', 'signal'), default='mfcc',
+                        help="MFCC extraits ici (processus sans librosa) ou signaux extraits dans les processus")
+    parser.add_argument('--start-method', default=None, help="forkserver (défaut sous Linux) ou spawn")
+    options = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(options.seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    clips = [(0.3 * np.sin(2 * np.pi * rng.uniform(100, 250) * t) + 0.02 * rng.standard_normal(t.size))
+             .astype(np.float32) for _ in range(8)]
+    signal = options.input == 'signal'
+    if not signal:
+        features = [extract_mfcc(clip, SAMPLE_RATE) for clip in clips]
+
+    print(f"{'processus':>9s} {'extraits/s':>11s} {'accélération':>13s} {'privé/processus':>16s} "
+          f"{'partagé':>9s} {'PSS':>9s}")
+    baseline = None
+    for workers in (int(part) for part in options.workers.split(',')):
+        with DetectorService(options.models_dir, workers=workers, precision=options.precision,
+                             start_method=options.start_method) as service:
+            service.warm_up(signal)
+            start = time.perf_counter()
+            if signal:
+                futures = [service.submit_signal(clips[i % len(clips)], SAMPLE_RATE, options.seconds)
+                           for i in range(options.clips)]
+            else:
+                futures = [service.submit_mfcc(features[i % len(features)]) for i in range(options.clips)]
+            for future in futures:
+                future.result()
+            rate = options.clips / (time.perf_counter() - start)
+            memory = service.worker_memory()
+        baseline = baseline or rate
+        private, shared, pss = (np.mean([values.get(key, 0) for values in memory.values()]) / 1024
+                                for key in ('Private', 'Shared', 'Pss'))
+        print(f"{workers:9d} {rate:11.1f} {rate / baseline:12.2f}x {private:13.1f} Mo {shared:6.1f} Mo "
+              f"{pss:6.1f} Mo")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,203 @@
+import re
+import math
+import time
+import logging
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Mots trop fréquents dans les questions pour distinguer deux entrées
+STOP_WORDS = {'le', 'la', 'les', 'l', 'un', 'une', 'des', 'de', 'du', 'd', 'a', 'au', 'et', 'en',
+              'ce', 'c', 'est', 'que', 'qu', 'me', 'moi', 'stp', 'svp', 'plait', 's', 'il', 'vous'}
+
+# Mots de la tournure d'une question : leur absence dans l'entrée ne change pas ce qui est demandé
+QUESTION_WORDS = {'qui', 'quoi', 'quel', 'quelle', 'quels', 'quelles', 'comment', 'tu', 't', 'te', 'toi',
+                  'ton', 'ta', 'tes', 'es', 'dis', 'dire', 'peux', 'pourrais', 'sais', 'j', 'je', 'aimerais',
+                  'voudrais', 'savoir', 'donc', 'alors'}
+
+def normalize(text):
+    """Minuscules, sans accents ni ponctuation"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+def content_words(text):
+    """Mots porteurs du sujet de la question (ni mots vides ni tournure interrogative)"""
+    return {word for word in normalize(text).split() if word not in STOP_WORDS and word not in QUESTION_WORDS}
+
+def _trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def features(text):
+    """Mots (hors mots vides) et trigrammes de caractères de chaque mot"""
+    result = {}
+    for word in normalize(text).split():
+        if word in STOP_WORDS:
+            continue
+        result[f"w:{word}"] = result.get(f"w:{word}", 0) + 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            gram = padded[i:i + 3]
+            result[gram] = result.get(gram, 0) + 1
+    return result
+
+class FaqEntry:
+    __slots__ = ('question', 'answer', 'vector', 'words')
+
+    def __init__(self, question, answer):
+        self.question = question
+        self.answer = answer
+        self.vector = None
+        self.words = content_words(question)
+
+    def covers(self, question):
+        """
+        Chaque mot porteur de la question apparaît dans l'entrée (à une faute de frappe près) :
+        "Que peux-tu faire en Python ?" est proche de "Que peux-tu faire ?" mais ne demande pas la même chose.
+        """
+        for word in content_words(question) - self.words:
+            grams = _trigrams(word)
+            if not any(len(grams & _trigrams(known)) / len(grams | _trigrams(known)) >= 0.5 for known in self.words):
+                return False
+        return True
+
+class FaqCache:
+    def __init__(self, entries, threshold=0.75):
+        """
+        Index TF-IDF (mots et trigrammes de caractères) sur des paires question / réponse canoniques.
+
+        Une question suffisamment proche d'une question connue (similarité cosinus >= threshold), dont
+        tous les mots porteurs figurent dans cette question connue, reçoit directement la réponse
+        associée, sans appel au LLM.
+
+        :param entries: Liste de FaqEntry
+        :param threshold: Similarité minimale pour répondre depuis l'index
+        """
+        self.entries = list(entries)
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.lookup_time = 0.0
+        self._lock = threading.Lock()
+
+        document_frequency = {}
+        vectors = [features(entry.question) for entry in self.entries]
+        for vector in vectors:
+            for feature in vector:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+        count = len(self.entries)
+        self.idf = {feature: math.log((1 + count) / (1 + frequency)) + 1
+                    for feature, frequency in document_frequency.items()}
+        # Poids d'un terme absent de l'index : sa présence éloigne la requête de toutes les entrées
+        self.unknown_idf = math.log(1 + count) + 1
+
+        # Index inversé terme -> [(entrée, poids)]
+        self.postings = {}
+        for index, (entry, vector) in enumerate(zip(self.entries, vectors)):
+            entry.vector = self._weigh(vector)
+            for feature, weight in entry.vector.items():
+                self.postings.setdefault(feature, []).append((index, weight))
+
+    def _weigh(self, counts):
+        vector = {feature: (1 + math.log(count)) * self.idf.get(feature, self.unknown_idf)
+                  for feature, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        return {feature: weight / norm for feature, weight in vector.items()}
+
+    def match(self, question):
+        """Meilleure entrée et sa similarité (None, 0.0 si l'index est vide ou la question sans terme)"""
+        query = self._weigh(features(question))
+        scores = {}
+        for feature, weight in query.items():
+            for index, entry_weight in self.postings.get(feature, ()):
+                scores[index] = scores.get(index, 0.0) + weight * entry_weight
+        if not scores:
+            return None, 0.0
+        best = max(scores, key=scores.get)
+        return self.entries[best], scores[best]
+
+    def lookup(self, question):
+        """Réponse canonique si la question est reconnue, sinon None (compté dans les statistiques)"""
+        start = time.perf_counter()
+        entry, score = self.match(question)
+        hit = entry is not None and score >= self.threshold and entry.covers(question)
+        with self._lock:
+            self.lookup_time += time.perf_counter() - start
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if hit:
+            logger.debug("Réponse FAQ pour %r (%.2f, question %r)", question, score, entry.question)
+            return entry.answer
+        return None
+
+    def stats(self):
+        """Nombre de consultations, taux de réponse et temps moyen par consultation (ms)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'lookups': lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'mean_ms': self.lookup_time / lookups * 1000 if lookups else 0.0,
+            }
+
+    @classmethod
+    def from_identity(cls, text, **kwargs):
+        return cls(identity_entries(text), **kwargs)
+
+def _clean(line):
+    """Ligne markdown sans émojis, gras, citations ni puces"""
+    line = "".join(char for char in line
+                   if unicodedata.category(char) not in ('So', 'Sk', 'Cf') and char not in '\ufe0e\ufe0f')
+    return re.sub(r'\s+', ' ', line.replace('**', '')).strip().lstrip('#>*- ').strip()
+
+def identity_entries(text):
+    """
+    Paires question / réponse canoniques tirées du fichier d'identité : questions d'identité
+    (réponse donnée mot pour mot), mission, fondateurs et présentation de chacun d'eux.
+    """
+    sections = {}
+    title = None
+    for raw in text.splitlines():
+        line = _clean(raw)
+        if not line or set(line) <= {'-', '_'}:
+            continue
+        if raw.lstrip().startswith('#'):
+            title = line
+            sections[title] = []
+        elif title is not None:
+            sections[title].append(line)
+
+    entries = []
+    for title, lines in sections.items():
+        quoted = [line.strip('"“”,') for line in lines if line.startswith('"')]
+        if title.lower().startswith('quand on me pose') and len(quoted) > 1:
+            # Questions types puis réponse canonique, entre guillemets
+            answer = quoted[-1]
+            questions = quoted[:-1] + ["Comment tu t'appelles ?", "Quel est ton nom ?", "Présente-toi",
+                                       "Tu es qui ?", "Qui t'a créé ?"]
+            entries.extend(FaqEntry(question, answer) for question in questions)
+        elif title.lower().endswith('ma mission'):
+            intro = [line for line in lines if line.endswith(':')]
+            items = [line for line in lines if not line.endswith(':')]
+            answer = f"{intro[0] if intro else 'Ma mission :'} {', '.join(items)}."
+            entries.extend(FaqEntry(question, answer) for question in
+                           ("Quelle est ta mission ?", "À quoi sers-tu ?", "Que peux-tu faire ?"))
+        elif '—' in title:
+            # Présentation d'un fondateur : "Nom — Rôle" suivi de sa biographie
+            name, role = (part.strip() for part in title.split('—', 1))
+            answer = f"{name} est {role} d'AryadAcademie. {' '.join(lines)}"
+            entries.extend(FaqEntry(question, answer) for question in
+                           (f"Qui est {name} ?", f"Qui est le {role} d'AryadAcademie ?"))
+
+    founders = [title.split('—')[0].strip() for title in sections if '—' in title]
+    if founders:
+        answer = (f"AryadAcademie a été fondée par {', '.join(founders[:-1])} et {founders[-1]}."
+                  if len(founders) > 1 else f"AryadAcademie a été fondée par {founders[0]}.")
+        entries.extend(FaqEntry(question, answer) for question in
+                       ("Qui sont les fondateurs d'AryadAcademie ?", "Qui a fondé AryadAcademie ?"))
+    return entries
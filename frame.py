@@ -1,193 +1,220 @@
-from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, QPoint, QRectF
+import sys
+import startup_profiler
+if __name__ == "__main__":
+    # --profile-startup : chronométrer tous les imports qui suivent, Qt compris
+    startup_profiler.install_from_argv(sys.argv)
+from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, QPoint, QRectF, Signal, QObject, QEvent
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, QVBoxLayout, 
                               QHBoxLayout, QPushButton, QTextEdit, QFileDialog, QMessageBox,
-                              QScrollArea, QSizePolicy, QCheckBox, QComboBox, QStackedWidget, QDialog)
+                              QSizePolicy, QCheckBox, QComboBox, QStackedWidget, QDialog,
+                              QLineEdit, QListWidget, QListWidgetItem)
 from PySide6.QtGui import QPixmap, QIcon, QColor, QPainter, QFontMetrics, QLinearGradient
-import sys
+import os
 import math
-from gemini_agent import GeminiAgent
-from audio_handler import AudioHandler
+import time
+import logging
+from chat_view import ChatHistoryModel, ChatHistoryView
+from animation_clock import shared_clock
+from conversation_store import ConversationStore
+from service_loader import ServiceLoader
+from turn_tracer import shared_tracer
+from app_logging import setup_logging
+# gemini_agent (langchain), audio_handler et language_detector (librosa) sont importés
+# en arrière-plan par les fabriques de frame, après l'affichage de la fenêtre
+
+# Référence des mesures de démarrage
+STARTED_AT = time.perf_counter()
+
+logger = logging.getLogger(__name__)
 
-class MessageWidget(QWidget):
-    def __init__(self, text, is_user=True, parent=None):
-        super().__init__(parent)
-        layout = QVBoxLayout()
-        layout.setContentsMargins(0, 0, 0, 0)
-        self.setLayout(layout)
-        
-        message = QLabel(text)
-        message.setWordWrap(True)
-        message.setStyleSheet(f"""
-            QLabel {{
-                background-color: {'#2B2D42' if is_user else '#1E1F2B'};
-                color: {'#E2E8F0' if is_user else '#F8FAFC'};
-                padding: 12px 16px;
-                border-radius: 12px;
-                font-size: 14px;
-                max-width: 700px;
-                border: 1px solid {'#3B3D52' if is_user else '#2A2B3A'};
-            }}
-        """)
-        
-        # Align the message to the left or right
-        alignment = Qt.AlignRight if is_user else Qt.AlignLeft
-        container = QWidget()
-        container_layout = QHBoxLayout()
-        container_layout.setContentsMargins(0, 0, 0, 0)
-        container.setLayout(container_layout)
-
-        if is_user:
-            container_layout.addStretch()
-            container_layout.addWidget(message)
-        else:
-            container_layout.addWidget(message)
-            container_layout.addStretch()
+class RecordingAnimation(QWidget):
+    NUM_BARS = 40  # Plus de barres pour un effet plus détaillé
+    BAR_SPACING = 3
+    LEVELS = 32  # Hauteurs quantifiées : une image pré-rendue par niveau
 
-        layout.addWidget(container)
+    # Cadences (ms) selon l'activité
+    LIVE_INTERVAL = 30     # Niveaux réels du micro
+    IDLE_INTERVAL = 60     # Animation décorative (synthèse vocale)
+    STATIC_INTERVAL = 200  # Rien ne bouge depuis plusieurs ticks
+    HIDDEN_INTERVAL = 500  # Fenêtre réduite
+    STATIC_TICKS = 10
 
-class TypingIndicator(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setFixedSize(50, 30)
-        self._dots = 0
-        self.timer = QTimer()
-        self.timer.timeout.connect(self._animate_dots)
-        self.timer.start(500)
-        self.dot_color = QColor(200, 200, 200)
-
-    def _animate_dots(self):
-        self._dots = (self._dots + 1) % 4
-        self.update()
-
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.setBrush(self.dot_color)
-        painter.setPen(Qt.NoPen)
-
-        dot_radius = 4
-        spacing = 8
-        start_x = (self.width() - (3 * dot_radius * 2 + 2 * spacing)) // 2 + dot_radius
-        center_y = self.height() // 2
-
-        for i in range(3):
-            if i < self._dots:
-                x = start_x + i * (dot_radius * 2 + spacing)
-                painter.drawEllipse(x - dot_radius, center_y - dot_radius, dot_radius * 2, dot_radius * 2)
-        painter.end()
-
-class TypingLabel(QLabel):
-    def __init__(self, text, parent=None):
-        super().__init__(parent)
-        self._full_text = text
-        self._displayed_text = ""
-        self._index = 0
-        self._timer = QTimer()
-        self._timer.timeout.connect(self._add_character)
-        self.setWordWrap(True)
-        self.setStyleSheet("color: white; font-size: 14px;")
-        self.setText("")
-
-    def start_typing(self, interval=50):
-        self._index = 0
-        self._displayed_text = ""
-        self._timer.start(interval)
-
-    def _add_character(self):
-        if self._index < len(self._full_text):
-            self._displayed_text += self._full_text[self._index]
-            self.setText(self._displayed_text)
-            self._index += 1
-        else:
-            self._timer.stop()
-
-class RecordingAnimation(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setFixedSize(300, 80)  # Augmenté la taille pour un meilleur effet
         self.time = 0
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_animation)
+        # Cadencé par l'horloge commune, inscrit uniquement quand le widget est actif et visible
+        self._clock = shared_clock()
+        self._animation = None
+        self._interval = self.LIVE_INTERVAL
         self.bar_color = QColor(100, 149, 237)  # Couleur bleu clair
         self.background_color = QColor(52, 53, 65)
         self.audio_handler = None
+        self.active = False
         
-        # Effet de gradient pour les barres
-        self.gradient = QLinearGradient(0, 0, 0, self.height())
-        self.gradient.setColorAt(0, QColor(100, 149, 237))  # Bleu clair en haut
-        self.gradient.setColorAt(1, QColor(70, 130, 180))   # Bleu plus foncé en bas
+        # Cache de rendu, reconstruit quand la taille change
+        self._background = None
+        self._sprites = {}
+        self._levels = [0] * self.NUM_BARS
+        self._static_ticks = 0
         
     def set_audio_handler(self, handler):
         self.audio_handler = handler
         
     def start(self):
         self.time = 0
-        self.timer.start(30)  # Mise à jour plus rapide pour une animation plus fluide
+        self.active = True
+        self._static_ticks = 0
+        self._set_interval(self.LIVE_INTERVAL)
         self.show()
+        self._attach()
         
     def stop(self):
-        self.timer.stop()
+        self.active = False
+        self._detach()
         self.hide()
-        
-    def update_animation(self):
-        self.time += 1
-        self.update()
-        
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # Dessiner le fond avec un léger dégradé
-        bg_gradient = QLinearGradient(0, 0, 0, self.height())
-        bg_gradient.setColorAt(0, QColor(52, 53, 65))
-        bg_gradient.setColorAt(1, QColor(45, 46, 58))
-        painter.fillRect(self.rect(), bg_gradient)
-        
-        # Paramètres des ondes
-        num_bars = 40  # Plus de barres pour un effet plus détaillé
-        bar_spacing = 3
-        bar_width = (self.width() - (num_bars - 1) * bar_spacing) // num_bars
+
+    def showEvent(self, event):
+        if self.active:
+            self._attach()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        # Aucun tick tant que le widget n'est pas visible
+        self._detach()
+        super().hideEvent(event)
+
+    def _attach(self):
+        if self._animation is None:
+            self._animation = self._clock.register(self.update_animation, self._interval, owner=self)
+
+    def _detach(self):
+        self._clock.unregister(self._animation)
+        self._animation = None
+
+    def resizeEvent(self, event):
+        self._background = None
+        self._sprites = {}
+        super().resizeEvent(event)
+
+    def _set_interval(self, interval):
+        self._interval = interval
+        self._clock.set_interval(self._animation, interval)
+
+    def _bar_geometry(self):
+        bar_width = (self.width() - (self.NUM_BARS - 1) * self.BAR_SPACING) // self.NUM_BARS
         if bar_width <= 0: bar_width = 1
+        return bar_width, self.height() * 0.7
+
+    def _compute_levels(self):
+        """Niveaux quantifiés (0..LEVELS) de chaque barre pour le tick courant"""
+        live = self.audio_handler is not None and self.audio_handler.recording
+        if live:
+            # Chaque barre affiche une bande de fréquence réelle
+            bands = self.audio_handler.get_meter_snapshot().bands
+            values = [bands[i * len(bands) // self.NUM_BARS] for i in range(self.NUM_BARS)]
+        else:
+            # Animation par défaut plus sophistiquée
+            t = self.time * 0.05
+            values = []
+            for i in range(self.NUM_BARS):
+                phase = i * 0.2
+                h1 = 0.4 * math.sin(t + phase)
+                h2 = 0.2 * math.sin(t * 1.5 + phase * 1.2)
+                values.append(min(abs(h1 + h2), 1.0))
+        return live, [int(round(v * self.LEVELS)) for v in values]
         
-        max_height = self.height() * 0.7
-        center_y = self.height() // 2
+    def update_animation(self):
+        if self.window().isMinimized():
+            self._set_interval(self.HIDDEN_INTERVAL)
+            return
+            
+        live, levels = self._compute_levels()
+        # Le temps de l'animation décorative avance proportionnellement à la cadence
+        self.time += self._interval / self.LIVE_INTERVAL
         
-        painter.setPen(Qt.NoPen)
+        changed = [i for i, (old, new) in enumerate(zip(self._levels, levels)) if old != new]
+        self._levels = levels
         
-        for i in range(num_bars):
-            x_pos = i * (bar_width + bar_spacing)
-            
-            if self.audio_handler and self.audio_handler.recording:
-                # Utiliser le niveau audio réel avec une courbe plus naturelle
-                audio_level = self.audio_handler.get_audio_level()
-                # Appliquer une courbe d'easing pour un mouvement plus naturel
-                bar_height = max_height * (audio_level ** 0.5)
-            else:
-                # Animation par défaut plus sophistiquée
-                t = self.time * 0.05
-                phase = i * 0.2
-                amplitude1 = max_height * 0.4
-                amplitude2 = max_height * 0.2
-                h1 = amplitude1 * math.sin(t + phase)
-                h2 = amplitude2 * math.sin(t * 1.5 + phase * 1.2)
-                bar_height = abs(h1 + h2)
-                bar_height = min(bar_height, max_height)
-
-            # Créer un effet de barre arrondie
-            bar_rect = QRectF(x_pos, center_y - bar_height / 2, bar_width, bar_height)
+        if changed:
+            self._static_ticks = 0
+            # Ne repeindre que la bande horizontale couverte par les barres modifiées
+            bar_width, _ = self._bar_geometry()
+            x_start = changed[0] * (bar_width + self.BAR_SPACING)
+            x_end = changed[-1] * (bar_width + self.BAR_SPACING) + bar_width
+            self.update(x_start, 0, x_end - x_start, self.height())
+        else:
+            self._static_ticks += 1
             
-            # Appliquer le gradient
-            painter.setBrush(self.gradient)
+        if self._static_ticks >= self.STATIC_TICKS:
+            self._set_interval(self.STATIC_INTERVAL)
+        else:
+            self._set_interval(self.LIVE_INTERVAL if live else self.IDLE_INTERVAL)
+
+    def _new_pixmap(self, width, height):
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(max(1, int(width * ratio)), max(1, int(height * ratio)))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        return pixmap
+
+    def _background_pixmap(self):
+        if self._background is None:
+            # Dessiner le fond avec un léger dégradé
+            self._background = self._new_pixmap(self.width(), self.height())
+            painter = QPainter(self._background)
+            bg_gradient = QLinearGradient(0, 0, 0, self.height())
+            bg_gradient.setColorAt(0, QColor(52, 53, 65))
+            bg_gradient.setColorAt(1, QColor(45, 46, 58))
+            painter.fillRect(QRectF(0, 0, self.width(), self.height()), bg_gradient)
+            painter.end()
+        return self._background
+
+    def _sprite(self, level):
+        """Barre pré-rendue (dégradé, coins arrondis, brillance) pour un niveau donné"""
+        sprite = self._sprites.get(level)
+        if sprite is None:
+            bar_width, max_height = self._bar_geometry()
+            bar_height = max(1.0, max_height * level / self.LEVELS)
+            top = self.height() / 2 - bar_height / 2
+            sprite = self._new_pixmap(bar_width, math.ceil(bar_height))
+            painter = QPainter(sprite)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            bar_rect = QRectF(0, 0, bar_width, bar_height)
             
-            # Dessiner la barre avec des coins arrondis
+            # Le dégradé des barres est exprimé dans le repère du widget
+            gradient = QLinearGradient(0, -top, 0, self.height() - top)
+            gradient.setColorAt(0, QColor(100, 149, 237))  # Bleu clair en haut
+            gradient.setColorAt(1, QColor(70, 130, 180))   # Bleu plus foncé en bas
+            painter.setBrush(gradient)
             painter.drawRoundedRect(bar_rect, bar_width / 2, bar_width / 2)
             
             # Ajouter un effet de brillance
-            highlight = QLinearGradient(0, bar_rect.top(), 0, bar_rect.bottom())
+            highlight = QLinearGradient(0, 0, 0, bar_height)
             highlight.setColorAt(0, QColor(255, 255, 255, 30))
             highlight.setColorAt(1, QColor(255, 255, 255, 0))
             painter.setBrush(highlight)
             painter.drawRoundedRect(bar_rect, bar_width / 2, bar_width / 2)
+            painter.end()
+            self._sprites[level] = sprite
+        return sprite
+        
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        dirty = event.rect()
+        # Le peintre est déjà restreint à la zone invalidée : seul ce morceau du fond est recopié
+        painter.drawPixmap(0, 0, self._background_pixmap())
+        
+        bar_width, max_height = self._bar_geometry()
+        center_y = self.height() / 2
+        
+        for i, level in enumerate(self._levels):
+            x_pos = i * (bar_width + self.BAR_SPACING)
+            if x_pos + bar_width < dirty.left() or x_pos > dirty.right() or level == 0:
+                continue
+            bar_height = max_height * level / self.LEVELS
+            painter.drawPixmap(QPoint(x_pos, int(center_y - bar_height / 2)), self._sprite(level))
 
         painter.end()
 
@@ -318,7 +345,7 @@ class AccountSettingsWidget(QWidget):
         
     def show_confirmation_message(self, message):
         """Affiche un message de confirmation pendant 3 secondes"""
-        print("Affichage du message de confirmation")  # Debug
+        logger.debug("Affichage du message de confirmation")
         self.confirmation_label.setText(message)
         self.confirmation_label.show()
         self.confirmation_label.raise_()
@@ -329,17 +356,17 @@ class AccountSettingsWidget(QWidget):
         
     def hide_confirmation_message(self):
         """Cache le message de confirmation"""
-        print("Masquage du message de confirmation")  # Debug
+        logger.debug("Masquage du message de confirmation")
         self.confirmation_label.hide()
         # Forcer la mise à jour de l'interface
         QApplication.processEvents()
         
     def on_save_clicked(self):
-        print("Bouton Enregistrer cliqué")  # Debug
+        logger.debug("Bouton Enregistrer cliqué")
         try:
             is_interpreter = self.interpreter_checkbox.isChecked()
             selected_language = self.language_combo.currentText()
-            print(f"Interprète: {is_interpreter}, Langue: {selected_language}")  # Debug
+            logger.debug("Interprète: %s, Langue: %s", is_interpreter, selected_language)
             
             # Obtenir la fenêtre principale (instance de frame)
             main_window = None
@@ -349,7 +376,7 @@ class AccountSettingsWidget(QWidget):
                     break
             
             if main_window:
-                print("Fenêtre principale trouvée")  # Debug
+                logger.debug("Fenêtre principale trouvée")
                 
                 # Afficher d'abord le message de confirmation
                 message = f"Le mode interprète a été activé.\nLangue cible : {selected_language}" if is_interpreter else "Le mode conversationnel a été activé."
@@ -359,26 +386,120 @@ class AccountSettingsWidget(QWidget):
                 def continue_operations():
                     # Mettre à jour l'agent
                     main_window.update_agent_mode(is_interpreter, selected_language)
-                    print("Agent mis à jour")  # Debug
+                    logger.debug("Agent mis à jour")
                     
                     # Effacer les conversations
                     main_window.clear_conversations()
-                    print("Conversations effacées")  # Debug
+                    logger.debug("Conversations effacées")
                     
                     # Retourner à la vue principale
-                    main_window.stacked_widget.setCurrentWidget(main_window.scroll_area)
-                    print("Retour à la vue principale")  # Debug
+                    main_window.stacked_widget.setCurrentWidget(main_window.chat_view)
+                    logger.debug("Retour à la vue principale")
                 
                 QTimer.singleShot(3000, continue_operations)
             else:
-                print("Fenêtre principale non trouvée")  # Debug
+                logger.debug("Fenêtre principale non trouvée")
                 self.show_confirmation_message("Erreur : Impossible de trouver la fenêtre principale")
                 
         except Exception as e:
-            print(f"Erreur: {str(e)}")  # Debug
+            logger.error("Erreur: %s", e)
             # Afficher le message d'erreur
             self.show_confirmation_message(f"Une erreur est survenue : {str(e)}")
 
+class SearchResultsWidget(QWidget):
+    PAGE_SIZE = 20
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.query = ""
+        self.offset = 0
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout()
+        layout.setSpacing(15)
+        layout.setContentsMargins(40, 40, 40, 40)
+
+        self.title = QLabel("Recherche")
+        self.title.setStyleSheet("""
+            QLabel {
+                color: #E2E8F0;
+                font-size: 20px;
+                font-weight: bold;
+            }
+        """)
+        layout.addWidget(self.title)
+
+        self.results = QListWidget()
+        self.results.setWordWrap(True)
+        self.results.setStyleSheet("""
+            QListWidget {
+                background-color: #1A1B26;
+                border: none;
+                color: #E2E8F0;
+                font-size: 13px;
+            }
+            QListWidget::item {
+                background-color: #2B2D42;
+                border: 1px solid #3B3D52;
+                border-radius: 8px;
+                padding: 10px;
+                margin-bottom: 8px;
+            }
+            QListWidget::item:hover {
+                background-color: #3B3D52;
+            }
+        """)
+        layout.addWidget(self.results, 1)
+
+        self.more_button = QPushButton("Plus de résultats")
+        self.more_button.setStyleSheet("""
+            QPushButton {
+                background-color: #C6C7F8;
+                color: black;
+                border: none;
+                border-radius: 8px;
+                padding: 8px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #B5B6E8;
+            }
+        """)
+        self.more_button.clicked.connect(self.load_more)
+        self.more_button.hide()
+        layout.addWidget(self.more_button, alignment=Qt.AlignCenter)
+
+        self.setLayout(layout)
+
+    def search(self, query):
+        """Lance une nouvelle recherche (première page)"""
+        self.query = query
+        self.offset = 0
+        self.results.clear()
+        self.load_more()
+
+    def load_more(self):
+        """Ajoute la page de résultats suivante"""
+        started = time.perf_counter()
+        page = self.store.search(self.query, limit=self.PAGE_SIZE, offset=self.offset)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.offset += len(page)
+
+        for result in page:
+            if result.is_translation:
+                author = f"Traduction ({result.target_language})"
+            else:
+                author = {'user': "Vous", 'notice': "Application"}.get(result.role, "AryadAI")
+            date = time.strftime("%d/%m/%Y %H:%M", time.localtime(result.created_at))
+            item = QListWidgetItem(f"{author} · {date}\n{result.snippet}")
+            item.setData(Qt.UserRole, (result.conversation_id, result.message_id))
+            self.results.addItem(item)
+
+        self.title.setText(f"Recherche : « {self.query} » — {self.results.count()} résultat(s) ({elapsed:.0f} ms)")
+        self.more_button.setVisible(len(page) == self.PAGE_SIZE)
+
 class CustomMessageWindow(QWidget):
     def __init__(self, parent=None, title="", message=""):
         super().__init__(parent, Qt.Window | Qt.FramelessWindowHint)
@@ -438,16 +559,16 @@ class CustomMessageWindow(QWidget):
                      parent.y() + (parent.height() - self.height()) // 2)
 
     def save_settings(self):
-        print("Méthode save_settings appelée")  # Debug
+        logger.debug("Méthode save_settings appelée")
         try:
             is_interpreter = self.interpreter_checkbox.isChecked()
             selected_language = self.language_combo.currentText()
-            print(f"Interprète: {is_interpreter}, Langue: {selected_language}")  # Debug
+            logger.debug("Interprète: %s, Langue: %s", is_interpreter, selected_language)
             
             # Mettre à jour l'agent
             if hasattr(self.parent(), 'update_agent_mode'):
                 self.parent().update_agent_mode(is_interpreter, selected_language)
-                print("Agent mis à jour")  # Debug
+                logger.debug("Agent mis à jour")
                 
                 # Obtenir la fenêtre principale
                 main_window = None
@@ -456,7 +577,7 @@ class CustomMessageWindow(QWidget):
                         main_window = widget
                         break
                 
-                print(f"Fenêtre principale trouvée : {main_window}")  # Debug
+                logger.debug("Fenêtre principale trouvée : %s", main_window)
                 
                 if main_window:
                     # Créer la fenêtre de message personnalisée
@@ -464,7 +585,7 @@ class CustomMessageWindow(QWidget):
                     message_window = CustomMessageWindow(main_window, "Modifications enregistrées", message)
                     
                     # Forcer l'affichage de la fenêtre
-                    print("Tentative d'affichage de la fenêtre de message")  # Debug
+                    logger.debug("Tentative d'affichage de la fenêtre de message")
                     message_window.show()
                     message_window.raise_()
                     message_window.activateWindow()
@@ -474,13 +595,13 @@ class CustomMessageWindow(QWidget):
                     
                     # Retourner à la vue principale
                     if hasattr(self.parent(), 'stacked_widget'):
-                        self.parent().stacked_widget.setCurrentWidget(self.parent().scroll_area)
-                        print("Retour à la vue principale")  # Debug
+                        self.parent().stacked_widget.setCurrentWidget(self.parent().chat_view)
+                        logger.debug("Retour à la vue principale")
                 else:
-                    print("Fenêtre principale non trouvée")  # Debug
+                    logger.debug("Fenêtre principale non trouvée")
                     
         except Exception as e:
-            print(f"Erreur: {str(e)}")  # Debug
+            logger.error("Erreur: %s", e)
             # Afficher une fenêtre d'erreur
             main_window = None
             for widget in QApplication.topLevelWidgets():
@@ -495,9 +616,39 @@ class CustomMessageWindow(QWidget):
                 error_window.activateWindow()
                 QApplication.processEvents()
             else:
-                print("Impossible d'afficher la fenêtre d'erreur : fenêtre principale non trouvée")  # Debug
+                logger.error("Impossible d'afficher la fenêtre d'erreur : fenêtre principale non trouvée")
+
+class FirstPaintFilter(QObject):
+    """Filtre d'application qui signale le premier rendu d'une fenêtre"""
+    def __init__(self, window, callback):
+        super().__init__(window)
+        self.window = window
+        self.callback = callback
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and isinstance(obj, QWidget) and obj.window() is self.window:
+            QApplication.instance().removeEventFilter(self)
+            self.callback()
+        return False
 
 class frame(QMainWindow):
+    HISTORY_PAGE_SIZE = 50
+    STARTUP_PROFILE_TIMEOUT = 120000  # ms, au-delà le rapport est écrit sans la mesure 'ready'
+    
+    # Sous-systèmes initialisés en arrière-plan et affichés dans la barre latérale
+    SERVICE_LABELS = {
+        'agent': "Agent",
+        'voice': "Voix",
+        'microphone': "Micro",
+        'detector': "Langue",
+    }
+    
+    # Émis depuis le thread de synthèse vocale, traité dans le thread de l'interface
+    synthesis_finished = Signal()
+    # Émis depuis la pipeline d'interprétation continue : type ('transcript', 'translation'), texte
+    interpretation_event = Signal(object, str, str)  # conversation de la pipeline, type, texte
+
+    @startup_profiler.timed('frame.__init__')
     def __init__(self) -> None:
         super().__init__()
         self.principal = QWidget()
@@ -506,18 +657,31 @@ class frame(QMainWindow):
         self.principal.setLayout(self.layout_principale)
         self.setCentralWidget(self.principal)
         
-        # Initialiser l'agent Gemini
-        try:
-            self.gemini_agent = GeminiAgent()
-        except Exception as e:
-            QMessageBox.critical(self, "Erreur", f"Erreur lors de l'initialisation de Gemini : {str(e)}")
-            sys.exit(1)
-            
-        # Initialiser le gestionnaire audio
-        self.audio_handler = AudioHandler()
+        # Agent, audio et détecteur de langue arrivent en arrière-plan (voir on_service_ready)
+        self.gemini_agent = None
+        self.audio_handler = None
+        self.language_detector = None
+        self.service_states = {name: 'loading' for name in self.SERVICE_LABELS}
+        self._pending_messages = []   # Messages envoyés avant que l'agent soit prêt
+
+        # Images jointes : préparées en arrière-plan, envoyées avec le message suivant
+        self.image_pipeline = None
+        self._image_requests = {}     # Demande en cours -> message de la conversation qui affichera la vignette
+        self._pending_images = []     # ImagePayload prêtes, pas encore envoyées
+        self._awaiting_images = []    # Messages envoyés pendant la préparation d'une image
+        
+        # Traces des tours : capture, reconnaissance, LLM, synthèse
+        self.tracer = shared_tracer()
+        self.voice_turn = None
+        self._capture_span = None
+        self._pending_memory = None   # Historique à relire dans la mémoire de l'agent
+        self._pending_mode = None     # Mode choisi dans les paramètres avant que l'agent soit prêt
+        self.interpreter_pipeline = None  # Interprétation continue en cours (mode interprète)
         
-        # Liste pour stocker les messages
-        self.messages = []
+        # Historique persistant des conversations
+        self.conversation_store = ConversationStore()
+        self.conversation_id = None
+        self._history_exhausted = True
         
         # Créer le widget empilé pour gérer les différentes vues
         self.stacked_widget = QStackedWidget()
@@ -525,8 +689,121 @@ class frame(QMainWindow):
         self.lato()
         self.centro()
         
+        # Reprendre la dernière conversation (seule la dernière page est chargée)
+        self.open_latest_conversation()
+        
         # Centrer l'animation après que la fenêtre est montrée
         QTimer.singleShot(0, self.center_recording_animation)
+        
+        # Initialisations lentes en parallèle : la fenêtre reste utilisable pendant ce temps
+        self.services = ServiceLoader(parent=self)
+        self.services.ready.connect(self.on_service_ready)
+        self.services.failed.connect(self.on_service_failed)
+        self.services.load('agent', self.build_agent)
+        self.services.load('audio', self.build_audio_handler)
+        self.services.load('detector', self.build_language_detector)
+        self.services.load('voice', lambda audio_handler: audio_handler.init_tts(), requires=('audio',))
+        self.services.load('microphone', lambda audio_handler: audio_handler.probe_input_device(), requires=('audio',))
+
+    def watch_startup(self, profiler):
+        """Mode --profile-startup : écrit le rapport et quitte une fois la fenêtre peinte et tout initialisé"""
+        self._startup_profiler = profiler
+        profiler.mark('window_shown')
+        
+        def painted():
+            profiler.mark('first_paint')
+            self._check_startup_profile()
+        
+        QApplication.instance().installEventFilter(FirstPaintFilter(self, painted))
+        self.services.ready.connect(self._check_startup_profile)
+        self.services.failed.connect(self._check_startup_profile)
+        QTimer.singleShot(self.STARTUP_PROFILE_TIMEOUT, self._finish_startup_profile)
+        QTimer.singleShot(0, self._check_startup_profile)
+
+    def _check_startup_profile(self, *args):
+        profiler = self._startup_profiler
+        if 'first_paint' in profiler.marks and not self.services.pending():
+            profiler.mark('ready')
+            self._finish_startup_profile()
+
+    def _finish_startup_profile(self):
+        profiler, self._startup_profiler = self._startup_profiler, None
+        if profiler is None:
+            return
+        profiler.uninstall()
+        profiler.subsystems = dict(self.services.timings)
+        code = profiler.write_report()
+        self.close()
+        QApplication.exit(code)
+
+    @staticmethod
+    def build_agent():
+        from gemini_agent import GeminiAgent
+        return GeminiAgent()
+
+    @staticmethod
+    def build_audio_handler():
+        from audio_handler import AudioHandler
+        return AudioHandler()
+
+    @staticmethod
+    def build_language_detector():
+        from language_detector import parse_mode
+        from model_registry import ModelRegistry
+        # ARYADAI_LID_MODE="precision=float16,frame_step=2" : mode rapide (voir python language_detector.py)
+        # Modèles rechargés à chaud toutes les ARYADAI_LID_RELOAD secondes (0 : jamais)
+        return ModelRegistry(interval=float(os.getenv('ARYADAI_LID_RELOAD', '5')),
+                             **parse_mode(os.getenv('ARYADAI_LID_MODE', '')))
+
+    def on_service_ready(self, name, service):
+        """Branche un sous-système dès qu'il est prêt (thread de l'interface)"""
+        if name == 'agent':
+            self.gemini_agent = service
+            if self._pending_mode is not None:
+                self.update_agent_mode(*self._pending_mode)
+                self._pending_mode = None
+            if self._pending_memory is not None:
+                self.gemini_agent.restore_memory(self._pending_memory)
+                self._pending_memory = None
+            pending, self._pending_messages = self._pending_messages, []
+            for message, typing_indicator, turn in pending:
+                self.get_gemini_response(message, typing_indicator, turn)
+        elif name == 'audio':
+            self.audio_handler = service
+            self.audio_handler.language_detector = self.language_detector
+        elif name == 'detector':
+            self.language_detector = service
+            if self.audio_handler is not None:
+                self.audio_handler.language_detector = service
+        elif name == 'microphone':
+            self.micro_button.setEnabled(True)
+            self.micro_button.setToolTip(service)
+        self._set_service_state(name, 'ready')
+
+    def on_service_failed(self, name, message):
+        if name == 'agent':
+            # Sans agent l'application ne sert à rien
+            QMessageBox.critical(self, "Erreur", f"Erreur lors de l'initialisation de Gemini : {message}")
+            QApplication.exit(1)
+            return
+        self._set_service_state(name, 'failed', message)
+
+    def _set_service_state(self, name, state, detail=""):
+        if name not in self.service_states:
+            return
+        self.service_states[name] = state
+        self.update_status_label(detail)
+        if 'loading' not in self.service_states.values():
+            logger.info("Démarrage complet en %.0f ms", (time.perf_counter() - STARTED_AT) * 1000)
+
+    def update_status_label(self, detail=""):
+        """Affiche l'état de chaque sous-système (en cours, prêt, en échec)"""
+        colors = {'loading': "#8E8EA0", 'ready': "#4ADE80", 'failed': "#F87171"}
+        parts = [f'<span style="color:{colors[state]};">●</span> {self.SERVICE_LABELS[name]}'
+                 for name, state in self.service_states.items()]
+        self.status_label.setText("&nbsp;&nbsp;".join(parts))
+        if detail:
+            self.status_label.setToolTip(detail)
 
     def create_demo_frame(self):
         frame = QWidget()
@@ -676,6 +953,35 @@ class frame(QMainWindow):
         """)
         btn.clicked.connect(self.clear_conversations)
 
+        # Recherche dans l'historique (lancée après une courte pause de saisie)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Rechercher...")
+        self.search_box.setStyleSheet("""
+            QLineEdit {
+                background-color: #2B2D42;
+                border: 1px solid #3B3D52;
+                border-radius: 4px;
+                color: #E2E8F0;
+                padding: 6px;
+            }
+        """)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        self.search_box.returnPressed.connect(self.run_search)
+
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("""
+            QLabel {
+                color: #8E8EA0;
+                font-size: 11px;
+                padding: 2px 4px;
+            }
+        """)
+        self.update_status_label()
+
         info1 = QPushButton("Éthique de l'IA")
         info1.setStyleSheet("""
             QPushButton {
@@ -720,6 +1026,8 @@ class frame(QMainWindow):
         info3.clicked.connect(self.clear_conversations)
 
         layout_top.addWidget(btn)
+        layout_top.addWidget(self.search_box)
+        layout_top.addWidget(self.status_label)
         layout_top.addWidget(info1)
         layout_top.addWidget(info2)
         layout_top.addWidget(info3)
@@ -826,37 +1134,11 @@ class frame(QMainWindow):
         self.stacked_widget = QStackedWidget()
         self.stacked_widget.setStyleSheet("background-color:#1A1B26;")
 
-        # Zone de messages avec défilement
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setStyleSheet("""
-            QScrollArea {
-                border: none;
-                background-color: #1A1B26;
-            }
-            QScrollBar:vertical {
-                border: none;
-                background: #1A1B26;
-                width: 8px;
-                margin: 0px;
-            }
-            QScrollBar::handle:vertical {
-                background: #3B3D52;
-                min-height: 20px;
-                border-radius: 4px;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                height: 0px;
-            }
-        """)
-
-        self.messages_widget = QWidget()
-        self.messages_layout = QVBoxLayout()
-        self.messages_layout.setSpacing(16)
-        self.messages_layout.setContentsMargins(20, 20, 20, 20)
-        self.messages_layout.setAlignment(Qt.AlignTop | Qt.AlignHCenter)
-        self.messages_widget.setLayout(self.messages_layout)
-        self.scroll_area.setWidget(self.messages_widget)
+        # Historique des messages (modèle/vue : seules les lignes visibles sont peintes)
+        self.chat_model = ChatHistoryModel(self)
+        self.chat_view = ChatHistoryView(self.chat_model)
+        self.chat_view.reached_top.connect(self.load_older_messages)
+        self.chat_model.rowsTrimmed.connect(self.on_rows_trimmed)
         
         # Vue d'accueil (Exemples, Capacités, Limitations)
         self.demo_frame = self.create_demo_frame()
@@ -864,10 +1146,15 @@ class frame(QMainWindow):
         # Créer la vue des paramètres du compte
         self.account_settings = AccountSettingsWidget(self)
         
+        # Résultats de recherche
+        self.search_results = SearchResultsWidget(self.conversation_store)
+        self.search_results.results.itemClicked.connect(self.open_search_result)
+        
         # Ajouter les vues au widget empilé
-        self.stacked_widget.addWidget(self.scroll_area)
+        self.stacked_widget.addWidget(self.chat_view)
         self.stacked_widget.addWidget(self.demo_frame)
         self.stacked_widget.addWidget(self.account_settings)
+        self.stacked_widget.addWidget(self.search_results)
         
         # Ajouter le widget empilé au layout central
         centre_layout.addWidget(self.stacked_widget, 1)
@@ -876,6 +1163,8 @@ class frame(QMainWindow):
         self.recording_animation = RecordingAnimation(self.centre_widget)
         self.recording_animation.setFixedSize(200, 50)
         self.recording_animation.hide()
+        self.synthesis_finished.connect(self.recording_animation.stop)
+        self.interpretation_event.connect(self.on_interpretation_event)
         
         # Zone de saisie message
         frame_message = QWidget()
@@ -905,6 +1194,9 @@ class frame(QMainWindow):
         frame_message_in.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
 
         micro = QPushButton()
+        # Activé quand le micro est détecté (initialisation en arrière-plan)
+        micro.setEnabled(False)
+        self.micro_button = micro
         micro.setIcon(QIcon(QPixmap(r"C:\Users\farya\Desktop\NLP-20240515T082008Z-001\NLP\AryadAI\AI\4.png").scaled(20,20)))
         micro.setStyleSheet("""
             QPushButton {
@@ -994,24 +1286,84 @@ class frame(QMainWindow):
     def toggle_recording(self):
         if self.demo_frame.isVisible():
             self.demo_frame.hide()
-            self.scroll_area.show()
+            self.chat_view.show()
+
+        if self.interpreter_pipeline is not None or (
+                self.gemini_agent is not None and self.gemini_agent.interpreter_chain is not None):
+            # Mode interprète : le micro lance ou arrête l'interprétation continue
+            self.toggle_interpretation()
+            return
             
         if self.recording_animation.isVisible():
             self.recording_animation.stop()
             # Arrêter l'enregistrement
-            self.audio_handler.stop_recording()
+            turn = self.end_capture()
+            self.audio_handler.stop_recording(turn=turn)
+            self.tracer.end_turn(turn)
             # L'audio sera traité quand l'utilisateur clique sur send
         else:
             self.center_recording_animation()
             self.recording_animation.set_audio_handler(self.audio_handler)
+            self.voice_turn = self.tracer.begin_turn('voix')
+            self._capture_span = self.tracer.start_span(self.voice_turn, 'capture')
             self.audio_handler.start_recording()
             self.recording_animation.start()
 
+    def toggle_interpretation(self):
+        """Démarre l'interprétation continue du micro, ou l'arrête (les énoncés en cours sont terminés)"""
+        if self.interpreter_pipeline is not None:
+            # Capture arrêtée ; la pipeline finit les énoncés en cours dans son thread
+            self.interpreter_pipeline.stop(wait=False)
+            self.interpreter_pipeline = None
+            self.recording_animation.stop()
+            return
+
+        from interpreter_pipeline import InterpreterPipeline, MicrophoneSource
+        target_language = self.account_settings.language_combo.currentText()
+        # Fixés au démarrage : les énoncés terminés après l'arrêt restent dans cette conversation
+        # et passent par cette chaîne, même si l'agent a changé de mode ou de conversation entre-temps
+        agent = self.gemini_agent
+        chain = agent.interpreter_chain
+        conversation_id = self.conversation_id
+        self.interpreter_pipeline = InterpreterPipeline(
+            MicrophoneSource(self.audio_handler.sample_rate),
+            transcribe=self.audio_handler.transcribe,
+            translate=lambda text, turn: agent.interpret(text, chain, turn=turn),
+            speak=lambda text, turn: self.audio_handler.say(text, language=target_language, turn=turn),
+            on_event=lambda kind, utterance: self.interpretation_event.emit(
+                conversation_id, kind, utterance.text if kind == 'transcript' else utterance.translation or ""),
+        )
+        self.interpreter_pipeline.start()
+        self.center_recording_animation()
+        self.recording_animation.start()
+
+    def on_interpretation_event(self, conversation_id, kind, text):
+        """
+        Enregistre chaque énoncé reconnu et sa traduction dans la conversation de la pipeline, et les
+        affiche si elle est toujours ouverte (thread de l'interface)
+        """
+        if kind not in ('transcript', 'translation'):
+            return
+        is_user = kind == 'transcript'
+        store_id = self.conversation_store.append_message(conversation_id, 'user' if is_user else 'agent', text)
+        if conversation_id != self.conversation_id:
+            # Pipeline arrêtée par l'ouverture d'une autre conversation : rien n'y est ajouté
+            return
+        self.chat_model.append_message(text, is_user, reveal=not is_user, store_id=store_id)
+        self.chat_view.scroll_to_bottom()
+
+    def end_capture(self):
+        """Clôt l'étape de capture et retourne le tour vocal en cours"""
+        turn, self.voice_turn = self.voice_turn, None
+        self.tracer.end_span(self._capture_span)
+        self._capture_span = None
+        return turn
+
     def select_image(self):
          # Masquer la vue d'accueil et afficher la zone de chat si c'est la première interaction avec l'image
         if self.demo_frame.isVisible():
             self.demo_frame.hide()
-            self.scroll_area.show()
+            self.chat_view.show()
             
         file_name, _ = QFileDialog.getOpenFileName(
             self,
@@ -1020,112 +1372,147 @@ class frame(QMainWindow):
             "Images (*.png *.jpg *.jpeg *.bmp *.gif)"
         )
         if file_name:
-            self.add_message(f"Image sélectionnée : {file_name}", True)
+            message = self.add_message(f"Image sélectionnée : {file_name}", True)
+            request_id = self.get_image_pipeline().submit(file_name)
+            self._image_requests[request_id] = message
+
+    def get_image_pipeline(self):
+        """Pipeline d'images, créé à la première image sélectionnée"""
+        if self.image_pipeline is None:
+            from image_pipeline import ImagePipeline
+            self.image_pipeline = ImagePipeline()
+            self.image_pipeline.finished.connect(self.on_image_ready)
+            self.image_pipeline.failed.connect(self.on_image_failed)
+        return self.image_pipeline
+
+    def on_image_ready(self, request_id, image):
+        message = self._image_requests.pop(request_id, None)
+        if message is None:
+            # Conversation changée entre-temps
+            return
+        self.chat_model.set_image(message, image.thumbnail)
+        self.chat_view.scroll_to_bottom()
+        self._pending_images.append(image.payload)
+        logger.info("Image prête : %dx%d, %d -> %d octets%s", image.payload.width, image.payload.height,
+                    image.payload.source_bytes, len(image.payload.data), " (cache)" if image.cached else "")
+        self._release_awaiting_messages()
+
+    def on_image_failed(self, request_id, error):
+        if self._image_requests.pop(request_id, None) is None:
+            return
+        self.chat_model.append_message(f"Image illisible : {error}", is_user=False, kind='notice')
+        self._release_awaiting_messages()
+
+    def _release_awaiting_messages(self):
+        """Envoie les messages qui attendaient leurs images, une fois toutes les images traitées"""
+        if self._image_requests:
+            return
+        awaiting, self._awaiting_images = self._awaiting_images, []
+        for message, typing_indicator, turn in awaiting:
+            self.get_gemini_response(message, typing_indicator, turn)
+
+    def discard_images(self):
+        """Oublie les images en cours ou non envoyées (changement de conversation)"""
+        self._image_requests.clear()
+        self._pending_images = []
+        for _, _, turn in self._awaiting_images:
+            self.tracer.end_turn(turn)
+        self._awaiting_images = []
 
     def send_message(self):
         message = self.saisie.toPlainText().strip()
-        if message or self.audio_handler.recording:
+        recording = self.audio_handler is not None and self.audio_handler.recording
+        if message or recording:
             if self.demo_frame.isVisible():
                 self.demo_frame.hide()
-                self.scroll_area.show()
+                self.chat_view.show()
 
-            if self.audio_handler.recording:
+            if recording:
                 # Arrêter l'enregistrement et l'animation
                 self.recording_animation.stop()
-                transcribed_text = self.audio_handler.stop_recording()
+                turn = self.end_capture()
+                transcribed_text = self.audio_handler.stop_recording(turn=turn)
                 if transcribed_text and transcribed_text != "Aucun audio enregistré":
                     # Ajouter le message transcrit
                     self.add_message(transcribed_text, True)
                     # Obtenir la réponse de Gemini
-                    self.get_gemini_response(transcribed_text, None)
+                    self.get_gemini_response(transcribed_text, None, turn)
+                else:
+                    self.tracer.end_turn(turn)
             elif message:
                 # Traitement normal du message texte
                 self.add_message(message, True)
                 self.saisie.clear()
                 
                 # Ajouter l'indicateur de frappe
-                self.typing_indicator = TypingIndicator()
-                indicator_container = QWidget()
-                indicator_layout = QHBoxLayout()
-                indicator_layout.setContentsMargins(0, 0, 0, 0)
-                indicator_container.setLayout(indicator_layout)
-                indicator_layout.addWidget(self.typing_indicator)
-                indicator_layout.addStretch()
-                self.messages_layout.addWidget(indicator_container)
-                
-                QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-                    self.scroll_area.verticalScrollBar().maximum()
-                ))
-
-                typing_indicator_ref = indicator_container
-                QTimer.singleShot(100, lambda: self.get_gemini_response(message, typing_indicator_ref))
-
-    def get_gemini_response(self, message, typing_indicator_widget):
-        if typing_indicator_widget:
-            # Retirer l'indicateur de frappe
-            if typing_indicator_widget in self.messages_layout.children():
-                typing_indicator = typing_indicator_widget.findChild(TypingIndicator)
-                if typing_indicator:
-                    typing_indicator.timer.stop()
-                QTimer.singleShot(0, lambda: self.messages_layout.removeWidget(typing_indicator_widget))
-                QTimer.singleShot(0, typing_indicator_widget.deleteLater)
-
-        # Obtenir la réponse de Gemini
-        ai_response_text = self.gemini_agent.get_response(message)
-        
-        # Ajouter le TypingLabel et démarrer l'animation
-        ai_message_widget = QWidget()
-        ai_message_layout = QHBoxLayout()
-        ai_message_layout.setContentsMargins(0, 0, 0, 0)
-        ai_message_widget.setLayout(ai_message_layout)
-        
-        typing_label = TypingLabel(ai_response_text)
-        ai_message_layout.addWidget(typing_label)
-        ai_message_layout.addStretch()
+                typing_indicator = self.chat_model.append_typing_indicator()
+                self.chat_view.scroll_to_bottom()
+
+                turn = self.tracer.begin_turn('texte')
+                QTimer.singleShot(100, lambda: self.get_gemini_response(message, typing_indicator, turn))
+
+    def get_gemini_response(self, message, typing_indicator, turn=None):
+        if self._image_requests:
+            # Image jointe encore en préparation : le message part avec elle (voir on_image_ready)
+            if typing_indicator is None:
+                typing_indicator = self.chat_model.append_typing_indicator()
+            self._awaiting_images.append((message, typing_indicator, turn))
+            return
+
+        if self.gemini_agent is None:
+            # Agent encore en initialisation : la réponse viendra dans on_service_ready
+            if typing_indicator is None:
+                typing_indicator = self.chat_model.append_typing_indicator()
+            self._pending_messages.append((message, typing_indicator, turn))
+            return
+
+        if typing_indicator:
+            # Retirer l'indicateur de frappe (son animation s'arrête avec lui)
+            self.chat_model.remove_message(typing_indicator)
+
+        # Obtenir la réponse de Gemini, avec les images jointes depuis le dernier message
+        images, self._pending_images = self._pending_images, []
+        ai_response_text = self.gemini_agent.get_response(message, turn=turn, images=images or None)
         
-        self.messages_layout.addWidget(ai_message_widget)
-        typing_label.start_typing(interval=30)
+        # Ajouter la réponse et démarrer l'animation de frappe
+        store_id = self.conversation_store.append_message(self.conversation_id, 'agent', ai_response_text)
+        self.chat_model.append_message(ai_response_text, is_user=False, reveal=True, store_id=store_id)
+        self.chat_view.scroll_to_bottom()
+
+        if self.audio_handler is None:
+            # Synthèse vocale pas encore disponible : réponse affichée seulement
+            self.tracer.end_turn(turn)
+            return
 
         # Afficher l'animation pendant la synthèse vocale
         self.recording_animation.start()
         
         # Déterminer la langue pour la synthèse vocale
         target_language = 'Français'  # Langue par défaut
-        if hasattr(self.gemini_agent, 'interpreter_chain') and self.gemini_agent.interpreter_chain:
+        if self.gemini_agent.interpreter_chain:
             # Si on est en mode interprète, utiliser la langue cible
             target_language = self.account_settings.language_combo.currentText()
         
         # Synthétiser la réponse en parole avec la langue appropriée
-        def on_synthesis_complete():
-            self.recording_animation.stop()
-            
-        self.audio_handler.speak(ai_response_text, language=target_language, callback=on_synthesis_complete)
-
-        # Faire défiler vers le bas pendant l'animation de frappe
-        QTimer.singleShot(len(ai_response_text) * typing_label._timer.interval() + 200, 
-                         lambda: self.scroll_area.verticalScrollBar().setValue(self.scroll_area.verticalScrollBar().maximum()))
+        def speech_finished():
+            # Appelé depuis le thread de synthèse
+            self.tracer.end_turn(turn)
+            self.synthesis_finished.emit()
+        
+        self.audio_handler.speak(ai_response_text, language=target_language, callback=speech_finished, turn=turn)
 
     def add_message(self, text, is_user):
         # Cette fonction est maintenant principalement pour les messages utilisateur ou les messages système simples
         # La réponse de l'IA avec animation est gérée séparément dans get_gemini_response
         if is_user or "Enregistrement" in text or "Image sélectionnée" in text:
-            message_widget = MessageWidget(text, is_user)
-            self.messages_layout.addWidget(message_widget)
-            
-            # Animation d'apparition (peut être conservée ou modifiée)
-            # Pour les messages courts comme l'enregistrement terminé ou l'image sélectionnée, on peut désactiver l'animation si désiré.
-            # message_widget.setMaximumHeight(0)
-            # animation = QPropertyAnimation(message_widget, b"maximumHeight")
-            # animation.setDuration(300)
-            # animation.setStartValue(0)
-            # animation.setEndValue(message_widget.sizeHint().height())
-            # animation.setEasingCurve(QEasingCurve.OutCubic)
-            # animation.start()
+            # Les messages système sont enregistrés à part : ils ne sont pas relus dans la mémoire de l'agent
+            store_id = self.conversation_store.append_message(self.conversation_id, 'user' if is_user else 'notice', text)
+            message = self.chat_model.append_message(text, is_user, store_id=store_id,
+                                                     kind='message' if is_user else 'notice')
             
             # Faire défiler vers le bas
-            QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-                self.scroll_area.verticalScrollBar().maximum()
-            ))
+            self.chat_view.scroll_to_bottom()
+            return message
         # Les messages de l'IA (is_user=False pour la réponse simulée) ne sont plus ajoutés ici directement
 
     def resizeEvent(self, event):
@@ -1138,40 +1525,168 @@ class frame(QMainWindow):
         self.stacked_widget.setCurrentWidget(self.account_settings)
 
     def clear_conversations(self):
-        """Efface toutes les conversations"""
-        # Supprimer tous les widgets du layout des messages
-        while self.messages_layout.count():
-            item = self.messages_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+        """Démarre une nouvelle conversation (l'ancienne reste dans l'historique)"""
+        # Vider l'historique affiché
+        self.chat_model.clear()
+        self.discard_images()
+        self._pending_memory = None
+        if self.gemini_agent is not None:
+            self.gemini_agent.reset_memory()
         
-        # Réinitialiser la liste des messages
-        self.messages = []
+        # Les messages suivants sont enregistrés dans une nouvelle conversation
+        if self.gemini_agent is not None:
+            interpreter = self.gemini_agent.interpreter_chain
+        else:
+            interpreter = self._pending_mode is not None and self._pending_mode[0]
+        if interpreter:
+            self.conversation_id = self.conversation_store.new_conversation(
+                'interprète', self.account_settings.language_combo.currentText()
+            )
+        else:
+            self.conversation_id = self.conversation_store.new_conversation()
+        self._history_exhausted = True
         
         # Afficher la vue d'accueil
         self.stacked_widget.setCurrentWidget(self.demo_frame)
 
+    def open_latest_conversation(self):
+        """Recharge la dernière page de la conversation la plus récente et la mémoire de l'agent"""
+        latest = self.conversation_store.latest_conversation(mode='conversation')
+        if latest is None:
+            self.conversation_id = self.conversation_store.new_conversation()
+            return
+        self.open_conversation(latest[0])
+
+    def open_conversation(self, conversation_id, message_id=None):
+        """Affiche une conversation (dernière page) ; avec message_id, remonte jusqu'à ce message"""
+        self.chat_model.clear()
+        self.discard_images()
+        self.conversation_id = conversation_id
+        self.restore_conversation_mode(conversation_id)
+        page = self.conversation_store.load_page(self.conversation_id, limit=self.HISTORY_PAGE_SIZE)
+        self._history_exhausted = len(page) < self.HISTORY_PAGE_SIZE
+        self.chat_model.prepend_messages(page)
+        
+        # Seuls les derniers échanges sont relus pour la mémoire (hors messages système), pas tout le journal
+        if self.gemini_agent is not None:
+            self.gemini_agent.restore_memory(page)
+        else:
+            self._pending_memory = page
+        
+        if not page:
+            return
+        self.stacked_widget.setCurrentWidget(self.chat_view)
+        
+        row = None
+        if message_id is not None:
+            # Charger les pages précédentes jusqu'au message, dans la limite de ce que garde la vue
+            row = self.chat_model.row_for_store_id(message_id)
+            while row is None and not self._history_exhausted and self.chat_model.rowCount() < self.chat_model.MAX_ROWS:
+                older = self.conversation_store.load_page(self.conversation_id, before_id=self.chat_model.oldest_store_id(),
+                                                          limit=self.HISTORY_PAGE_SIZE)
+                self._history_exhausted = len(older) < self.HISTORY_PAGE_SIZE
+                self.chat_model.prepend_messages(older)
+                row = self.chat_model.row_for_store_id(message_id)
+        if row is None:
+            self.chat_view.scroll_to_bottom()
+        else:
+            self.chat_view.scroll_to_row(row)
+
+    def restore_conversation_mode(self, conversation_id):
+        """Remet l'agent et les paramètres dans le mode de la conversation (les nouveaux tours la prolongent)"""
+        conversation = self.conversation_store.conversation(conversation_id)
+        if conversation is None:
+            return
+        _, mode, target_language = conversation
+        is_interpreter = mode == 'interprète'
+        settings = self.account_settings
+        settings.interpreter_checkbox.setChecked(is_interpreter)
+        if target_language and settings.language_combo.findText(target_language) >= 0:
+            settings.language_combo.setCurrentText(target_language)
+        if self.interpreter_pipeline is not None and not is_interpreter:
+            # L'interprétation continue ne doit pas écrire dans une conversation normale
+            self.toggle_interpretation()
+        self.update_agent_mode(is_interpreter, settings.language_combo.currentText())
+
+    def run_search(self):
+        """Recherche dans l'historique le texte saisi dans la barre latérale"""
+        self.search_timer.stop()
+        query = self.search_box.text().strip()
+        if not query:
+            if self.stacked_widget.currentWidget() is self.search_results:
+                self.stacked_widget.setCurrentWidget(self.chat_view)
+            return
+        self.search_results.search(query)
+        self.stacked_widget.setCurrentWidget(self.search_results)
+
+    def open_search_result(self, item):
+        conversation_id, message_id = item.data(Qt.UserRole)
+        self.open_conversation(conversation_id, message_id)
+
+    def on_rows_trimmed(self, count):
+        """Les messages retirés de la vue restent sur disque : la pagination doit pouvoir les relire"""
+        self._history_exhausted = False
+
+    def load_older_messages(self):
+        """Charge la page précédente quand l'utilisateur atteint le haut de l'historique"""
+        if self._history_exhausted:
+            return
+        before_id = self.chat_model.oldest_store_id()
+        page = self.conversation_store.load_page(self.conversation_id, before_id=before_id,
+                                                 limit=self.HISTORY_PAGE_SIZE)
+        self._history_exhausted = len(page) < self.HISTORY_PAGE_SIZE
+        if page:
+            self.chat_model.prepend_messages(page)
+            self.chat_view.keep_row_at_top(len(page))
+
+    def closeEvent(self, event):
+        # Enregistrer les messages en attente avant de quitter
+        self.services.shutdown()
+        if self.image_pipeline is not None:
+            self.image_pipeline.shutdown()
+        if self.language_detector is not None:
+            self.language_detector.stop()
+        if self.interpreter_pipeline is not None:
+            self.interpreter_pipeline.stop(wait=False)
+        for stage, stats in sorted(self.tracer.summary().items()):
+            logger.info("%s : p50 %.0f ms, p95 %.0f ms, p99 %.0f ms (%d mesures)",
+                        stage, stats['p50'], stats['p95'], stats['p99'], stats['count'])
+        if self.gemini_agent is not None and self.gemini_agent.faq is not None:
+            stats = self.gemini_agent.faq.stats()
+            logger.info("FAQ locale : %d/%d questions sans appel au LLM (%.0f %%), %.3f ms par recherche",
+                        stats['hits'], stats['lookups'], stats['hit_rate'] * 100, stats['mean_ms'])
+        self.conversation_store.close()
+        super().closeEvent(event)
+
     def update_agent_mode(self, is_interpreter, target_language):
         """Met à jour le mode de l'agent (interprète ou conversationnel)"""
-        print("Mise à jour du mode de l'agent")  # Debug
+        logger.debug("Mise à jour du mode de l'agent")
+        if self.gemini_agent is None:
+            # Appliqué dès que l'agent est prêt
+            self._pending_mode = (is_interpreter, target_language)
+            return
         try:
             if is_interpreter:
-                print(f"Activation du mode interprète pour la langue : {target_language}")  # Debug
+                logger.debug("Activation du mode interprète pour la langue : %s", target_language)
                 # Mettre à jour le prompt de l'agent pour l'interprétation
                 self.gemini_agent.update_prompt_for_interpreter(target_language)
             else:
-                print("Activation du mode conversationnel")  # Debug
+                logger.debug("Activation du mode conversationnel")
                 # Restaurer le prompt normal de conversation
                 self.gemini_agent.restore_normal_prompt()
-            print("Mode de l'agent mis à jour avec succès")  # Debug
+            logger.debug("Mode de l'agent mis à jour avec succès")
         except Exception as e:
-            print(f"Erreur lors de la mise à jour du mode de l'agent : {str(e)}")  # Debug
+            logger.error("Erreur lors de la mise à jour du mode de l'agent : %s", e)
             raise e
 
 if __name__=="__main__":
+    setup_logging(sys.argv)
     apk = QApplication(sys.argv)
     fenetre = frame()
     fenetre.show()
+    logger.info("Fenêtre affichée en %.0f ms", (time.perf_counter() - STARTED_AT) * 1000)
+    if startup_profiler.active() is not None:
+        fenetre.watch_startup(startup_profiler.active())
     sys.exit(apk.exec())
 
 
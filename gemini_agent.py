@@ -1,19 +1,72 @@
 import os
+import copy
+import logging
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
 from langchain.memory import ConversationBufferMemory
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import LLMChain
+from langchain.callbacks.base import BaseCallbackHandler
+from startup_profiler import timed
+from turn_tracer import shared_tracer
+from app_logging import verbose_prompts, with_fields
+from prompt_cache import compact_identity, gemini_context_cache
+from faq_cache import FaqCache
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = "gemini-1.5-flash"
+
+NORMAL_INSTRUCTIONS = """Tu dois :
+1. Répondre de manière naturelle et engageante
+2. Maintenir le contexte de la conversation
+3. Fournir des réponses précises et utiles
+4. Adapter ton ton au contexte de la conversation
+5. Toujours te présenter comme AryadAI quand on te demande ton nom ou ton identité"""
+
+class TraceCallback(BaseCallbackHandler):
+    """Note l'arrivée du premier token dans la trace du tour"""
+
+    def __init__(self, tracer, turn):
+        self.tracer = tracer
+        self.first_token = tracer.start_span(turn, 'llm.first_token')
+
+    def on_llm_new_token(self, token, **kwargs):
+        # Uniquement en streaming
+        self.tracer.end_span(self.first_token)
+
+    def on_llm_end(self, response, **kwargs):
+        # Sans streaming, le premier token arrive avec la réponse complète
+        self.tracer.end_span(self.first_token)
+
+class WindowedMemory(ConversationBufferMemory):
+    """
+    Mémoire de conversation limitée aux max_messages derniers messages, à chaque tour : la taille
+    d'un agent est bornée, et la mémoire relue (restore_memory) est celle qui était en place
+    """
+    max_messages: int = 20
+
+    def save_context(self, inputs, outputs):
+        super().save_context(inputs, outputs)
+        messages = self.chat_memory.messages
+        if len(messages) > self.max_messages:
+            del messages[:len(messages) - self.max_messages]
 
 class GeminiAgent:
-    def __init__(self):
+    @timed('GeminiAgent')
+    def __init__(self, llm=None, context_cache=None):
+        """
+        :param llm: Modèle de chat LangChain à utiliser à la place de Gemini (modèle factice des benchmarks)
+        :param context_cache: ContextCache du préfixe statique (par défaut : cache Gemini si ARYADAI_PROMPT_CACHE
+            vaut auto) ; le modèle doit accepter l'argument cached_content
+        """
         # Charger les variables d'environnement
         load_dotenv()
         
         # Configurer l'API Gemini
         self.api_key = os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
+        if not self.api_key and llm is None:
             raise ValueError("La clé API Google n'est pas définie dans le fichier .env")
             
         # Charger l'identité de l'agent
@@ -21,28 +74,37 @@ class GeminiAgent:
             with open('agent_identity.txt', 'r', encoding='utf-8') as f:
                 self.agent_identity = f.read()
         except Exception as e:
-            print(f"Erreur lors du chargement de l'identité de l'agent : {str(e)}")
+            logger.error("Erreur lors du chargement de l'identité de l'agent : %s", e)
             self.agent_identity = "Je suis AryadAI, un assistant IA conversationnel."
             
         # Initialiser le modèle
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-            google_api_key=self.api_key,
-            temperature=0.7,
-            top_p=0.8,
-            top_k=40,
-            convert_system_message_to_human=True
-        )
+        if llm is not None:
+            self.llm = llm
+        else:
+            self.llm = ChatGoogleGenerativeAI(
+                model=GEMINI_MODEL,
+                google_api_key=self.api_key,
+                temperature=0.7,
+                top_p=0.8,
+                top_k=40,
+                convert_system_message_to_human=True
+            )
         
-        # Message système pour le mode normal
-        self.normal_system_message = f"""{self.agent_identity}
+        # Réponses locales aux questions d'identité, sans appel au LLM (ARYADAI_FAQ_CACHE=off pour désactiver)
+        self.faq = None
+        if os.getenv('ARYADAI_FAQ_CACHE', 'on').lower() not in ('off', '0', 'false'):
+            self.faq = FaqCache.from_identity(self.agent_identity)
 
-Tu dois :
-1. Répondre de manière naturelle et engageante
-2. Maintenir le contexte de la conversation
-3. Fournir des réponses précises et utiles
-4. Adapter ton ton au contexte de la conversation
-5. Toujours te présenter comme AryadAI quand on te demande ton nom ou ton identité"""
+        # Message système pour le mode normal, et sa forme compacte quand il n'est pas en cache
+        self.normal_system_message = f"{self.agent_identity}\n\n{NORMAL_INSTRUCTIONS}"
+        self.compact_system_message = f"{compact_identity(self.agent_identity)}\n\n{NORMAL_INSTRUCTIONS}"
+
+        # auto : contexte en cache côté fournisseur, sinon identité compacte ; compact ; off : identité complète
+        self.cache_mode = os.getenv('ARYADAI_PROMPT_CACHE', 'auto').lower()
+        if context_cache is None and llm is None and self.cache_mode == 'auto':
+            context_cache = gemini_context_cache(f"models/{GEMINI_MODEL}", self.api_key)
+        self.context_cache = context_cache if self.cache_mode == 'auto' else None
+        self.context_handle = None
         
         # Message système pour le mode interprète
         self.interpreter_system_message = """Tu es un interprète professionnel. Tu dois :
@@ -55,40 +117,146 @@ Tu dois :
 
         IMPORTANT : Ne pas ajouter de texte comme "traduccion_literal" ou autre. Retourner uniquement la traduction."""
         
+        # Nombre de messages gardés en mémoire (et relus depuis l'historique pour la reconstruire)
+        self.memory_window = 20
+        
         # Initialiser la mémoire de conversation
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+        self.memory = self._new_memory()
         
         # Initialiser avec le prompt normal
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", self.normal_system_message),
+        self.build_normal_chain()
+        
+        # Créer une chaîne séparée pour l'interprète
+        self.interpreter_chain = None
+
+    def build_normal_chain(self, wait=True):
+        """
+        Crée la chaîne de conversation : identité référencée par le contexte en cache, ou envoyée à chaque appel
+
+        :param wait: Attendre la création du contexte en cache (sinon faite en arrière-plan, pour un tour suivant)
+        """
+        self.context_handle = (self.context_cache.handle(self.normal_system_message, wait=wait)
+                               if self.context_cache else None)
+        if self.context_handle:
+            # Le fournisseur refuse un message système en plus du contexte en cache
+            messages = []
+            llm = self.llm.bind(cached_content=self.context_handle)
+        else:
+            system_message = self.normal_system_message if self.cache_mode == 'off' else self.compact_system_message
+            messages = [("system", system_message)]
+            llm = self.llm
+        self.prompt = ChatPromptTemplate.from_messages(messages + [
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}")
         ])
-        
-        # Créer la chaîne de conversation
         self.chain = LLMChain(
-            llm=self.llm,
+            llm=llm,
             prompt=self.prompt,
             memory=self.memory,
-            verbose=True
+            verbose=verbose_prompts()
         )
         
-        # Créer une chaîne séparée pour l'interprète
-        self.interpreter_chain = None
-        
-    def get_response(self, message):
-        """Obtient une réponse de l'agent"""
+
+    def get_response(self, message, turn=None, images=None):
+        """
+        Obtient une réponse de l'agent (étapes tracées dans turn)
+
+        :param images: ImagePayload jointes au message (envoyées dans un message multimodal)
+        """
+        tracer = shared_tracer()
+        if logger.isEnabledFor(logging.DEBUG):
+            # Tailles calculées seulement si le niveau DEBUG est actif
+            logger.debug("Appel du LLM", extra=with_fields(
+                mode='interprète' if self.interpreter_chain else 'conversation',
+                caracteres=len(message),
+                historique=len(self.memory.chat_memory.messages),
+                images=sum(len(image.data) for image in images or ()),
+            ))
         try:
-            if self.interpreter_chain:
-                response = self.interpreter_chain.predict(input=message)
-            else:
-                response = self.chain.predict(input=message)
+            with tracer.span(turn, 'llm', mode='interprète' if self.interpreter_chain else 'conversation'):
+                # Span llm.first_token ouvert seulement sur les chemins qui appellent le modèle (pas la FAQ)
+                if self.interpreter_chain and images:
+                    response = self._predict_with_images(self.interpreter_chain, message, images,
+                                                         self._callbacks(turn))
+                elif self.interpreter_chain:
+                    response = self.interpreter_chain.predict(input=message, callbacks=self._callbacks(turn))
+                else:
+                    response = None if images else self._answer_from_faq(message, turn)
+                    if response is None:
+                        response = self._predict_normal(message, self._callbacks(turn), images)
             return response
         except Exception as e:
             return f"Erreur: {str(e)}"
+
+    def interpret(self, message, chain, turn=None):
+        """
+        Traduction d'un énoncé par une chaîne d'interprète donnée (interprétation continue).
+
+        La chaîne est celle du démarrage de l'interprétation : un changement de mode de l'agent entre-temps
+        ne transforme pas les énoncés encore en file en tours de conversation.
+        """
+        tracer = shared_tracer()
+        try:
+            with tracer.span(turn, 'llm', mode='interprète'):
+                return chain.predict(input=message, callbacks=self._callbacks(turn))
+        except Exception as e:
+            return f"Erreur: {str(e)}"
+
+    @staticmethod
+    def _callbacks(turn):
+        """Callbacks d'un appel au modèle (premier token tracé dans turn), à créer juste avant l'appel"""
+        return [TraceCallback(shared_tracer(), turn)] if turn is not None else None
+
+    def _answer_from_faq(self, message, turn):
+        """Réponse canonique de la FAQ (ajoutée à la mémoire comme un échange normal), ou None"""
+        if self.faq is None:
+            return None
+        with shared_tracer().span(turn, 'faq') as span:
+            answer = self.faq.lookup(message)
+            if span is not None:
+                span.attributes['hit'] = answer is not None
+        if answer is not None:
+            self.memory.save_context({'input': message}, {'text': answer})
+        return answer
+
+    def _predict_normal(self, message, callbacks, images=None):
+        # Handle renouvelé en arrière-plan avant expiration (ou abandonné si le cache n'est plus disponible) :
+        # le tour n'attend jamais la création d'un contexte
+        if self.context_cache and self.context_cache.handle(self.normal_system_message, wait=False) != self.context_handle:
+            self.build_normal_chain(wait=False)
+
+        def predict():
+            if images:
+                return self._predict_with_images(self.chain, message, images, callbacks)
+            return self.chain.predict(input=message, callbacks=callbacks)
+
+        try:
+            return predict()
+        except Exception as e:
+            if not self.context_handle:
+                raise
+            # Contexte expiré ou supprimé côté fournisseur : nouvel essai avec l'identité compacte,
+            # nouveau contexte créé en arrière-plan pour les tours suivants
+            logger.warning("Contexte en cache refusé, nouvel essai : %s", e)
+            self.context_cache.invalidate()
+            self.build_normal_chain(wait=False)
+            return predict()
+
+    @staticmethod
+    def _predict_with_images(chain, message, images, callbacks):
+        """Appel direct du modèle de la chaîne : le dernier message humain porte le texte et les images"""
+        variables = {'input': message}
+        if chain.memory is not None:
+            variables.update(chain.memory.load_memory_variables({}))
+        messages = chain.prompt.format_messages(**variables)
+        content = [{'type': 'text', 'text': message}]
+        content += [{'type': 'image_url', 'image_url': image.data_url()} for image in images]
+        messages[-1] = HumanMessage(content=content)
+        response = chain.llm.invoke(messages, config={'callbacks': callbacks}).content
+        if chain.memory is not None:
+            # La mémoire garde le texte seul : les images ne sont pas renvoyées aux tours suivants
+            chain.memory.save_context({'input': f"{message} [{len(images)} image(s) jointe(s)]"}, {'text': response})
+        return response
     
     def update_prompt_for_interpreter(self, target_language):
         """Met à jour le prompt pour le mode interprète"""
@@ -99,28 +267,43 @@ Tu dois :
         self.interpreter_chain = LLMChain(
             llm=self.llm,
             prompt=interpreter_prompt,
-            verbose=True
+            verbose=verbose_prompts()
         )
     
     def restore_normal_prompt(self):
         """Restaure le prompt normal de conversation"""
         self.interpreter_chain = None
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", self.normal_system_message),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}")
-        ])
-        self.chain = LLMChain(
-            llm=self.llm,
-            prompt=self.prompt,
-            memory=self.memory,
-            verbose=True
-        )
+        self.build_normal_chain(wait=False)
     
+    def fork(self):
+        """
+        Agent d'une autre conversation : modèle, FAQ et contexte en cache partagés, mémoire et chaînes propres.
+
+        Ne relit ni l'identité ni la configuration, et ne crée aucun contexte en cache supplémentaire.
+        """
+        agent = copy.copy(self)
+        agent.memory = agent._new_memory()
+        agent.interpreter_chain = None
+        agent.build_normal_chain(wait=False)
+        return agent
+
+    def _new_memory(self):
+        return WindowedMemory(memory_key="chat_history", return_messages=True, max_messages=self.memory_window)
+
     def reset_memory(self):
         """Réinitialise la mémoire de conversation"""
         self.memory.clear()
 
+    def restore_memory(self, messages):
+        """Reconstruit la mémoire de conversation à partir des derniers messages enregistrés"""
+        self.memory.clear()
+        messages = [message for message in messages if not message.is_notice]
+        for message in messages[-self.memory_window:]:
+            if message.is_user:
+                self.memory.chat_memory.add_user_message(message.text)
+            else:
+                self.memory.chat_memory.add_ai_message(message.text)
+
     def reset_chat(self):
         """Réinitialise l'historique de la conversation"""
         self.memory.clear() 
\ No newline at end of file
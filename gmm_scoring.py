@@ -0,0 +1,340 @@
+"""
+Évaluation des langues avec un modèle du monde commun (UBM) et présélection des composantes.
+
+Les modèles de langue sont dérivés de l'UBM par adaptation MAP : leurs composantes correspondent
+à celles de l'UBM. Pour chaque trame, les top_c meilleures composantes de l'UBM sont cherchées
+une seule fois, puis chaque langue n'évalue que celles-ci.
+
+    # Dériver l'UBM et les modèles de langue (un dossier de fichiers audio par langue)
+    python gmm_scoring.py build --data corpus/ --output models_langues/ubm
+
+    # Sans corpus : trames tirées des modèles GMM existants de models_langues
+    python gmm_scoring.py build --from-models models_langues --output models_langues/ubm
+"""
+import os
+import sys
+import copy
+import logging
+import argparse
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+UBM_FILENAME = "ubm.pkl"
+LOG_2PI = np.log(2 * np.pi)
+
+class DiagonalGmm:
+    """Paramètres d'un GMM à covariances diagonales, préparés pour l'évaluation par produits matriciels"""
+
+    def __init__(self, weights, means, covariances, dtype=np.float64):
+        """
+        :param dtype: Type de stockage des paramètres (float64, float32 ou float16) ; le calcul
+            se fait en float32 pour float16 (pas d'arithmétique float16 rapide dans numpy)
+        """
+        means = np.asarray(means, dtype=np.float64)
+        precisions = 1.0 / np.asarray(covariances, dtype=np.float64)
+        dimensions = means.shape[1]
+        # log w_k - ½ (D log 2π + Σ log σ²) - ½ Σ μ²/σ² : partie constante de chaque composante
+        constants = (np.log(weights) - 0.5 * (dimensions * LOG_2PI - np.log(precisions).sum(axis=1))
+                     - 0.5 * (means ** 2 * precisions).sum(axis=1))
+        self.dtype = np.dtype(dtype)
+        self.compute_dtype = np.dtype(np.float32) if self.dtype == np.float16 else self.dtype
+        # Une constante par composante : gardée en précision de calcul (float16 perdrait plusieurs unités)
+        self.constants = constants.astype(self.compute_dtype)
+        if self.dtype == np.float16:
+            # 1/σ² dépasse la plage de float16 : on stocke 1/σ et μ/σ, élevés au carré au calcul
+            inverse_std = np.sqrt(precisions)
+            self.stored_precisions = inverse_std.astype(self.dtype)
+            self.stored_means = (means * inverse_std).astype(self.dtype)
+        else:
+            self.stored_precisions = precisions.astype(self.dtype)
+            self.stored_means = (means * precisions).astype(self.dtype)
+
+    @staticmethod
+    def expand(stored_precisions, stored_means, compute_dtype):
+        """Précisions 1/σ² et moyennes μ/σ² dans le type de calcul, à partir des tableaux stockés"""
+        if stored_precisions.dtype == np.float16:
+            inverse_std = stored_precisions.astype(compute_dtype)
+            return inverse_std ** 2, stored_means.astype(compute_dtype) * inverse_std
+        return stored_precisions, stored_means
+
+    @classmethod
+    def from_arrays(cls, constants, stored_precisions, stored_means):
+        """Modèle sur des tableaux déjà préparés (par exemple des vues en mémoire partagée), sans copie"""
+        model = cls.__new__(cls)
+        model.dtype = stored_precisions.dtype
+        model.compute_dtype = constants.dtype
+        model.constants = constants
+        model.stored_precisions = stored_precisions
+        model.stored_means = stored_means
+        return model
+
+    def arrays(self):
+        """Tableaux repris par from_arrays"""
+        return {'constants': self.constants, 'stored_precisions': self.stored_precisions,
+                'stored_means': self.stored_means}
+
+    @classmethod
+    def from_sklearn(cls, model, dtype=np.float64):
+        if model.covariance_type != 'diag':
+            raise ValueError(f"covariances {model.covariance_type} non prises en charge (diag attendu)")
+        return cls(model.weights_, model.means_, model.covariances_, dtype)
+
+    @property
+    def n_components(self):
+        return len(self.constants)
+
+    def component_log_likelihoods(self, X, quadratic=None):
+        """
+        log(w_k N(x_t | μ_k, σ²_k)) pour chaque trame et composante, forme (T, K)
+
+        :param quadratic: Terme Σ x²/σ² déjà calculé (T, K), sinon calculé ici
+        """
+        X = np.asarray(X, dtype=self.compute_dtype)
+        precisions, scaled_means = self.expand(self.stored_precisions, self.stored_means, self.compute_dtype)
+        if quadratic is None:
+            quadratic = (X ** 2) @ precisions.T
+        return self.constants + X @ scaled_means.T - 0.5 * quadratic
+
+    def quadratic(self, X):
+        """Terme Σ x²/σ² de chaque trame et composante, forme (T, K)"""
+        precisions, _ = self.expand(self.stored_precisions, self.stored_means, self.compute_dtype)
+        return (np.asarray(X, dtype=self.compute_dtype) ** 2) @ precisions.T
+
+    def frame_log_likelihoods(self, X):
+        """Log-vraisemblance de chaque trame, forme (T,)"""
+        return _logsumexp(self.component_log_likelihoods(X), axis=1)
+
+    def score(self, X):
+        """Log-vraisemblance moyenne par trame (comme GaussianMixture.score)"""
+        return float(self.frame_log_likelihoods(X).mean())
+
+class GmmSetScorer:
+    def __init__(self, models, dtype=np.float32):
+        """
+        Évaluation complète de modèles indépendants, en numpy et dans la précision choisie.
+
+        :param models: Dictionnaire langue -> GaussianMixture diag
+        :param dtype: Type de stockage des paramètres
+        """
+        self.models = {language: DiagonalGmm.from_sklearn(model, dtype) for language, model in models.items()}
+        self.compute_dtype = np.dtype(np.float32) if np.dtype(dtype) == np.float16 else np.dtype(dtype)
+
+    def score(self, X):
+        """Log-vraisemblance moyenne par trame de chaque langue (dictionnaire langue -> score)"""
+        X = np.asarray(X, dtype=self.compute_dtype)
+        return {language: model.score(X) for language, model in self.models.items()}
+
+    def frame_scores(self, X):
+        """Log-vraisemblance de chaque trame pour chaque langue, forme (T, L) dans l'ordre de self.models"""
+        X = np.asarray(X, dtype=self.compute_dtype)
+        return np.stack([model.frame_log_likelihoods(X) for model in self.models.values()], axis=1)
+
+class UbmScorer:
+    def __init__(self, ubm, models, top_c=5, dtype=np.float64):
+        """
+        Évalue plusieurs langues adaptées d'un même UBM en ne calculant, pour chaque trame, que
+        les top_c composantes les plus vraisemblables selon l'UBM.
+
+        :param ubm: GaussianMixture diag (modèle du monde)
+        :param models: Dictionnaire langue -> GaussianMixture adaptée de l'UBM (mêmes composantes)
+        :param top_c: Nombre de composantes gardées par trame
+        :param dtype: Type de stockage des paramètres
+        """
+        self.ubm = DiagonalGmm.from_sklearn(ubm, dtype)
+        self.top_c = min(top_c, self.ubm.n_components)
+        self.languages = list(models)
+        adapted = [DiagonalGmm.from_sklearn(model, dtype) for model in models.values()]
+        for language, model in zip(self.languages, adapted):
+            if model.stored_means.shape != self.ubm.stored_means.shape:
+                raise ValueError(f"Le modèle {language} n'est pas dérivé de l'UBM "
+                                 f"({model.stored_means.shape} au lieu de {self.ubm.stored_means.shape})")
+        # Paramètres de toutes les langues empilés : (L, K, D) et (L, K)
+        self.constants = np.stack([model.constants for model in adapted])
+        self.stored_means = np.stack([model.stored_means for model in adapted])
+        self.stored_precisions = np.stack([model.stored_precisions for model in adapted])
+        # Adaptation des moyennes seules : Σ x²/σ² est celui de l'UBM, calculé une fois par trame
+        self.shared_precisions = all(np.array_equal(model.stored_precisions, self.ubm.stored_precisions)
+                                     for model in adapted)
+
+    def shortlist(self, X, quadratic=None):
+        """Indices des top_c composantes de l'UBM pour chaque trame, forme (T, C)"""
+        if self.top_c == self.ubm.n_components:
+            return np.broadcast_to(np.arange(self.top_c), (len(X), self.top_c))
+        log_likelihoods = self.ubm.component_log_likelihoods(X, quadratic)
+        return np.argpartition(-log_likelihoods, self.top_c - 1, axis=1)[:, :self.top_c]
+
+    def score(self, X):
+        """Log-vraisemblance moyenne par trame de chaque langue (dictionnaire langue -> score)"""
+        compute = self.ubm.compute_dtype
+        X = np.asarray(X, dtype=compute)
+        ubm_quadratic = self.ubm.quadratic(X)
+        shortlist = self.shortlist(X, ubm_quadratic)
+
+        # Seules les composantes présélectionnées de chaque langue sont évaluées : (L, T, C)
+        precisions, scaled_means = DiagonalGmm.expand(self.stored_precisions[:, shortlist],
+                                                      self.stored_means[:, shortlist], compute)
+        linear = np.einsum('ltcd,td->ltc', scaled_means, X)
+        if self.shared_precisions:
+            quadratic = np.take_along_axis(ubm_quadratic, shortlist, axis=1)[None]
+        else:
+            quadratic = np.einsum('ltcd,td->ltc', precisions, X ** 2)
+        log_likelihoods = self.constants[:, shortlist] + linear - 0.5 * quadratic
+        scores = _logsumexp(log_likelihoods, axis=2).mean(axis=1)
+        return dict(zip(self.languages, scores.tolist()))
+
+def _logsumexp(values, axis):
+    maximum = values.max(axis=axis, keepdims=True)
+    return (maximum + np.log(np.exp(values - maximum).sum(axis=axis, keepdims=True))).squeeze(axis)
+
+def select_frames(mfcc, frame_step=1, max_frames=None):
+    """Trames effectivement évaluées : une sur frame_step, au plus max_frames"""
+    if frame_step > 1:
+        mfcc = mfcc[::frame_step]
+    if max_frames is not None:
+        mfcc = mfcc[:max_frames]
+    return mfcc
+
+def rank_scores(scores):
+    """
+    Classement à partir des log-vraisemblances moyennes par trame.
+
+    :param scores: Dictionnaire langue -> score
+    :return: Liste de (langue, score, probabilité) triée par score décroissant
+    """
+    # Normaliser les log-vraisemblances moyennes par trame en probabilités (softmax)
+    values = np.array(list(scores.values()))
+    probabilities = np.exp(values - values.max())
+    probabilities /= probabilities.sum()
+
+    ranking = [
+        (language, score, float(probability))
+        for (language, score), probability in zip(scores.items(), probabilities)
+    ]
+    ranking.sort(key=lambda x: x[1], reverse=True)
+    return ranking
+
+def train_ubm(features, n_components=64, max_frames=200000, random_state=0):
+    """
+    Entraîne le modèle du monde sur les trames de toutes les langues réunies.
+
+    :param features: Liste de tableaux de MFCC (T, D)
+    :param max_frames: Nombre maximal de trames utilisées (tirage aléatoire au-delà)
+    """
+    from sklearn.mixture import GaussianMixture
+    frames = np.concatenate(features)
+    if len(frames) > max_frames:
+        frames = frames[np.random.default_rng(random_state).choice(len(frames), max_frames, replace=False)]
+    ubm = GaussianMixture(n_components=n_components, covariance_type='diag', max_iter=200,
+                          reg_covar=1e-3, random_state=random_state)
+    ubm.fit(frames)
+    return ubm
+
+def map_adapt(ubm, X, relevance=16.0, adapt=('means',)):
+    """
+    Adaptation MAP de l'UBM aux trames d'une langue (Reynolds et al., 2000).
+
+    :param ubm: GaussianMixture diag
+    :param X: Trames de la langue (T, D)
+    :param relevance: Facteur de pertinence : nombre de trames à partir duquel une composante suit surtout les données
+    :param adapt: Paramètres adaptés parmi 'weights', 'means', 'covariances'
+    :return: GaussianMixture adaptée (mêmes composantes que l'UBM, utilisable avec score)
+    """
+    X = np.asarray(X, dtype=np.float64)
+    responsibilities = ubm.predict_proba(X)
+    counts = responsibilities.sum(axis=0) + 1e-10
+    first_moment = responsibilities.T @ X / counts[:, None]
+    alpha = counts / (counts + relevance)
+
+    model = copy.deepcopy(ubm)
+    if 'means' in adapt:
+        model.means_ = alpha[:, None] * first_moment + (1 - alpha[:, None]) * ubm.means_
+    if 'covariances' in adapt:
+        second_moment = responsibilities.T @ (X ** 2) / counts[:, None]
+        covariances = (alpha[:, None] * second_moment + (1 - alpha[:, None]) * (ubm.covariances_ + ubm.means_ ** 2)
+                       - model.means_ ** 2)
+        model.covariances_ = np.maximum(covariances, ubm.reg_covar)
+    if 'weights' in adapt:
+        weights = alpha * counts / len(X) + (1 - alpha) * ubm.weights_
+        model.weights_ = weights / weights.sum()
+    model.precisions_cholesky_ = 1.0 / np.sqrt(model.covariances_)
+    return model
+
+def load_ubm_models(directory):
+    """UBM et modèles adaptés d'un dossier (ubm.pkl + <langue>.pkl), ou None s'il n'y a pas d'UBM"""
+    import joblib
+    ubm_path = os.path.join(directory, UBM_FILENAME)
+    if not os.path.exists(ubm_path):
+        return None
+    ubm = joblib.load(ubm_path)
+    models = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.pkl') and filename != UBM_FILENAME:
+            models[filename[:-len('.pkl')]] = joblib.load(os.path.join(directory, filename))
+    return ubm, models
+
+def _features_from_audio(data_dir, max_duration):
+    """MFCC de chaque fichier audio de data_dir/<langue>/, extraits comme à la détection"""
+    from language_detector import LanguageDetector
+    detector = LanguageDetector(models_dir=data_dir, scoring='full')
+    features = {}
+    for language in sorted(os.listdir(data_dir)):
+        folder = os.path.join(data_dir, language)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            mfcc = detector.preprocess_audio(os.path.join(folder, filename), max_duration=max_duration)
+            if mfcc is not None and len(mfcc):
+                features.setdefault(language, []).append(mfcc)
+        logger.info("%s : %d fichiers", language, len(features.get(language, ())))
+    return {language: np.concatenate(arrays) for language, arrays in features.items()}
+
+def _features_from_models(models_dir, frames, random_state=0):
+    """Trames tirées de chaque modèle GMM existant (quand le corpus d'origine n'est pas disponible)"""
+    import joblib
+    features = {}
+    for filename in sorted(os.listdir(models_dir)):
+        if filename.endswith('.pkl'):
+            model = joblib.load(os.path.join(models_dir, filename))
+            model.random_state = random_state
+            features[filename[:-len('.pkl')]] = model.sample(frames)[0]
+    return features
+
+def main(argv=None):
+    import joblib
+    parser = argparse.ArgumentParser(description="Dérive un UBM et des modèles de langue adaptés (MAP)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build')
+    source = build.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', help="Dossier contenant un sous-dossier de fichiers audio par langue")
+    source.add_argument('--from-models', help="Dossier de modèles GMM existants dont on tire des trames")
+    build.add_argument('--output', default=os.path.join("models_langues", "ubm"))
+    build.add_argument('--components', type=int, default=64, help="Nombre de composantes de l'UBM")
+    build.add_argument('--relevance', type=float, default=16.0)
+    build.add_argument('--adapt', default='means', help="Paramètres adaptés : means, weights, covariances (séparés par des virgules)")
+    build.add_argument('--frames', type=int, default=20000, help="Trames tirées par modèle (--from-models)")
+    build.add_argument('--max-duration', type=float, default=30, help="Durée lue par fichier audio (--data)")
+    options = parser.parse_args(argv)
+
+    if options.data:
+        features = _features_from_audio(options.data, options.max_duration)
+    else:
+        features = _features_from_models(options.from_models, options.frames)
+    if not features:
+        logger.error("Aucune donnée d'entraînement")
+        return 1
+
+    ubm = train_ubm(list(features.values()), n_components=options.components)
+    os.makedirs(options.output, exist_ok=True)
+    joblib.dump(ubm, os.path.join(options.output, UBM_FILENAME))
+    adapt = tuple(part.strip() for part in options.adapt.split(','))
+    for language, frames in features.items():
+        model = map_adapt(ubm, frames, relevance=options.relevance, adapt=adapt)
+        joblib.dump(model, os.path.join(options.output, f"{language}.pkl"))
+        logger.info("Modèle adapté pour %s (%d trames)", language, len(frames))
+    logger.info("UBM de %d composantes et %d modèles écrits dans %s", options.components, len(features), options.output)
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
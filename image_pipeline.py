@@ -0,0 +1,274 @@
+import os
+import base64
+import hashlib
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, Signal, QBuffer, QByteArray, QIODevice, Qt
+from PySide6.QtGui import QImage, QImageReader
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Métadonnées retirées des fichiers envoyés tels quels : EXIF (position GPS, appareil...), XMP, IPTC, commentaires
+JPEG_METADATA = {0xE1, 0xED, 0xFE}
+PNG_METADATA = {b'tEXt', b'zTXt', b'iTXt', b'eXIf', b'tIME'}
+
+def strip_metadata(data, image_format):
+    """
+    Copie d'un fichier JPEG ou PNG sans ses segments de métadonnées, pixels inchangés.
+
+    :return: Octets du fichier, ou None s'il n'a pas pu être analysé
+    """
+    if image_format == 'PNG':
+        return _strip_png(data)
+    return _strip_jpeg(data)
+
+def _strip_jpeg(data):
+    if data[:2] != b'\xff\xd8':
+        return None
+    parts = [data[:2]]
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Octet de remplissage
+            position += 1
+            continue
+        if marker == 0xD9 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            parts.append(data[position:position + 2])
+            position += 2
+            continue
+        length = int.from_bytes(data[position + 2:position + 4], 'big')
+        end = position + 2 + length
+        if length < 2 or end > len(data):
+            return None
+        if marker == 0xDA:
+            # Début des données compressées : le reste du fichier est recopié tel quel
+            parts.append(data[position:])
+            return b''.join(parts)
+        if marker not in JPEG_METADATA:
+            parts.append(data[position:end])
+        position = end
+    return None
+
+def _strip_png(data):
+    if data[:8] != PNG_SIGNATURE:
+        return None
+    parts = [data[:8]]
+    position = 8
+    while position + 12 <= len(data):
+        length = int.from_bytes(data[position:position + 4], 'big')
+        chunk_type = data[position + 4:position + 8]
+        end = position + 12 + length
+        if end > len(data):
+            return None
+        if chunk_type not in PNG_METADATA:
+            parts.append(data[position:end])
+        position = end
+        if chunk_type == b'IEND':
+            return b''.join(parts)
+    return None
+
+class ImagePayload:
+    """Image encodée telle qu'envoyée au modèle"""
+    __slots__ = ('digest', 'mime_type', 'data', 'width', 'height', 'source_bytes')
+
+    def __init__(self, digest, mime_type, data, width, height, source_bytes):
+        self.digest = digest
+        self.mime_type = mime_type
+        self.data = data
+        self.width = width
+        self.height = height
+        self.source_bytes = source_bytes
+
+    def data_url(self):
+        """URL data: base64 (format image_url des messages multimodaux LangChain)"""
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+class ProcessedImage:
+    """Résultat du traitement d'un fichier : vignette pour la conversation et image pour le modèle"""
+    __slots__ = ('path', 'payload', 'thumbnail', 'cached')
+
+    def __init__(self, path, payload, thumbnail, cached):
+        self.path = path
+        self.payload = payload
+        self.thumbnail = thumbnail
+        self.cached = cached
+
+class ImagePipeline(QObject):
+    # Émis depuis les threads de travail, reçus dans le thread de l'interface
+    finished = Signal(int, object)  # identifiant de la demande, ProcessedImage
+    failed = Signal(int, str)
+
+    MIME_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+
+    def __init__(self, cache_dir="image_cache", max_side=1024, thumbnail_side=240, quality=85,
+                 workers=2, memory_items=32):
+        """
+        Prépare les images hors du thread de l'interface : lecture, empreinte, décodage directement
+        à la résolution utile au modèle, encodage, vignette.
+
+        Vignettes et images encodées sont mises en cache par empreinte du contenu (en mémoire et sur disque).
+
+        :param cache_dir: Dossier du cache disque (None pour le désactiver)
+        :param max_side: Plus grand côté de l'image envoyée au modèle (pixels)
+        :param thumbnail_side: Plus grand côté des vignettes (pixels)
+        :param quality: Qualité JPEG de l'image envoyée
+        :param workers: Nombre de threads de traitement
+        :param memory_items: Nombre d'images gardées en mémoire
+        """
+        super().__init__()
+        self.cache_dir = cache_dir
+        self.max_side = max_side
+        self.thumbnail_side = thumbnail_side
+        self.quality = quality
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image")
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def submit(self, path):
+        """Lance le traitement d'un fichier ; retourne l'identifiant repris par finished / failed"""
+        request_id = next(self._ids)
+        self._executor.submit(self._run, request_id, path)
+        return request_id
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, request_id, path):
+        try:
+            result = self.process(path)
+        except Exception as e:
+            logger.error("Erreur lors du traitement de l'image %s : %s", path, e)
+            self.failed.emit(request_id, str(e))
+            return
+        self.finished.emit(request_id, result)
+
+    def process(self, path, use_cache=True):
+        """Traitement complet d'un fichier (dans le thread appelant)"""
+        with open(path, 'rb') as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+
+        if use_cache:
+            cached = self._from_memory(digest) or self._from_disk(digest, len(source))
+            if cached is not None:
+                payload, thumbnail = cached
+                self._remember(digest, payload, thumbnail)
+                return ProcessedImage(path, payload, thumbnail, cached=True)
+
+        payload, thumbnail = self._decode(source, digest)
+        if use_cache:
+            self._remember(digest, payload, thumbnail)
+            self._to_disk(payload, thumbnail)
+        return ProcessedImage(path, payload, thumbnail, cached=False)
+
+    def _decode(self, source, digest):
+        source_data = QByteArray(source)
+        buffer = QBuffer(source_data)
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+        reader.setAutoTransform(True)
+        source_format = bytes(reader.format().data()).decode('ascii', 'replace').upper()
+        size = reader.size()
+        if size.isValid() and max(size.width(), size.height()) > self.max_side:
+            # Le décodeur réduit pendant la lecture (JPEG : décodage à l'échelle 1/2, 1/4, 1/8)
+            reader.setScaledSize(size.scaled(self.max_side, self.max_side, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            raise ValueError(reader.errorString())
+        if max(image.width(), image.height()) > self.max_side:
+            image = image.scaled(self.max_side, self.max_side, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        image_format = 'PNG' if image.hasAlphaChannel() else 'JPEG'
+        data = None
+        if (source_format in ('JPEG', 'JPG', 'PNG') and size.isValid() and image.size() == size
+                and not reader.transformation()):
+            # Déjà à la bonne taille dans un format accepté : envoyer le fichier tel quel, sans ses métadonnées
+            passthrough_format = 'PNG' if source_format == 'PNG' else 'JPEG'
+            data = strip_metadata(source, passthrough_format)
+            if data is not None:
+                image_format = passthrough_format
+        if data is None:
+            data = self._encode(image, image_format, self.quality)
+
+        if max(image.width(), image.height()) > self.thumbnail_side:
+            thumbnail = image.scaled(self.thumbnail_side, self.thumbnail_side, Qt.KeepAspectRatio,
+                                     Qt.SmoothTransformation)
+        else:
+            # Petite image : jamais agrandie
+            thumbnail = image.copy()
+        payload = ImagePayload(digest, self.MIME_TYPES[image_format], data, image.width(), image.height(),
+                               len(source))
+        return payload, thumbnail
+
+    @staticmethod
+    def _encode(image, image_format, quality=-1):
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        if not image.save(buffer, image_format, quality):
+            raise ValueError(f"encodage {image_format} impossible")
+        return bytes(data.data())
+
+    def _from_memory(self, digest):
+        with self._lock:
+            entry = self._memory.get(digest)
+            if entry is not None:
+                self._memory.move_to_end(digest)
+            return entry
+
+    def _remember(self, digest, payload, thumbnail):
+        with self._lock:
+            self._memory[digest] = (payload, thumbnail)
+            self._memory.move_to_end(digest)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _cache_paths(self, digest):
+        base = os.path.join(self.cache_dir, digest)
+        return base + ".jpg", base + ".png", base + ".thumb.png"
+
+    def _from_disk(self, digest, source_bytes):
+        if not self.cache_dir:
+            return None
+        jpeg_path, png_path, thumbnail_path = self._cache_paths(digest)
+        payload_path = jpeg_path if os.path.exists(jpeg_path) else png_path
+        if not os.path.exists(payload_path) or not os.path.exists(thumbnail_path):
+            return None
+        thumbnail = QImage(thumbnail_path)
+        reader = QImageReader(payload_path)
+        size = reader.size()
+        if thumbnail.isNull() or not size.isValid():
+            return None
+        with open(payload_path, 'rb') as f:
+            data = f.read()
+        mime_type = 'image/jpeg' if payload_path == jpeg_path else 'image/png'
+        return ImagePayload(digest, mime_type, data, size.width(), size.height(), source_bytes), thumbnail
+
+    def _to_disk(self, payload, thumbnail):
+        if not self.cache_dir:
+            return
+        jpeg_path, png_path, thumbnail_path = self._cache_paths(payload.digest)
+        payload_path = jpeg_path if payload.mime_type == 'image/jpeg' else png_path
+        try:
+            # Écriture puis renommage : un autre thread ne lit jamais un fichier à moitié écrit
+            temporary = payload_path + f".{threading.get_ident()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(payload.data)
+            os.replace(temporary, payload_path)
+            temporary = thumbnail_path + f".{threading.get_ident()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(self._encode(thumbnail, 'PNG'))
+            os.replace(temporary, thumbnail_path)
+        except (OSError, ValueError) as e:
+            logger.warning("Cache d'images non écrit : %s", e)
@@ -0,0 +1,493 @@
+"""
+Interprétation continue : capture → détection de parole (VAD) → reconnaissance → traduction → synthèse.
+
+Chaque étape est une tâche asyncio reliée à la suivante par une file bornée ; les appels bloquants
+(reconnaissance, LLM, synthèse) tournent dans le pool de threads propre à leur étape. Les étapes
+travaillent en même temps sur des énoncés successifs : pendant que l'énoncé n est prononcé, n + 1 est
+traduit et n + 2 reconnu. Une file pleine fait attendre l'étape précédente (contre-pression) ; seule
+la capture, qui ne peut pas ralentir le micro, perd alors les blocs les plus anciens.
+
+Pendant la synthèse d'une traduction (et une courte traîne après), la capture est coupée : avec des
+haut-parleurs, le micro entendrait la traduction et la pipeline l'interpréterait à son tour.
+
+Chaque étape mesure son débit, son taux d'occupation, ses latences et le temps passé bloquée.
+"""
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from turn_tracer import shared_tracer
+
+logger = logging.getLogger(__name__)
+
+END = object()  # Fin du flux, transmise d'une étape à la suivante
+GAP = object()  # Capture coupée : l'énoncé en cours est terminé, les blocs suivants ne le prolongent pas
+
+# Réponses de AudioHandler.transcribe qui ne sont pas une transcription
+NOT_RECOGNIZED = ("Aucun audio enregistré", "Je n'ai pas compris l'audio")
+
+class Utterance:
+    """Énoncé détecté et ce que chaque étape en a fait"""
+    __slots__ = ('index', 'audio', 'sample_rate', 'ended', 'turn', 'text', 'translation')
+
+    def __init__(self, index, audio, sample_rate, turn=None):
+        self.index = index
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.ended = time.perf_counter()  # Fin de l'énoncé : référence du retard de l'interprétation
+        self.turn = turn
+        self.text = None
+        self.translation = None
+
+    @property
+    def duration(self):
+        return len(self.audio) / self.sample_rate
+
+class StageMetrics:
+    def __init__(self, name, workers=1, history=1000):
+        self.name = name
+        self.workers = workers
+        self.received = 0
+        self.emitted = 0
+        self.dropped = 0
+        self.busy = 0.0       # Temps de traitement cumulé
+        self.blocked = 0.0    # Temps passé à attendre une place dans la file suivante
+        self.max_queue = 0
+        self.latencies = deque(maxlen=history)
+        self.started = None
+        self.stopped = None
+
+    def summary(self):
+        elapsed = ((self.stopped or time.perf_counter()) - self.started) if self.started else 0.0
+        latencies = sorted(self.latencies)
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+        return {
+            'received': self.received,
+            'emitted': self.emitted,
+            'dropped': self.dropped,
+            'throughput': self.received / elapsed if elapsed else 0.0,
+            'utilization': self.busy / (elapsed * self.workers) if elapsed else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'blocked_s': self.blocked,
+            'max_queue': self.max_queue,
+        }
+
+class LiveSource:
+    """
+    Source temps réel : les blocs arrivent à leur rythme depuis un autre thread (feed). Si la capture
+    ne suit plus, les blocs les plus anciens au-delà de buffer_seconds sont perdus (comptés dans dropped).
+
+    hold / release coupent la capture : les blocs reçus entre-temps sont ignorés (comptés dans muted).
+    """
+
+    def __init__(self, sample_rate, block_size=1024, buffer_seconds=10.0):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.max_blocks = max(1, int(buffer_seconds * sample_rate / block_size))
+        self.dropped = 0
+        self.muted = 0
+        self._loop = None
+        self._queue = None
+        self._hold_lock = threading.Lock()
+        self._holds = 0
+        self._muted_until = 0.0
+
+    def attach(self, loop):
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_blocks)
+
+    def feed(self, block):
+        """Ajoute un bloc (depuis n'importe quel thread)"""
+        if self._holds or time.monotonic() < self._muted_until:
+            self.muted += 1
+            return
+        self._loop.call_soon_threadsafe(self._push, block)
+
+    def hold(self):
+        """Coupe la capture jusqu'à release (depuis n'importe quel thread, appels imbriqués possibles)"""
+        with self._hold_lock:
+            self._holds += 1
+            if self._holds == 1 and self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._push, GAP)
+
+    def release(self, tail=0.0):
+        """Rétablit la capture tail secondes après le dernier release"""
+        with self._hold_lock:
+            self._muted_until = max(self._muted_until, time.monotonic() + tail)
+            self._holds = max(0, self._holds - 1)
+
+    def close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._push, END)
+
+    def _push(self, block):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(block)
+
+    async def blocks(self):
+        while True:
+            block = await self._queue.get()
+            if block is END:
+                return
+            yield block
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.close()
+
+class MicrophoneSource(LiveSource):
+    """Blocs du micro par défaut (sounddevice)"""
+
+    def start(self):
+        import sounddevice as sd
+        self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1, blocksize=self.block_size,
+                                      dtype=np.float32, callback=lambda indata, *args: self.feed(indata[:, 0].copy()))
+        self._stream.start()
+
+    def stop(self):
+        stream = getattr(self, '_stream', None)
+        if stream is not None:
+            stream.stop()
+            stream.close()
+            self._stream = None
+        self.close()
+
+class ArraySource(LiveSource):
+    """Signal en mémoire, joué au rythme réel (multiplié par speed) ou aussi vite que la capture le prend"""
+
+    def __init__(self, signal, sample_rate, block_size=1024, realtime=True, speed=1.0):
+        super().__init__(sample_rate, block_size)
+        self.signal = np.asarray(signal, dtype=np.float32)
+        self.realtime = realtime
+        self.speed = speed
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.realtime:
+            threading.Thread(target=self._play, name="array-source", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        self.close()
+
+    def _play(self):
+        interval = self.block_size / self.sample_rate / self.speed
+        deadline = time.perf_counter()
+        for start in range(0, len(self.signal), self.block_size):
+            if self._stopped.is_set():
+                break
+            self.feed(self.signal[start:start + self.block_size])
+            deadline += interval
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+        self.close()
+
+    async def blocks(self):
+        if self.realtime:
+            async for block in super().blocks():
+                yield block
+            return
+        for start in range(0, len(self.signal), self.block_size):
+            if self._stopped.is_set():
+                return
+            yield self.signal[start:start + self.block_size]
+
+class EnergyVad:
+    def __init__(self, sample_rate, threshold_db=-40.0, start_seconds=0.1, pause_seconds=0.8,
+                 max_seconds=15.0, pre_roll_seconds=0.3):
+        """
+        Découpe le flux en énoncés sur l'énergie des blocs.
+
+        :param threshold_db: Niveau RMS (dB) au-dessus duquel un bloc contient de la parole
+        :param start_seconds: Parole continue nécessaire pour ouvrir un énoncé
+        :param pause_seconds: Silence qui termine un énoncé (comme Recognizer.pause_threshold)
+        :param max_seconds: Durée au-delà de laquelle un énoncé est coupé (orateur sans pause)
+        :param pre_roll_seconds: Audio gardé avant l'ouverture (début du premier mot)
+        """
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.start_samples = int(start_seconds * sample_rate)
+        self.pause_samples = int(pause_seconds * sample_rate)
+        self.max_samples = int(max_seconds * sample_rate)
+        self.pre_roll_samples = int(pre_roll_seconds * sample_rate)
+        self._pre_roll = deque()
+        self._pre_roll_length = 0
+        self._voiced_run = 0
+        self._speech = None
+        self._speech_length = 0
+        self._silence = 0
+
+    def process(self, block):
+        """Retourne l'énoncé terminé par ce bloc (signal float32) ou None"""
+        level = 10 * np.log10(np.mean(np.square(block, dtype=np.float64)) + 1e-12)
+        voiced = level >= self.threshold_db
+        if self._speech is None:
+            self._pre_roll.append(block)
+            self._pre_roll_length += len(block)
+            while self._pre_roll_length - len(self._pre_roll[0]) >= self.pre_roll_samples + self.start_samples:
+                self._pre_roll_length -= len(self._pre_roll.popleft())
+            self._voiced_run = self._voiced_run + len(block) if voiced else 0
+            if self._voiced_run >= self.start_samples:
+                self._speech = list(self._pre_roll)
+                self._speech_length = self._pre_roll_length
+                self._pre_roll.clear()
+                self._pre_roll_length = 0
+                self._silence = 0
+            return None
+
+        self._speech.append(block)
+        self._speech_length += len(block)
+        self._silence = 0 if voiced else self._silence + len(block)
+        if self._silence >= self.pause_samples or self._speech_length >= self.max_samples:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """Termine l'énoncé en cours (fin du flux, capture coupée)"""
+        speech, self._speech = self._speech, None
+        self._voiced_run = 0
+        self._pre_roll.clear()
+        self._pre_roll_length = 0
+        if not speech:
+            return None
+        audio = np.concatenate(speech)
+        # Silence final retiré, sauf une courte marge
+        keep = len(audio) - max(0, self._silence - self.pause_samples // 4)
+        return audio[:keep]
+
+class _Stage:
+    """Étape à workers threads, qui transmet ses résultats dans l'ordre d'arrivée"""
+
+    def __init__(self, name, handler, inbox, outbox, workers, on_output=None):
+        self.name = name
+        self.handler = handler
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.on_output = on_output
+        self.metrics = StageMetrics(name, workers)
+        self._taken = 0
+        self._next = 0
+        self._turn = None
+
+    async def run(self):
+        self._turn = asyncio.Condition()
+        self.metrics.started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"interpreter-{self.name}") as executor:
+            await asyncio.gather(*(self._work(executor) for _ in range(self.workers)))
+        if self.outbox is not None:
+            await self.outbox.put(END)
+        self.metrics.stopped = time.perf_counter()
+
+    async def _work(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.inbox.get()
+            if item is END:
+                # Laissé dans la file pour les autres workers de l'étape
+                self.inbox.put_nowait(END)
+                return
+            sequence, self._taken = self._taken, self._taken + 1
+            self.metrics.received += 1
+            self.metrics.max_queue = max(self.metrics.max_queue, self.inbox.qsize() + 1)
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(executor, self.handler, item)
+            except Exception as e:
+                logger.error("Étape %s, énoncé %d : %s", self.name, item.index, e)
+                result = None
+            elapsed = time.perf_counter() - start
+            self.metrics.busy += elapsed
+            self.metrics.latencies.append(elapsed)
+
+            async with self._turn:
+                await self._turn.wait_for(lambda: self._next == sequence)
+                try:
+                    if result is None:
+                        self.metrics.dropped += 1
+                        shared_tracer().end_turn(item.turn)
+                    else:
+                        if self.on_output is not None:
+                            self.on_output(result)
+                        if self.outbox is not None:
+                            waited = time.perf_counter()
+                            await self.outbox.put(result)
+                            self.metrics.blocked += time.perf_counter() - waited
+                        self.metrics.emitted += 1
+                finally:
+                    self._next += 1
+                    self._turn.notify_all()
+
+class InterpreterPipeline:
+    def __init__(self, source, transcribe, translate, speak, queue_size=2, vad=None, stt_workers=2,
+                 translate_workers=1, on_event=None, echo_tail=0.5):
+        """
+        :param source: LiveSource (MicrophoneSource, ArraySource...)
+        :param transcribe: transcribe(audio, turn) -> texte (AudioHandler.transcribe)
+        :param translate: translate(texte, turn) -> traduction (GeminiAgent.get_response en mode interprète)
+        :param speak: speak(traduction, turn), bloquant jusqu'à la fin de la lecture (AudioHandler.say)
+        :param queue_size: Capacité des files entre étapes (énoncés)
+        :param vad: EnergyVad (par défaut : réglages de EnergyVad à la fréquence de la source)
+        :param stt_workers: Reconnaissances en parallèle (appels réseau)
+        :param translate_workers: Traductions en parallèle (1 : la mémoire de l'agent reste dans l'ordre)
+        :param on_event: on_event(type, utterance) pour 'transcript', 'translation' et 'spoken',
+            appelé depuis le thread de la pipeline, dans l'ordre des énoncés
+        :param echo_tail: Capture coupée pendant chaque synthèse et echo_tail secondes après (écho de la
+            pièce, tampon de sortie) ; None pour ne pas la couper (casque, source simulée)
+        """
+        self.source = source
+        self.vad = vad or EnergyVad(source.sample_rate)
+        self.queue_size = queue_size
+        self.on_event = on_event
+        self.echo_tail = echo_tail
+        self.tracer = shared_tracer()
+        self.lags = deque(maxlen=1000)  # Fin de l'énoncé -> début de la synthèse de sa traduction
+        self._transcribe = transcribe
+        self._translate = translate
+        self._speak = speak
+        self._workers = {'stt': stt_workers, 'translate': translate_workers}
+        self._thread = None
+        self.stages = {}
+        self.capture_metrics = StageMetrics('capture')
+        self.vad_metrics = StageMetrics('vad')
+
+    def _recognize(self, utterance):
+        text = self._transcribe(utterance.audio, utterance.turn)
+        if not text or text in NOT_RECOGNIZED or text.startswith("Erreur de service"):
+            logger.debug("Énoncé %d non reconnu : %s", utterance.index, text)
+            return None
+        utterance.text = text
+        return utterance
+
+    def _translation(self, utterance):
+        utterance.translation = self._translate(utterance.text, utterance.turn)
+        return utterance if utterance.translation else None
+
+    def _speech(self, utterance):
+        self.lags.append(time.perf_counter() - utterance.ended)
+        if self.echo_tail is not None:
+            self.source.hold()
+        try:
+            self._speak(utterance.translation, utterance.turn)
+        finally:
+            if self.echo_tail is not None:
+                self.source.release(self.echo_tail)
+            self.tracer.end_turn(utterance.turn)
+        return utterance
+
+    def _event(self, kind):
+        def emit(utterance):
+            if self.on_event is not None:
+                try:
+                    self.on_event(kind, utterance)
+                except Exception as e:
+                    logger.error("Erreur dans le suivi de l'interprétation : %s", e)
+        return emit
+
+    async def _capture(self, outbox):
+        metrics = self.capture_metrics
+        metrics.started = time.perf_counter()
+        async for block in self.source.blocks():
+            if block is not GAP:
+                metrics.received += 1
+            waited = time.perf_counter()
+            await outbox.put(block)
+            metrics.blocked += time.perf_counter() - waited
+            if block is not GAP:
+                metrics.emitted += 1
+        metrics.dropped = self.source.dropped
+        await outbox.put(END)
+        metrics.stopped = time.perf_counter()
+
+    async def _detect(self, inbox, outbox):
+        metrics = self.vad_metrics
+        metrics.started = time.perf_counter()
+        index = 0
+        while True:
+            block = await inbox.get()
+            # Capture coupée : la parole entendue avant la synthèse forme un énoncé à elle seule
+            audio = self.vad.flush() if block is END or block is GAP else self.vad.process(block)
+            if block is not END and block is not GAP:
+                metrics.received += 1
+            if audio is not None and len(audio):
+                utterance = Utterance(index, audio, self.source.sample_rate, self.tracer.begin_turn('interprète'))
+                index += 1
+                waited = time.perf_counter()
+                await outbox.put(utterance)
+                metrics.blocked += time.perf_counter() - waited
+                metrics.emitted += 1
+            if block is END:
+                break
+        await outbox.put(END)
+        metrics.stopped = time.perf_counter()
+
+    async def run(self):
+        """Fait tourner la pipeline jusqu'à la fin de la source, puis vide les files"""
+        self.source.attach(asyncio.get_running_loop())
+        # Blocs de quelques dizaines de ms : une file plus longue que celle des énoncés
+        blocks = asyncio.Queue(maxsize=self.queue_size * 32)
+        utterances, transcripts, translations = (asyncio.Queue(maxsize=self.queue_size) for _ in range(3))
+        self.stages = {
+            'stt': _Stage('stt', self._recognize, utterances, transcripts, self._workers['stt'],
+                          self._event('transcript')),
+            'translate': _Stage('translate', self._translation, transcripts, translations,
+                                self._workers['translate'], self._event('translation')),
+            # Un seul moteur de synthèse : les traductions sont dites l'une après l'autre
+            'tts': _Stage('tts', self._speech, translations, None, 1, self._event('spoken')),
+        }
+        self.source.start()
+        try:
+            await asyncio.gather(self._capture(blocks), self._detect(blocks, utterances),
+                                 *(stage.run() for stage in self.stages.values()))
+        finally:
+            self.source.stop()
+        self.log_metrics()
+
+    def start(self):
+        """Lance la pipeline dans son propre thread (boucle asyncio dédiée)"""
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="interpreter", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True, timeout=None):
+        """Arrête la capture ; les énoncés déjà détectés sont traités jusqu'au bout"""
+        self.source.stop()
+        if wait and self._thread is not None:
+            self._thread.join(timeout)
+
+    def wait(self, timeout=None):
+        """Attend la fin de la source et le traitement de tous les énoncés"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def metrics(self):
+        """Mesures par étape et retard de l'interprétation (fin de l'énoncé -> début de la synthèse)"""
+        result = {'capture': self.capture_metrics.summary(), 'vad': self.vad_metrics.summary()}
+        result.update((name, stage.metrics.summary()) for name, stage in self.stages.items())
+        lags = sorted(self.lags)
+        result['lag'] = {
+            'count': len(lags),
+            'p50_s': lags[len(lags) // 2] if lags else 0.0,
+            'max_s': lags[-1] if lags else 0.0,
+        }
+        return result
+
+    def log_metrics(self):
+        metrics = self.metrics()
+        for name in ('capture', 'vad', 'stt', 'translate', 'tts'):
+            stage = metrics[name]
+            logger.info("%s : %d reçus, %d transmis, %d perdus, %.1f/s, occupation %.0f %%, p95 %.0f ms, "
+                        "bloquée %.1f s", name, stage['received'], stage['emitted'], stage['dropped'],
+                        stage['throughput'], stage['utilization'] * 100, stage['p95_ms'], stage['blocked_s'])
+        if self.source.muted:
+            logger.info("Capture coupée pendant la synthèse : %d blocs ignorés", self.source.muted)
+        logger.info("Retard de l'interprétation : médiane %.1f s, max %.1f s (%d énoncés)",
+                    metrics['lag']['p50_s'], metrics['lag']['max_s'], metrics['lag']['count'])
@@ -1,29 +1,64 @@
 import os
+import sys
+import time
+import argparse
 import numpy as np
 import librosa
-import pickle
+import joblib
 from pydub import AudioSegment
 import logging
+from startup_profiler import timed
+from gmm_scoring import GmmSetScorer, UbmScorer, load_ubm_models, rank_scores, select_frames
 
-# Configuration du logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# La configuration des logs est faite par l'application (app_logging.setup_logging)
+logger = logging.getLogger(__name__)
+
+# Paramètres d'extraction partagés par la détection et l'entraînement (train_models.py)
+SAMPLE_RATE = 44100
+N_MFCC = 13
+
+def extract_mfcc(y, sr, max_duration=None):
+    """
+    MFCC d'un signal mono, forme (T, N_MFCC).
+
+    :param max_duration: Durée maximale analysée en secondes (None : tout le signal)
+    """
+    y = np.asarray(y, dtype=np.float32).reshape(-1)
+    if max_duration is not None and len(y) > max_duration * sr:
+        y = y[:int(max_duration * sr)]
+    return librosa.feature.mfcc(y=y, sr=sr, n_mfcc=N_MFCC).T
 
 class LanguageDetector:
-    def __init__(self, models_dir="models_langues"):
+    def __init__(self, models_dir="models_langues", scoring='auto', top_c=5, precision='float64',
+                 frame_step=1, max_frames=None):
         """
         Initialise le détecteur de langue avec les modèles GMM.
         
         :param models_dir: Chemin vers le dossier contenant les modèles .pkl
+        :param scoring: 'full' (chaque modèle complet), 'ubm' (modèles adaptés de models_dir/ubm,
+            top_c composantes par trame) ou 'auto' (ubm si le dossier existe)
+        :param top_c: Composantes de l'UBM gardées par trame en mode ubm
+        :param precision: Stockage des paramètres : 'float64' (exact, sklearn), 'float32' ou 'float16'
+        :param frame_step: N'évaluer qu'une trame sur frame_step
+        :param max_frames: Nombre maximal de trames évaluées (None : toutes)
         """
         self.models_dir = models_dir
         self.models = {}
+        self.scoring = scoring
+        self.top_c = top_c
+        self.precision = precision
+        self.frame_step = frame_step
+        self.max_frames = max_frames
+        self.ubm_scorer = None
+        self.model_scorer = None  # Évaluation numpy en précision réduite (None : sklearn)
         self.load_models()
         
+    @timed('LanguageDetector.load_models')
     def load_models(self):
         """Charge tous les modèles GMM depuis le dossier models_dir."""
         try:
             if not os.path.exists(self.models_dir):
-                logging.error(f"Le dossier {self.models_dir} n'existe pas")
+                logger.error("Le dossier %s n'existe pas", self.models_dir)
                 return
                 
             for filename in os.listdir(self.models_dir):
@@ -31,22 +66,42 @@ class LanguageDetector:
                     language = filename.replace('.pkl', '')
                     model_path = os.path.join(self.models_dir, filename)
                     try:
-                        with open(model_path, 'rb') as f:
-                            model = pickle.load(f)
-                            if hasattr(model, 'score'):  # Vérifier que c'est bien un modèle GMM
-                                self.models[language] = model
-                                logging.info(f"Modèle chargé pour la langue : {language}")
-                            else:
-                                logging.error(f"Le modèle pour {language} n'est pas un modèle GMM valide")
+                        # Les modèles sont sérialisés avec joblib (tableaux numpy hors du flux pickle)
+                        model = joblib.load(model_path)
+                        if hasattr(model, 'score'):  # Vérifier que c'est bien un modèle GMM
+                            self.models[language] = model
+                            logger.info("Modèle chargé pour la langue : %s", language)
+                        else:
+                            logger.error("Le modèle pour %s n'est pas un modèle GMM valide", language)
                     except Exception as e:
-                        logging.error(f"Erreur lors du chargement du modèle {language}: {str(e)}")
+                        logger.error("Erreur lors du chargement du modèle %s: %s", language, e)
                         
-            if not self.models:
-                logging.warning("Aucun modèle n'a pu être chargé")
+            if self.precision != 'float64' and self.models:
+                self.model_scorer = GmmSetScorer(self.models, dtype=self.precision)
+            if self.scoring in ('auto', 'ubm'):
+                self.load_ubm()
+            if not self.models and self.ubm_scorer is None:
+                logger.warning("Aucun modèle n'a pu être chargé")
                 
         except Exception as e:
-            logging.error(f"Erreur lors du chargement des modèles : {str(e)}")
+            logger.error("Erreur lors du chargement des modèles : %s", e)
             
+    def load_ubm(self):
+        """Charge l'UBM et les modèles qui en sont adaptés (models_dir/ubm), s'ils existent"""
+        directory = os.path.join(self.models_dir, "ubm")
+        try:
+            loaded = load_ubm_models(directory) if os.path.isdir(directory) else None
+            if loaded is None:
+                if self.scoring == 'ubm':
+                    logger.warning("Pas d'UBM dans %s : évaluation complète de chaque modèle", directory)
+                return
+            ubm, models = loaded
+            self.ubm_scorer = UbmScorer(ubm, models, top_c=self.top_c, dtype=self.precision)
+            logger.info("Évaluation par UBM : %d composantes, top %d, langues %s",
+                        ubm.n_components, self.ubm_scorer.top_c, ", ".join(models))
+        except Exception as e:
+            logger.error("Erreur lors du chargement de l'UBM : %s", e)
+
     def preprocess_audio(self, audio_path, max_duration=5):
         """
         Prétraite l'audio : réduit le silence et extrait les MFCC.
@@ -57,22 +112,78 @@ class LanguageDetector:
         """
         try:
             # Charger l'audio
-            y, sr = librosa.load(audio_path, sr=44100)
-            
-            # Limiter à max_duration secondes
-            if len(y) > max_duration * sr:
-                y = y[:int(max_duration * sr)]
-            
-            # Extraire les MFCC
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            mfcc = mfcc.T  # (T, n_mfcc)
+            y, sr = librosa.load(audio_path, sr=SAMPLE_RATE)
+            return self.preprocess_signal(y, sr, max_duration)
             
-            return mfcc
+        except Exception as e:
+            logger.error("Erreur lors du prétraitement de l'audio : %s", e)
+            return None
+
+    def preprocess_signal(self, y, sr, max_duration=5):
+        """
+        Extrait les MFCC d'un signal déjà en mémoire (sans passer par un fichier).
+        
+        :param y: Signal mono en float
+        :param sr: Fréquence d'échantillonnage du signal
+        :param max_duration: Durée maximale en secondes
+        :return: MFCC extraits
+        """
+        try:
+            # Limiter à max_duration secondes et extraire les MFCC
+            return extract_mfcc(y, sr, max_duration)
             
         except Exception as e:
-            logging.error(f"Erreur lors du prétraitement de l'audio : {str(e)}")
+            logger.error("Erreur lors du prétraitement du signal : %s", e)
             return None
+
+    def rank_languages(self, mfcc):
+        """
+        Classe les langues par vraisemblance pour des MFCC donnés.
+        
+        :param mfcc: MFCC de forme (T, n_mfcc)
+        :return: Liste de (langue, score, probabilité) triée par score décroissant
+        """
+        if mfcc is None or len(mfcc) == 0 or not (self.models or self.ubm_scorer):
+            return []
+        mfcc = self.select_frames(mfcc)
             
+        if self.ubm_scorer is not None:
+            scores = self.ubm_scorer.score(mfcc)
+        elif self.model_scorer is not None:
+            scores = self.model_scorer.score(mfcc)
+        else:
+            scores = {language: model.score(mfcc) for language, model in self.models.items()}
+        return rank_scores(scores)
+
+    def select_frames(self, mfcc):
+        """Trames effectivement évaluées : une sur frame_step, au plus max_frames"""
+        return select_frames(mfcc, self.frame_step, self.max_frames)
+
+    def rank_languages_from_signal(self, y, sr, max_duration=1):
+        """
+        Classe les langues à partir du début d'un signal en mémoire.
+        
+        :param y: Signal mono en float
+        :param sr: Fréquence d'échantillonnage du signal
+        :param max_duration: Durée analysée en secondes
+        :return: Liste de (langue, score, probabilité) triée par score décroissant
+        """
+        try:
+            return self.rank_languages(self.preprocess_signal(y, sr, max_duration))
+        except Exception as e:
+            logger.error("Erreur lors du classement des langues : %s", e)
+            return []
+            
+    def segment_languages(self, audio_path, **options):
+        """
+        Chronologie des langues d'un long enregistrement, lu par blocs (voir language_segmenter).
+
+        :param options: Arguments de LanguageSegmenter (window, hop, switch_penalty...)
+        :return: Liste de LanguageSegment (start, end, language, confidence)
+        """
+        from language_segmenter import LanguageSegmenter
+        return LanguageSegmenter(self, **options).segment(audio_path)
+
     def detect_language(self, audio_path):
         """
         Détecte la langue parlée dans l'audio en utilisant les modèles GMM.
@@ -87,17 +198,116 @@ class LanguageDetector:
                 return None
                 
             # Calculer les scores pour chaque modèle
-            scores = {}
-            for language, model in self.models.items():
-                score = model.score(mfcc)
-                scores[language] = score
+            ranking = self.rank_languages(mfcc)
+            if not ranking:
+                return None
                 
             # Trouver la langue avec le meilleur score
-            detected_language = max(scores.items(), key=lambda x: x[1])[0]
-            logging.info(f"Langue détectée par GMM : {detected_language}")
+            detected_language = ranking[0][0]
+            logger.info("Langue détectée par GMM : %s", detected_language)
             
             return detected_language
             
         except Exception as e:
-            logging.error(f"Erreur lors de la détection de langue : {str(e)}")
-            return None 
\ No newline at end of file
+            logger.error("Erreur lors de la détection de langue : %s", e)
+            return None
+
+# Réglages comparés par fast_mode_report (arguments de LanguageDetector)
+FAST_MODES = [
+    {'precision': 'float32'},
+    {'precision': 'float16'},
+    {'precision': 'float32', 'frame_step': 2},
+    {'precision': 'float32', 'frame_step': 4},
+    {'precision': 'float32', 'max_frames': 100},
+    {'precision': 'float16', 'frame_step': 2, 'max_frames': 100},
+    {'precision': 'float16', 'frame_step': 4, 'max_frames': 50},
+]
+
+def parse_mode(text):
+    """Convertit "precision=float16,frame_step=2,max_frames=100" en arguments de LanguageDetector"""
+    mode = {}
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        key, _, value = part.partition('=')
+        if key in ('frame_step', 'max_frames', 'top_c'):
+            mode[key] = int(value)
+        elif key in ('precision', 'scoring'):
+            mode[key] = value
+        else:
+            raise ValueError(f"Réglage inconnu : {part}")
+    return mode
+
+def fast_mode_report(models_dir, segments, modes=FAST_MODES, repeat=3):
+    """
+    Compare les modes rapides au mode exact (float64, toutes les trames, sklearn).
+
+    :param segments: Liste de MFCC (T, n_mfcc) à classer
+    :param modes: Liste de réglages (arguments de LanguageDetector)
+    :param repeat: Nombre de passes chronométrées (on garde la plus rapide)
+    :return: Liste de dictionnaires mode, agreement (même langue en tête), probability_error
+        (écart moyen de probabilité de la langue de référence), segments_per_second, speedup
+    """
+    def run(detector):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rankings = [detector.rank_languages(segment) for segment in segments]
+            best = min(best, time.perf_counter() - start)
+        return rankings, best
+
+    exact_rankings, exact_time = run(LanguageDetector(models_dir, scoring='full'))
+    reference = [dict((language, probability) for language, _, probability in ranking) for ranking in exact_rankings]
+    rows = [{'mode': {'precision': 'float64'}, 'agreement': 1.0, 'probability_error': 0.0,
+             'segments_per_second': len(segments) / exact_time, 'speedup': 1.0}]
+    for mode in modes:
+        settings = dict(mode)
+        settings.setdefault('scoring', 'full')
+        rankings, elapsed = run(LanguageDetector(models_dir, **settings))
+        agreement = np.mean([ranking[0][0] == exact[0][0] for ranking, exact in zip(rankings, exact_rankings)])
+        error = np.mean([abs(dict((language, probability) for language, _, probability in ranking)[exact[0][0]]
+                             - probabilities[exact[0][0]])
+                         for ranking, exact, probabilities in zip(rankings, exact_rankings, reference)])
+        rows.append({'mode': mode, 'agreement': float(agreement), 'probability_error': float(error),
+                     'segments_per_second': len(segments) / elapsed, 'speedup': exact_time / elapsed})
+    return rows
+
+def _sampled_segments(models_dir, count, frames, seed=0):
+    """Segments de MFCC tirés de chaque modèle (en l'absence d'enregistrements)"""
+    segments = []
+    for filename in sorted(os.listdir(models_dir)):
+        if filename.endswith('.pkl'):
+            model = joblib.load(os.path.join(models_dir, filename))
+            for index in range(count):
+                model.random_state = seed + index
+                segments.append(model.sample(frames)[0])
+    return segments
+
+if __name__ == "__main__":
+    # python language_detector.py [--audio a.wav b.wav ...] : précision et débit des modes rapides
+    parser = argparse.ArgumentParser(description="Accord avec le mode exact et débit des modes rapides")
+    parser.add_argument('--models-dir', default="models_langues")
+    parser.add_argument('--audio', nargs='*', default=[], help="Enregistrements découpés en segments de --seconds")
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--segments', type=int, default=40, help="Segments tirés par modèle, sans --audio")
+    parser.add_argument('--mode', action='append', type=parse_mode,
+                        help="Réglage à comparer (precision=float16,frame_step=2,...) ; par défaut FAST_MODES")
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    # MFCC au pas de 512 échantillons
+    frames_per_segment = int(options.seconds * SAMPLE_RATE / 512) + 1
+    if options.audio:
+        detector = LanguageDetector(options.models_dir, scoring='full')
+        segments = []
+        for path in options.audio:
+            mfcc = detector.preprocess_audio(path, max_duration=sys.maxsize)
+            if mfcc is not None:
+                segments += [mfcc[i:i + frames_per_segment] for i in range(0, len(mfcc), frames_per_segment)]
+    else:
+        segments = _sampled_segments(options.models_dir, options.segments, frames_per_segment)
+
+    print(f"{len(segments)} segments de {options.seconds:g} s")
+    print(f"{'mode':50s} {'accord':>7s} {'écart p':>8s} {'segments/s':>11s} {'gain':>6s}")
+    for row in fast_mode_report(options.models_dir, segments, options.mode or FAST_MODES):
+        mode = ", ".join(f"{key}={value}" for key, value in row['mode'].items())
+        print(f"{mode:50s} {row['agreement']:7.1%} {row['probability_error']:8.4f} "
+              f"{row['segments_per_second']:11.0f} {row['speedup']:5.1f}x")
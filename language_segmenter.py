@@ -0,0 +1,314 @@
+"""
+Segmentation d'un long enregistrement en langues : chronologie des passages dans chaque langue.
+
+L'audio est lu par blocs (WAV projeté en mémoire, autres formats décodés au fil de l'eau par ffmpeg),
+les MFCC calculés bloc par bloc sans discontinuité aux jointures, et la log-vraisemblance de chaque
+trame évaluée une seule fois pour toutes les langues ; le score d'une fenêtre glissante est la moyenne
+de ses trames. Les décisions par fenêtre sont lissées par Viterbi (pénalité de changement de langue).
+
+La mémoire utilisée pour l'audio ne dépend que de la taille des blocs et des fenêtres ; seuls les
+scores par fenêtre (quelques octets par fenêtre) sont gardés jusqu'au lissage.
+
+    python language_segmenter.py reunion.wav --window 2 --hop 0.5
+"""
+import sys
+import struct
+import logging
+import argparse
+import subprocess
+import numpy as np
+import librosa
+
+from gmm_scoring import GmmSetScorer, _logsumexp
+from language_detector import SAMPLE_RATE, N_MFCC
+
+logger = logging.getLogger(__name__)
+
+N_FFT = 2048  # Valeurs par défaut de librosa.feature.mfcc, comme à la détection
+HOP_LENGTH = 512
+UNLIKELY = -1e9
+
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_FLOAT = 3
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+WAV_DTYPES = {(WAV_FORMAT_PCM, 8): 'u1', (WAV_FORMAT_PCM, 16): '<i2', (WAV_FORMAT_PCM, 32): '<i4',
+              (WAV_FORMAT_FLOAT, 32): '<f4', (WAV_FORMAT_FLOAT, 64): '<f8'}
+
+class LanguageSegment:
+    """Passage dans une langue (None : silence)"""
+    __slots__ = ('start', 'end', 'language', 'confidence')
+
+    def __init__(self, start, end, language, confidence):
+        self.start = start
+        self.end = end
+        self.language = language
+        self.confidence = confidence
+
+    def as_dict(self):
+        return {'start': self.start, 'end': self.end, 'language': self.language, 'confidence': self.confidence}
+
+    def __repr__(self):
+        return f"LanguageSegment({self.start:.2f}-{self.end:.2f} s, {self.language}, {self.confidence:.2f})"
+
+def wav_layout(path):
+    """
+    Position et format des échantillons d'un fichier WAV.
+
+    :return: (décalage des données, nombre de trames, canaux, fréquence, type numpy),
+        ou None si le format ne se projette pas directement en mémoire (24 bits, compressé, pas un WAV)
+    """
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return None
+        file_size = f.seek(0, 2)
+        position = 12
+        audio_format = None
+        while position + 8 <= file_size:
+            f.seek(position)
+            chunk_id, size = struct.unpack('<4sI', f.read(8))
+            if chunk_id == b'fmt ':
+                fmt = f.read(min(size, 40))
+                audio_format, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if audio_format == WAV_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    audio_format = struct.unpack('<H', fmt[24:26])[0]
+            elif chunk_id == b'data':
+                if audio_format is None:
+                    return None
+                dtype = WAV_DTYPES.get((audio_format, bits))
+                if dtype is None:
+                    return None
+                # Taille parfois inexacte (enregistrement interrompu, 0xFFFFFFFF en flux) : bornée au fichier
+                size = min(size, file_size - position - 8)
+                return position + 8, size // block_align, channels, sample_rate, np.dtype(dtype)
+            position += 8 + size + (size & 1)
+    return None
+
+def _read_wav(path, layout, chunk_samples, sample_rate):
+    offset, frames, channels, source_rate, dtype = layout
+    if dtype.kind == 'u':
+        scale, shift = 128.0, 128.0
+    elif dtype.kind == 'i':
+        scale, shift = float(np.iinfo(dtype).max) + 1, 0.0
+    else:
+        scale, shift = 1.0, 0.0
+    # Blocs lus dans la fréquence source, de même durée que chunk_samples
+    source_chunk = int(chunk_samples * source_rate / sample_rate)
+    resampler = None
+    if source_rate != sample_rate:
+        import soxr
+        # Rééchantillonnage continu d'un bloc à l'autre (état du filtre conservé), comme librosa.resample
+        # (soxr_hq) sur le fichier entier : pas d'artefact aux jointures
+        resampler = soxr.ResampleStream(source_rate, sample_rate, 1, dtype='float32', quality='HQ')
+    for start in range(0, frames, source_chunk):
+        # Une projection par bloc, libérée aussitôt : les pages lues ne s'accumulent pas dans le processus
+        count = min(source_chunk, frames - start)
+        samples = np.memmap(path, dtype=dtype, mode='r', offset=offset + start * channels * dtype.itemsize,
+                            shape=(count, channels))
+        block = (np.asarray(samples, dtype=np.float32) - shift) / scale
+        del samples
+        block = block.mean(axis=1)
+        if resampler is not None:
+            block = resampler.resample_chunk(block, last=start + count >= frames)
+        yield block.astype(np.float32, copy=False)
+
+def _read_ffmpeg(path, chunk_samples, sample_rate):
+    from pydub import AudioSegment
+    # Même exécutable que pydub, mais lu par blocs (AudioSegment décode tout le fichier en mémoire)
+    command = [AudioSegment.converter, '-nostdin', '-v', 'error', '-i', path,
+               '-f', 'f32le', '-ac', '1', '-ar', str(sample_rate), '-']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(chunk_samples * 4)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 4 * 4], dtype='<f4')
+    finally:
+        process.stdout.close()
+        error = process.stderr.read().decode('utf-8', 'replace').strip()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise OSError(f"décodage de {path} impossible : {error}")
+
+def iter_audio(path, chunk_seconds=30.0, sample_rate=SAMPLE_RATE):
+    """Signal mono float32 à sample_rate, par blocs de chunk_seconds"""
+    chunk_samples = int(chunk_seconds * sample_rate)
+    layout = wav_layout(path)
+    if layout is not None:
+        return _read_wav(path, layout, chunk_samples, sample_rate)
+    return _read_ffmpeg(path, chunk_samples, sample_rate)
+
+class _StreamingFeatures:
+    """MFCC et énergie par trame d'un signal reçu par blocs, identiques à un calcul d'un seul tenant (aux arrondis float32 près)"""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.carry = np.zeros(0, dtype=np.float32)
+        self.samples = 0
+
+    def push(self, block):
+        self.samples += len(block)
+        signal = np.concatenate([self.carry, block])
+        frames = 1 + (len(signal) - N_FFT) // HOP_LENGTH if len(signal) >= N_FFT else 0
+        if frames == 0:
+            self.carry = signal
+            return np.zeros((0, N_MFCC), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        used = signal[:(frames - 1) * HOP_LENGTH + N_FFT]
+        # Le reste (début de la trame suivante) est repris avec le bloc suivant
+        self.carry = signal[frames * HOP_LENGTH:]
+        mfcc = librosa.feature.mfcc(y=used, sr=self.sample_rate, n_mfcc=N_MFCC, n_fft=N_FFT,
+                                    hop_length=HOP_LENGTH, center=False).T
+        energy = librosa.feature.rms(y=used, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False)[0]
+        return mfcc, energy
+
+class LanguageSegmenter:
+    def __init__(self, detector=None, models_dir="models_langues", window=2.0, hop=0.5, chunk=30.0,
+                 switch_penalty=4.0, silence_db=-45.0, min_voiced=0.25, precision=None):
+        """
+        Chronologie des langues d'un long enregistrement, par fenêtres glissantes.
+
+        :param detector: LanguageDetector dont on reprend les modèles (sinon chargés depuis models_dir)
+        :param window: Durée d'une fenêtre évaluée (s)
+        :param hop: Pas entre deux fenêtres (s)
+        :param chunk: Durée des blocs lus dans le fichier (s) ; borne la mémoire utilisée pour l'audio
+        :param switch_penalty: Coût (en log-probabilité) d'un changement de langue lors du lissage
+        :param silence_db: Énergie (dB) sous laquelle une trame est un silence
+        :param min_voiced: Part minimale de trames au-dessus du seuil pour qu'une fenêtre ne soit pas un silence
+        :param precision: Type des paramètres des modèles (par défaut : celui du détecteur, float32 sinon)
+        """
+        if detector is None:
+            from language_detector import LanguageDetector
+            detector = LanguageDetector(models_dir, scoring='full')
+        if not detector.models:
+            raise ValueError("aucun modèle de langue chargé")
+        if precision is None:
+            precision = detector.precision if detector.precision != 'float64' else 'float32'
+        self.scorer = GmmSetScorer(detector.models, dtype=precision)
+        self.languages = list(self.scorer.models)
+        self.sample_rate = SAMPLE_RATE
+        self.window_frames = max(1, round(window * self.sample_rate / HOP_LENGTH))
+        self.hop_frames = max(1, round(hop * self.sample_rate / HOP_LENGTH))
+        self.chunk = chunk
+        self.switch_penalty = switch_penalty
+        self.silence_db = silence_db
+        self.min_voiced = min_voiced
+
+    @property
+    def hop_seconds(self):
+        return self.hop_frames * HOP_LENGTH / self.sample_rate
+
+    @property
+    def window_seconds(self):
+        return self.window_frames * HOP_LENGTH / self.sample_rate
+
+    def window_scores(self, path):
+        """
+        Scores de chaque fenêtre glissante, au fil de la lecture.
+
+        :return: Générateur de (début en s, log-vraisemblances moyennes par langue (L,) ou None si silence)
+        """
+        features = _StreamingFeatures(self.sample_rate)
+        pending = np.zeros((0, len(self.languages)))
+        pending_voiced = np.zeros(0, dtype=bool)
+        first = 0          # Indice de la trame pending[0]
+        next_start = 0     # Première trame de la prochaine fenêtre
+        for block in iter_audio(path, self.chunk, self.sample_rate):
+            mfcc, energy = features.push(block)
+            if not len(mfcc):
+                continue
+            pending = np.concatenate([pending, self.scorer.frame_scores(mfcc)])
+            level = 20 * np.log10(energy + 1e-10)
+            pending_voiced = np.concatenate([pending_voiced, level >= self.silence_db])
+            while next_start + self.window_frames <= first + len(pending):
+                index = next_start - first
+                # Seules les trames au-dessus du seuil de silence comptent dans le score de la fenêtre
+                voiced = pending_voiced[index:index + self.window_frames]
+                scores = None
+                if voiced.sum() >= self.min_voiced * self.window_frames:
+                    scores = pending[index:index + self.window_frames][voiced].mean(axis=0)
+                yield next_start * HOP_LENGTH / self.sample_rate, scores
+                next_start += self.hop_frames
+            drop = min(next_start - first, len(pending))
+            pending, pending_voiced = pending[drop:], pending_voiced[drop:]
+            first += drop
+        if next_start == 0 and len(pending):
+            # Enregistrement plus court qu'une fenêtre : évalué sur les trames disponibles
+            scores = None
+            if pending_voiced.sum() >= self.min_voiced * len(pending):
+                scores = pending[pending_voiced].mean(axis=0)
+            yield 0.0, scores
+        self.duration = features.samples / self.sample_rate
+
+    def segment(self, path):
+        """Liste de LanguageSegment couvrant tout l'enregistrement (language None : silence)"""
+        self.duration = 0.0
+        languages = len(self.languages)
+        emissions = []
+        for _, scores in self.window_scores(path):
+            emission = np.full(languages + 1, UNLIKELY, dtype=np.float32)
+            if scores is None:
+                emission[languages] = 0.0
+            else:
+                # Log-probabilités des langues dans la fenêtre (comme rank_languages)
+                emission[:languages] = scores - _logsumexp(scores[None, :], axis=1)[0]
+            emissions.append(emission)
+        if not emissions:
+            return []
+        return self._segments(np.array(emissions), self._viterbi(np.array(emissions)))
+
+    def _viterbi(self, emissions):
+        """Suite d'états (langues puis silence) maximisant les scores moins les pénalités de changement"""
+        languages = len(self.languages)
+        penalties = np.full((languages + 1, languages + 1), self.switch_penalty)
+        np.fill_diagonal(penalties, 0.0)
+        # Entrer dans un silence ou en sortir est gratuit
+        penalties[languages, :] = 0.0
+        penalties[:, languages] = 0.0
+        delta = emissions[0].astype(np.float64)
+        backpointers = np.zeros(emissions.shape, dtype=np.int16)
+        for t in range(1, len(emissions)):
+            candidates = delta[:, None] - penalties
+            backpointers[t] = candidates.argmax(axis=0)
+            delta = candidates.max(axis=0) + emissions[t]
+        states = np.zeros(len(emissions), dtype=np.int64)
+        states[-1] = delta.argmax()
+        for t in range(len(emissions) - 1, 0, -1):
+            states[t - 1] = backpointers[t, states[t]]
+        return states
+
+    def _segments(self, emissions, states):
+        hop = self.hop_seconds
+        centers = np.arange(len(states)) * hop + self.window_seconds / 2
+        boundaries = np.flatnonzero(np.diff(states)) + 1
+        segments = []
+        for start, stop in zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [len(states)]])):
+            state = states[start]
+            language = self.languages[state] if state < len(self.languages) else None
+            confidence = float(np.exp(emissions[start:stop, state]).mean()) if language else 1.0
+            begin = 0.0 if not segments else centers[start] - hop / 2
+            segments.append(LanguageSegment(begin, centers[stop - 1] + hop / 2, language, confidence))
+        segments[-1].end = max(segments[-1].end, self.duration)
+        return segments
+
+def main(argv=None):
+    import resource
+    parser = argparse.ArgumentParser(description="Chronologie des langues d'un long enregistrement")
+    parser.add_argument('audio')
+    parser.add_argument('--models-dir', default="models_langues")
+    parser.add_argument('--window', type=float, default=2.0)
+    parser.add_argument('--hop', type=float, default=0.5)
+    parser.add_argument('--chunk', type=float, default=30.0)
+    parser.add_argument('--switch-penalty', type=float, default=4.0)
+    options = parser.parse_args(argv)
+
+    segmenter = LanguageSegmenter(models_dir=options.models_dir, window=options.window, hop=options.hop,
+                                  chunk=options.chunk, switch_penalty=options.switch_penalty)
+    for segment in segmenter.segment(options.audio):
+        print(f"{segment.start:9.2f} {segment.end:9.2f}  {segment.language or '(silence)':12s} {segment.confidence:.2f}")
+    print(f"Durée {segmenter.duration:.1f} s, mémoire maximale {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} Mo")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
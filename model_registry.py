@@ -0,0 +1,225 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+
+from language_detector import LanguageDetector, N_MFCC
+
+logger = logging.getLogger(__name__)
+
+class ModelVersion:
+    """Fichier de modèle servi : empreinte du contenu et date de modification"""
+    __slots__ = ('name', 'path', 'size', 'mtime', 'digest')
+
+    def __init__(self, name, path, size, mtime, digest):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.digest = digest
+
+    @classmethod
+    def from_file(cls, name, path):
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        status = os.stat(path)
+        return cls(name, path, status.st_size, status.st_mtime, digest)
+
+    def as_dict(self):
+        return {'path': self.path, 'size': self.size, 'mtime': self.mtime, 'digest': self.digest[:12]}
+
+class ModelSet:
+    """Détecteur chargé et versions de ses fichiers ; jamais modifié une fois publié"""
+    __slots__ = ('detector', 'versions', 'generation', 'loaded_at')
+
+    def __init__(self, detector, versions, generation):
+        self.detector = detector
+        self.versions = versions
+        self.generation = generation
+        self.loaded_at = time.time()
+
+class ModelRegistry:
+    def __init__(self, models_dir="models_langues", interval=5.0, watch=True, **detector_options):
+        """
+        Modèles de langue rechargés à chaud : models_dir est surveillé, un nouvel ensemble de modèles
+        est chargé et validé en arrière-plan, puis remplace l'ensemble servi d'un seul coup.
+
+        S'utilise à la place d'un LanguageDetector (mêmes méthodes de classement). Chaque appel prend
+        l'ensemble servi au moment où il commence et le garde jusqu'au bout : un rechargement ne bloque
+        ni ne fait échouer aucune requête. Un ensemble invalide est écarté et l'ancien reste servi.
+
+        :param models_dir: Dossier des modèles .pkl (et de l'UBM dans models_dir/ubm)
+        :param interval: Période de surveillance en secondes
+        :param watch: Lancer la surveillance (sinon, recharger avec check())
+        :param detector_options: Arguments de LanguageDetector (scoring, precision...)
+        """
+        self.models_dir = models_dir
+        self.interval = interval
+        self.detector_options = detector_options
+        self.reloads = 0
+        self.rejected = 0
+        self._listeners = []
+        self._check_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        fingerprint = self.fingerprint()
+        self.active = self._load(fingerprint, generation=1)
+        self._fingerprint = fingerprint
+        self._candidate = None  # Empreinte vue une fois, rechargée si elle n'a pas bougé au tour suivant
+        self._log_versions(self.active)
+        if watch and interval > 0:
+            self.start()
+
+    # Interface de LanguageDetector : une seule lecture de self.active par appel
+    @property
+    def models(self):
+        return self.active.detector.models
+
+    def rank_languages(self, mfcc):
+        return self.active.detector.rank_languages(mfcc)
+
+    def rank_languages_from_signal(self, y, sr, max_duration=1):
+        return self.active.detector.rank_languages_from_signal(y, sr, max_duration)
+
+    def detect_language(self, audio_path):
+        return self.active.detector.detect_language(audio_path)
+
+    def preprocess_audio(self, audio_path, max_duration=5):
+        return self.active.detector.preprocess_audio(audio_path, max_duration)
+
+    def versions(self):
+        """Modèles servis : génération, date de chargement et version de chaque fichier"""
+        model_set = self.active
+        return {
+            'generation': model_set.generation,
+            'loaded_at': model_set.loaded_at,
+            'models': {name: version.as_dict() for name, version in sorted(model_set.versions.items())},
+        }
+
+    def add_listener(self, callback):
+        """callback(model_set) après chaque remplacement (appelé depuis le thread de surveillance)"""
+        self._listeners.append(callback)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Erreur lors de la surveillance de %s : %s", self.models_dir, e)
+
+    def fingerprint(self):
+        """Taille et date de chaque fichier .pkl (models_dir et models_dir/ubm) : change à chaque écriture"""
+        files = {}
+        for directory, prefix in ((self.models_dir, ""), (os.path.join(self.models_dir, "ubm"), "ubm/")):
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                if filename.endswith('.pkl'):
+                    try:
+                        status = os.stat(os.path.join(directory, filename))
+                    except OSError:
+                        continue
+                    files[prefix + filename] = (status.st_size, status.st_mtime_ns)
+        return files
+
+    def check(self, settle=True):
+        """
+        Recharge si les fichiers ont changé.
+
+        :param settle: Attendre que l'empreinte soit stable sur deux vérifications (copie en cours)
+        :return: True si un nouvel ensemble est servi
+        """
+        with self._check_lock:
+            fingerprint = self.fingerprint()
+            if fingerprint == self._fingerprint:
+                self._candidate = None
+                return False
+            if settle and fingerprint != self._candidate:
+                self._candidate = fingerprint
+                return False
+            self._candidate = None
+            # Noté même en cas d'échec : pas de nouvel essai tant que les fichiers ne changent pas
+            self._fingerprint = fingerprint
+            try:
+                versions = self._versions(fingerprint)
+                if self._digests(versions) == self._digests(self.active.versions):
+                    # Fichiers réécrits à l'identique : l'ensemble servi reste en place
+                    return False
+                model_set = self._load(fingerprint, self.active.generation + 1, versions)
+                self._validate(model_set, fingerprint)
+            except Exception as e:
+                self.rejected += 1
+                logger.error("Nouveaux modèles de langue écartés, génération %d toujours servie : %s",
+                             self.active.generation, e)
+                return False
+            self.active = model_set
+            self.reloads += 1
+        self._log_versions(model_set)
+        for callback in list(self._listeners):
+            try:
+                callback(model_set)
+            except Exception as e:
+                logger.error("Erreur dans un abonné au rechargement des modèles : %s", e)
+        return True
+
+    def _versions(self, fingerprint):
+        versions = {}
+        for name in fingerprint:
+            path = os.path.join(self.models_dir, name)
+            try:
+                versions[name[:-len('.pkl')]] = ModelVersion.from_file(name, path)
+            except OSError as e:
+                logger.warning("Version de %s illisible : %s", path, e)
+        return versions
+
+    @staticmethod
+    def _digests(versions):
+        return {name: version.digest for name, version in versions.items()}
+
+    def _load(self, fingerprint, generation, versions=None):
+        if versions is None:
+            versions = self._versions(fingerprint)
+        return ModelSet(LanguageDetector(self.models_dir, **self.detector_options), versions, generation)
+
+    def _validate(self, model_set, fingerprint):
+        """Lève ValueError si un fichier n'a pas été chargé ou si le classement n'est pas exploitable"""
+        detector = model_set.detector
+        expected = {name[:-len('.pkl')] for name in fingerprint if '/' not in name}
+        missing = expected - set(detector.models)
+        if missing:
+            raise ValueError(f"modèles non chargés : {', '.join(sorted(missing))}")
+        if any(name.startswith('ubm/') for name in fingerprint) and detector.scoring != 'full' \
+                and detector.ubm_scorer is None:
+            raise ValueError("UBM non chargé")
+        if not detector.models:
+            raise ValueError("aucun modèle")
+        for language, model in detector.models.items():
+            dimensions = model.means_.shape[1]
+            if dimensions != N_MFCC:
+                raise ValueError(f"{language} : {dimensions} coefficients, {N_MFCC} attendus")
+        # Trames d'essai : moyennes de chaque modèle, toutes les langues doivent recevoir un score fini
+        probe = np.concatenate([model.means_ for model in detector.models.values()])
+        ranking = detector.rank_languages(probe)
+        languages = set(detector.ubm_scorer.languages) if detector.ubm_scorer is not None else set(detector.models)
+        if {language for language, _, _ in ranking} != languages \
+                or not all(np.isfinite(score) for _, score, _ in ranking):
+            raise ValueError("classement d'essai invalide")
+
+    def _log_versions(self, model_set):
+        logger.info("Modèles de langue, génération %d : %s", model_set.generation,
+                    ", ".join(f"{name} ({version.digest[:8]})" for name, version in sorted(model_set.versions.items()))
+                    or "aucun")
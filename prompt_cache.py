@@ -0,0 +1,157 @@
+import re
+import time
+import hashlib
+import logging
+import datetime
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Sélecteurs de variante et liaisons d'émojis (catégorie Mn/Cf, non couverts par 'So')
+_EMOJI_JOINERS = {'︎', '️', '‍', '⃣'}
+
+def compact_identity(text):
+    """
+    Forme compacte de l'identité : même contenu, sans la mise en forme markdown (émojis, gras,
+    citations, séparateurs, lignes vides) ; chaque titre et les listes qui suivent tiennent sur une ligne.
+    """
+    lines = []
+    heading = None
+    for line in text.splitlines():
+        line = "".join(char for char in line
+                       if char not in _EMOJI_JOINERS and unicodedata.category(char) not in ('So', 'Sk', 'Cs'))
+        line = re.sub(r'\s+', ' ', line.replace('**', '')).strip()
+        if not line or set(line) <= {'-', '*', '_'}:
+            continue
+        if line.startswith('#'):
+            level = len(line) - len(line.lstrip('#'))
+            title = line.lstrip('#').strip()
+            if level == 1:
+                lines.append(title)
+            else:
+                heading = title
+            continue
+        item = line.startswith(('* ', '- ', '> '))
+        line = line.lstrip('*->').strip()
+        if heading is not None:
+            lines.append(f"{heading} {line}" if heading.endswith(':') else f"{heading} : {line}")
+            heading = None
+        elif item and lines and not lines[-1].endswith('.'):
+            # Les éléments de liste et citations rejoignent la ligne qui les introduit
+            lines[-1] += (' ' if lines[-1].endswith((':', ',')) else ' ; ') + line
+        else:
+            lines.append(line)
+    return "\n".join(lines)
+
+class ContextCache:
+    def __init__(self, create, ttl=3600, margin=120, retry_after=3600, is_definitive=None):
+        """
+        Handle de contexte en cache (côté fournisseur ou proxy) pour le préfixe statique du prompt.
+
+        Le handle est créé au premier besoin, recréé avant son expiration ou si le texte change ;
+        après un échec de création, on n'essaie plus avant retry_after secondes, et plus du tout pour
+        ce texte si l'échec est définitif (is_definitive : texte sous la taille minimale du fournisseur).
+
+        Avec wait=False (tour de l'utilisateur), créations et renouvellements se font dans un thread :
+        l'appel retourne aussitôt le handle encore valide, ou None.
+
+        :param create: Fonction (system_instruction, ttl) -> nom du contexte en cache
+        :param ttl: Durée de vie demandée pour le contexte (secondes)
+        :param margin: Marge avant expiration à partir de laquelle le handle est renouvelé (secondes)
+        :param retry_after: Délai avant une nouvelle tentative après un échec (secondes)
+        :param is_definitive: Fonction (exception) -> True si réessayer ne peut pas réussir
+        """
+        self.create = create
+        self.ttl = ttl
+        self.margin = margin
+        self.retry_after = retry_after
+        self.is_definitive = is_definitive
+        self.name = None
+        self._digest = None
+        self._expires_at = 0.0
+        self._failed_at = None
+        self._rejected = set()  # Empreintes des textes refusés définitivement
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def handle(self, system_instruction, wait=True):
+        """
+        Nom du contexte en cache pour ce texte, ou None si le cache est indisponible
+
+        :param wait: Créer le contexte dans le thread appelant si besoin (sinon en arrière-plan)
+        """
+        digest = hashlib.sha256(system_instruction.encode('utf-8')).hexdigest()
+        with self._lock:
+            now = time.monotonic()
+            current = self.name if self.name is not None and self._digest == digest and now < self._expires_at else None
+            if current is not None and now < self._expires_at - self.margin:
+                return current
+            if digest in self._rejected:
+                return None
+            if self._failed_at is not None and now - self._failed_at < self.retry_after:
+                return current
+            if self._refreshing:
+                # Création déjà en cours dans un autre thread
+                return current
+            self._refreshing = True
+        if not wait:
+            threading.Thread(target=self._refresh, args=(system_instruction, digest),
+                             name="context-cache", daemon=True).start()
+            return current
+        return self._refresh(system_instruction, digest)
+
+    def _refresh(self, system_instruction, digest):
+        """Crée le contexte (hors du verrou : les tours concurrents ne l'attendent pas)"""
+        try:
+            name = self.create(system_instruction, self.ttl)
+        except Exception as e:
+            with self._lock:
+                if self.is_definitive is not None and self.is_definitive(e):
+                    logger.info("Contexte en cache refusé pour ce texte, plus de nouvel essai : %s", e)
+                    self._rejected.add(digest)
+                else:
+                    logger.info("Contexte en cache indisponible, identité compacte utilisée : %s", e)
+                    self._failed_at = time.monotonic()
+                self.name = None
+                self._refreshing = False
+            return None
+        with self._lock:
+            self.name = name
+            self._digest = digest
+            self._expires_at = time.monotonic() + self.ttl
+            self._failed_at = None
+            self._refreshing = False
+        logger.info("Contexte en cache créé : %s", name)
+        return name
+
+    def invalidate(self):
+        """Oublie le handle courant (expiré ou refusé par le fournisseur)"""
+        with self._lock:
+            self.name = None
+            self._expires_at = 0.0
+
+def _too_small(error):
+    # 400 InvalidArgument « Cached content is too small. total_token_count=..., min_total_token_count=... »
+    message = str(error).lower()
+    return 'too small' in message or 'min_total_token_count' in message
+
+def gemini_context_cache(model, api_key, ttl=3600):
+    """ContextCache qui crée les contextes via l'API cachedContents de Gemini (None si le SDK est absent)"""
+    try:
+        import google.generativeai as genai
+        from google.generativeai import caching
+    except ImportError:
+        return None
+    genai.configure(api_key=api_key)
+
+    def create(system_instruction, ttl):
+        cache = caching.CachedContent.create(
+            model=model,
+            display_name="aryadai-identity",
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        return cache.name
+
+    return ContextCache(create, ttl=ttl, is_definitive=_too_small)
@@ -0,0 +1,75 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, Signal
+
+logger = logging.getLogger(__name__)
+
+class ServiceLoader(QObject):
+    # Émis dans le thread de l'interface (connexion en file d'attente depuis les workers)
+    ready = Signal(str, object)
+    failed = Signal(str, str)
+
+    def __init__(self, max_workers=4, parent=None):
+        """
+        Construit les sous-systèmes lourds (agent, audio, détecteur...) en arrière-plan.
+
+        Chaque sous-système est décrit par une fabrique sans argument, ou prenant en argument
+        les sous-systèmes dont il dépend ; les imports coûteux se font dans la fabrique.
+
+        :param max_workers: Nombre de sous-systèmes initialisés en parallèle
+        :param parent: QObject parent
+        """
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="startup")
+        self._futures = {}
+        self.started_at = time.perf_counter()
+        self.timings = {}   # Nom -> durée (ms) depuis la création du chargeur
+        self.errors = {}
+
+    def load(self, name, factory, requires=()):
+        """
+        Lance l'initialisation d'un sous-système.
+
+        :param name: Nom du sous-système (repris dans les signaux ready / failed)
+        :param factory: Fonction qui construit le sous-système
+        :param requires: Noms des sous-systèmes déjà lancés dont le résultat est passé à la fabrique
+        """
+        dependencies = [self._futures[dependency] for dependency in requires]
+        self._futures[name] = self._executor.submit(self._run, name, factory, dependencies)
+
+    def is_ready(self, name):
+        return name in self.timings
+
+    def pending(self):
+        """Noms des sous-systèmes encore en cours d'initialisation"""
+        # Les résultats sont notés avant l'émission des signaux : un slot voit un état à jour
+        return [name for name in self._futures if name not in self.timings and name not in self.errors]
+
+    def shutdown(self):
+        """Abandonne les initialisations pas encore commencées (fermeture de la fenêtre)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, name, factory, dependencies):
+        try:
+            # Une dépendance en échec fait échouer le sous-système (avec le même message)
+            arguments = [dependency.result() for dependency in dependencies]
+            service = factory(*arguments)
+        except Exception as e:
+            self.errors[name] = str(e)
+            logger.error("Échec de l'initialisation de %s : %s", name, e)
+            self._emit(self.failed, name, str(e))
+            raise
+
+        self.timings[name] = (time.perf_counter() - self.started_at) * 1000
+        logger.info("%s prêt en %.0f ms", name, self.timings[name])
+        self._emit(self.ready, name, service)
+        return service
+
+    @staticmethod
+    def _emit(signal, *args):
+        try:
+            signal.emit(*args)
+        except RuntimeError:
+            # Fenêtre déjà détruite : plus personne à prévenir
+            pass
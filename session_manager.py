@@ -0,0 +1,230 @@
+"""
+Plusieurs conversations servies par un seul processus : une mémoire et des chaînes par session.
+
+Les sessions récemment utilisées restent en mémoire (au plus max_sessions, ordre LRU) ; les autres,
+et celles inactives depuis idle_timeout secondes, sont écrites sur disque (un fichier JSON par session)
+puis restaurées au message suivant. Le modèle, la FAQ et le contexte en cache sont communs à toutes
+les sessions (GeminiAgent.fork). Chaque session garde au plus memory_window messages (WindowedMemory) :
+la mémoire est bornée par le nombre de sessions, et une session restaurée retrouve exactement la
+mémoire qu'elle avait.
+
+    manager = SessionManager(GeminiAgent(), max_sessions=200)
+    manager.get_response("utilisateur-42", "Bonjour")
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class Session:
+    """
+    Agent d'une session en mémoire ; lock sérialise les tours d'une même session (et couvre la
+    restauration : agent vaut None tant qu'elle n'est pas terminée, ou si elle a échoué)
+    """
+    __slots__ = ('session_id', 'agent', 'lock', 'last_used', 'in_use', 'save_lock', 'snapshots', 'saved')
+
+    def __init__(self, session_id, agent=None):
+        self.session_id = session_id
+        self.agent = agent
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        # Écritures sur disque : la dernière copie prise l'emporte, même si elle est écrite en premier
+        self.save_lock = threading.Lock()
+        self.snapshots = 0
+        self.saved = 0
+
+    def messages(self):
+        """Mémoire de la session sous forme sérialisable"""
+        return [{'role': 'user' if message.type == 'human' else 'assistant', 'text': message.content}
+                for message in self.agent.memory.chat_memory.messages]
+
+class _SavedMessage:
+    """Message relu depuis un fichier de session (interface de StoredMessage pour restore_memory)"""
+    __slots__ = ('role', 'text')
+
+    def __init__(self, role, text):
+        self.role = role
+        self.text = text
+
+    @property
+    def is_user(self):
+        return self.role == 'user'
+
+    @property
+    def is_notice(self):
+        return False
+
+class SessionManager:
+    def __init__(self, agent, sessions_dir="sessions", max_sessions=100, idle_timeout=600.0):
+        """
+        :param agent: GeminiAgent modèle, dont chaque session est un fork
+        :param sessions_dir: Dossier des sessions écrites sur disque
+        :param max_sessions: Nombre maximal de sessions gardées en mémoire
+        :param idle_timeout: Inactivité (s) après laquelle une session est écrite sur disque (None : jamais)
+        """
+        self.agent = agent
+        self.sessions_dir = sessions_dir
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()  # Du moins au plus récemment utilisé
+        self._saving = {}  # Sessions retirées dont l'écriture est en cours (reprises telles quelles)
+        # Ne protège que les dictionnaires : création de l'agent et disque se font hors de ce verrou
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'restored': 0, 'created': 0, 'evicted': 0}
+        os.makedirs(sessions_dir, exist_ok=True)
+
+    def get_response(self, session_id, message, turn=None, images=None):
+        """Réponse de l'agent dans la conversation session_id (restaurée ou créée si besoin)"""
+        while True:
+            session = self._acquire(session_id)
+            try:
+                with session.lock:
+                    if session.agent is not None:
+                        return session.agent.get_response(message, turn=turn, images=images)
+                # Restauration échouée dans un autre thread : nouvel essai
+            finally:
+                self._release(session)
+
+    def _acquire(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id) or self._saving.get(session_id)
+            if session is not None:
+                self._sessions[session_id] = session
+                self._sessions.move_to_end(session_id)
+                self.counters['hits'] += 1
+                restore = False
+            else:
+                # Réservée tout de suite ; les tours concurrents attendent la fin de la restauration sur son lock
+                session = self._sessions[session_id] = Session(session_id)
+                session.lock.acquire()
+                restore = True
+            session.in_use += 1
+            session.last_used = time.monotonic()
+            evicted = self._evict(time.monotonic())
+        try:
+            if restore:
+                self._restore(session)
+        finally:
+            if restore:
+                session.lock.release()
+            self._write(evicted)
+        return session
+
+    def _release(self, session):
+        with self._lock:
+            session.in_use -= 1
+            session.last_used = time.monotonic()
+
+    def _restore(self, session):
+        """Crée l'agent de la session réservée, avec sa mémoire relue depuis le disque si elle y a été écrite"""
+        try:
+            agent = self.agent.fork()
+        except Exception:
+            with self._lock:
+                if self._sessions.get(session.session_id) is session:
+                    del self._sessions[session.session_id]
+            raise
+        path = self._path(session.session_id)
+        counter = 'created'
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            agent.restore_memory([_SavedMessage(message['role'], message['text']) for message in saved['messages']])
+            counter = 'restored'
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Session %s illisible, nouvelle conversation : %s", session.session_id, e)
+        session.agent = agent
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _evict(self, now):
+        """
+        Retire les sessions en trop ou inactives (jamais une session en cours de tour, ni en cours de
+        restauration) ; retourne leurs copies à écrire sur disque, hors du verrou
+        """
+        evicted = []
+        excess = len(self._sessions) - self.max_sessions
+        for session_id, session in list(self._sessions.items()):
+            idle = self.idle_timeout is not None and now - session.last_used > self.idle_timeout
+            if excess <= 0 and not idle:
+                # Les suivantes sont plus récentes
+                break
+            if session.in_use or session.agent is None:
+                continue
+            del self._sessions[session_id]
+            self._saving[session_id] = session
+            evicted.append(self._snapshot(session))
+            self.counters['evicted'] += 1
+            excess -= 1
+        return evicted
+
+    @staticmethod
+    def _snapshot(session):
+        session.snapshots += 1
+        return session, session.snapshots, session.messages()
+
+    def _write(self, snapshots):
+        """Écrit les copies sur disque ; une session qui n'a pas pu l'être reste en mémoire"""
+        for session, sequence, messages in snapshots:
+            try:
+                self._save(session, sequence, messages)
+            except OSError as e:
+                logger.error("Erreur lors de l'enregistrement de la session %s : %s", session.session_id, e)
+                with self._lock:
+                    self._sessions.setdefault(session.session_id, session)
+            finally:
+                with self._lock:
+                    if self._saving.get(session.session_id) is session:
+                        del self._saving[session.session_id]
+
+    def _save(self, session, sequence, messages):
+        with session.save_lock:
+            if sequence <= session.saved:
+                return
+            path = self._path(session.session_id)
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump({'session_id': session.session_id, 'saved_at': time.time(), 'messages': messages},
+                          f, ensure_ascii=False)
+            os.replace(temporary, path)
+            session.saved = sequence
+
+    def _path(self, session_id):
+        # Identifiant quelconque (adresse, jeton...) : nom de fichier dérivé
+        name = hashlib.sha1(str(session_id).encode('utf-8')).hexdigest()
+        return os.path.join(self.sessions_dir, f"{name}.json")
+
+    def evict_idle(self):
+        """Écrit sur disque les sessions inactives depuis idle_timeout (à appeler périodiquement)"""
+        with self._lock:
+            evicted = self._evict(time.monotonic())
+        self._write(evicted)
+
+    def drop(self, session_id):
+        """Oublie une session, en mémoire et sur disque"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._saving.pop(session_id, None)
+        try:
+            os.unlink(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Écrit toutes les sessions en mémoire sur disque"""
+        with self._lock:
+            snapshots = [self._snapshot(session) for session in self._sessions.values() if session.agent is not None]
+            self._sessions.clear()
+        self._write(snapshots)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, resident=len(self._sessions))
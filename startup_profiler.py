@@ -0,0 +1,241 @@
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import functools
+import importlib.abc
+
+logger = logging.getLogger(__name__)
+
+# Uniquement la bibliothèque standard : ce module est installé avant tous les autres imports
+
+_profiler = None
+
+class _TimedLoader(importlib.abc.Loader):
+    """Enveloppe le loader d'un module pour chronométrer son exécution"""
+
+    def __init__(self, loader, profiler, name):
+        self.loader = loader
+        self.profiler = profiler
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Le module voit son vrai loader (importlib.resources, inspect...)
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        with self.profiler.importing(self.name):
+            self.loader.exec_module(module)
+
+    def __getattr__(self, attribute):
+        return getattr(self.loader, attribute)
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Finder placé en tête de sys.meta_path qui délègue aux autres et chronomètre le chargement"""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self._searching = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._searching, 'active', False):
+            return None
+        self._searching.active = True
+        try:
+            for finder in sys.meta_path:
+                find_spec = getattr(finder, 'find_spec', None)
+                if finder is self or find_spec is None:
+                    continue
+                spec = find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._searching.active = False
+
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self.profiler, fullname)
+        return spec
+
+class StartupProfiler:
+    def __init__(self, output="startup_profile.json", budgets=None):
+        """
+        Mesure le démarrage : temps d'import par module, initialisation des sous-systèmes,
+        affichage de la fenêtre et premier rendu.
+
+        :param output: Fichier du rapport JSON
+        :param budgets: Dictionnaire nom de mesure -> durée maximale (ms)
+        """
+        self.output = output
+        self.budgets = budgets or {}
+        self.started_at = time.perf_counter()
+        self.imports = []
+        self.spans = []
+        self.marks = {}
+        self.subsystems = {}
+        self._stack = threading.local()
+        self._finder = _ImportTimer(self)
+
+    def elapsed(self):
+        """Millisecondes écoulées depuis l'installation du profileur"""
+        return (time.perf_counter() - self.started_at) * 1000
+
+    def install(self):
+        sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    def importing(self, name):
+        return _ImportRecord(self, name)
+
+    def mark(self, name):
+        """Enregistre un jalon (seule la première occurrence compte)"""
+        self.marks.setdefault(name, self.elapsed())
+
+    def record_span(self, label, start, duration):
+        self.spans.append({
+            'label': label,
+            'thread': threading.current_thread().name,
+            'start_ms': round(start, 3),
+            'duration_ms': round(duration, 3),
+        })
+
+    def report(self):
+        """Rapport complet (sérialisable en JSON)"""
+        top_level = {}
+        for record in self.imports:
+            if record['parent'] is None:
+                package = record['module'].split('.')[0]
+                top_level[package] = top_level.get(package, 0.0) + record['total_ms']
+
+        metrics = {name: round(value, 3) for name, value in self.marks.items()}
+        metrics['imports'] = round(sum(top_level.values()), 3)
+        for package, duration in top_level.items():
+            metrics[f'import:{package}'] = round(duration, 3)
+        for span in self.spans:
+            key = f"span:{span['label']}"
+            metrics[key] = max(metrics.get(key, 0.0), span['duration_ms'])
+        for name, duration in self.subsystems.items():
+            metrics[f'subsystem:{name}'] = round(duration, 3)
+
+        return {
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'metrics': metrics,
+            'budgets': self.budgets,
+            'violations': self.violations(metrics),
+            'spans': self.spans,
+            'imports': sorted(self.imports, key=lambda record: record['start_ms']),
+        }
+
+    def violations(self, metrics):
+        """Mesures qui dépassent leur budget (une mesure absente compte comme un dépassement)"""
+        exceeded = []
+        for name, budget in self.budgets.items():
+            value = metrics.get(name)
+            if value is None or value > budget:
+                exceeded.append({'metric': name, 'budget_ms': budget, 'value_ms': value})
+        return exceeded
+
+    def write_report(self):
+        """Écrit le rapport et retourne le code de sortie (1 si un budget est dépassé)"""
+        report = self.report()
+        with open(self.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+        slowest = sorted(self.imports, key=lambda record: record['self_ms'], reverse=True)[:15]
+        logger.info("Rapport de démarrage écrit dans %s", self.output)
+        for name in ('window_shown', 'first_paint', 'ready'):
+            if name in report['metrics']:
+                logger.info("  %s : %.0f ms", name, report['metrics'][name])
+        for record in slowest:
+            logger.info("  import %s : %.1f ms (%.1f ms inclus)", record['module'], record['self_ms'], record['total_ms'])
+        for violation in report['violations']:
+            logger.error("Budget dépassé : %s = %s ms (budget %s ms)",
+                         violation['metric'], violation['value_ms'], violation['budget_ms'])
+        return 1 if report['violations'] else 0
+
+class _ImportRecord:
+    """Contexte d'exécution d'un module : temps total et temps propre (hors sous-imports)"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler._stack
+        if not hasattr(stack, 'frames'):
+            stack.frames = []
+        self.parent = stack.frames[-1] if stack.frames else None
+        self.children_ms = 0.0
+        self.start = self.profiler.elapsed()
+        stack.frames.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        total = self.profiler.elapsed() - self.start
+        self.profiler._stack.frames.pop()
+        if self.parent is not None:
+            self.parent.children_ms += total
+        self.profiler.imports.append({
+            'module': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'thread': threading.current_thread().name,
+            'start_ms': round(self.start, 3),
+            'total_ms': round(total, 3),
+            'self_ms': round(total - self.children_ms, 3),
+        })
+        return False
+
+def parse_budgets(values):
+    """Convertit ["first_paint=800", "import:langchain=1500"] en dictionnaire"""
+    budgets = {}
+    for value in values or []:
+        name, _, limit = value.rpartition('=')
+        if not name:
+            raise ValueError(f"Budget invalide : {value} (attendu nom=ms)")
+        budgets[name] = float(limit)
+    return budgets
+
+def install_from_argv(argv):
+    """Active le profilage si --profile-startup figure dans les arguments ; retourne le profileur ou None"""
+    global _profiler
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--profile-startup', action='store_true')
+    parser.add_argument('--profile-output', default="startup_profile.json")
+    parser.add_argument('--startup-budget', action='append', default=[])
+    options, _ = parser.parse_known_args(argv[1:])
+    if not options.profile_startup:
+        return None
+
+    _profiler = StartupProfiler(options.profile_output, parse_budgets(options.startup_budget))
+    _profiler.install()
+    return _profiler
+
+def active():
+    """Profileur en cours, ou None hors du mode --profile-startup"""
+    return _profiler
+
+def timed(label):
+    """Décorateur : enregistre la durée de la fonction quand le profilage est actif"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return function(*args, **kwargs)
+            start = profiler.elapsed()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record_span(label, start, profiler.elapsed() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,334 @@
+"""
+Entraînement des modèles GMM de models_langues à partir d'un corpus étiqueté.
+
+Le corpus contient un sous-dossier de fichiers audio par langue (corpus/<langue>/*.wav) ; le nom
+du dossier devient le nom du modèle. Les MFCC sont extraits dans un pool de processus, comme à la
+détection (language_detector.extract_mfcc), et mis en cache sur disque (.npy) : un nouvel
+entraînement ne relit que les fichiers ajoutés ou modifiés.
+
+Chaque langue est ensuite ajustée dans son propre processus par EM incrémental (Neal et Hinton, 1998) :
+les trames sont lues par lots depuis le cache (memmap), seules les statistiques suffisantes de chaque
+lot restent en mémoire. Les trames en mémoire dépendent de la taille des lots ; les statistiques, une
+entrée par lot (environ 3,4 Ko pour 16 composantes et 13 MFCC, contre 832 Ko de trames pour un lot de
+8192 en float64), croissent avec le corpus mais restent faibles devant celui-ci.
+
+    python train_models.py --corpus corpus/ --output models_langues --workers 4
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from gmm_scoring import DiagonalGmm, _logsumexp
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.mp3', '.m4a')
+REPORT_FILENAME = "training_report.json"
+
+def scan_corpus(corpus_dir, languages=None):
+    """Fichiers audio de chaque langue : dictionnaire langue -> liste de chemins triés"""
+    corpus = {}
+    for language in sorted(os.listdir(corpus_dir)):
+        folder = os.path.join(corpus_dir, language)
+        if not os.path.isdir(folder) or (languages and language not in languages):
+            continue
+        paths = [os.path.join(root, filename)
+                 for root, _, filenames in os.walk(folder)
+                 for filename in filenames if filename.lower().endswith(AUDIO_EXTENSIONS)]
+        if paths:
+            corpus[language] = sorted(paths)
+    return corpus
+
+def feature_cache_path(cache_dir, path, max_duration):
+    """Fichier .npy du cache : clé calculée sur le chemin, la taille, la date et les paramètres d'extraction"""
+    from language_detector import SAMPLE_RATE, N_MFCC
+    status = os.stat(path)
+    key = f"{os.path.abspath(path)}|{status.st_size}|{status.st_mtime_ns}|{SAMPLE_RATE}|{N_MFCC}|{max_duration}"
+    return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".npy")
+
+def _extract_features(path, cache_dir, max_duration):
+    """
+    MFCC d'un fichier, lus dans le cache ou extraits puis écrits (exécuté dans le pool de processus).
+
+    :return: (chemin du cache, nombre de trames, lu depuis le cache), chemin None en cas d'échec
+    """
+    import librosa
+    from language_detector import SAMPLE_RATE, extract_mfcc
+    cache_path = feature_cache_path(cache_dir, path, max_duration)
+    if os.path.exists(cache_path):
+        return cache_path, len(np.load(cache_path, mmap_mode='r')), True
+    try:
+        y, sr = librosa.load(path, sr=SAMPLE_RATE, duration=max_duration)
+        mfcc = extract_mfcc(y, sr).astype(np.float32)
+    except Exception as e:
+        logger.error("Extraction impossible pour %s : %s", path, e)
+        return None, 0, False
+    # Écriture puis renommage : un entraînement interrompu ne laisse pas de fichier tronqué
+    temporary = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as f:
+        np.save(f, mfcc)
+    os.replace(temporary, cache_path)
+    return cache_path, len(mfcc), False
+
+def extract_corpus(corpus, cache_dir, max_duration=None, workers=None):
+    """
+    Extrait (ou retrouve dans le cache) les MFCC de tout le corpus.
+
+    :param corpus: Dictionnaire langue -> chemins audio (scan_corpus)
+    :return: Dictionnaire langue -> liste de (chemin source, chemin .npy, nombre de trames)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    features = {language: [] for language in corpus}
+    cached = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_extract_features, path, cache_dir, max_duration): (language, path)
+                   for language, paths in corpus.items() for path in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            language, path = futures[future]
+            cache_path, frames, from_cache = future.result()
+            if cache_path is not None and frames:
+                features[language].append((path, cache_path, frames))
+                cached += from_cache
+            if done % 100 == 0 or done == len(futures):
+                logger.info("MFCC : %d/%d fichiers (%d depuis le cache)", done, len(futures), cached)
+    for entries in features.values():
+        entries.sort()
+    return {language: entries for language, entries in features.items() if entries}
+
+def split_validation(features, fraction, random_state=0):
+    """Met de côté une part des fichiers de chaque langue : (entraînement, validation)"""
+    rng = np.random.default_rng(random_state)
+    train, validation = {}, {}
+    for language, entries in features.items():
+        held_out = int(len(entries) * fraction)
+        if held_out == 0 or held_out == len(entries):
+            train[language] = entries
+            continue
+        order = rng.permutation(len(entries))
+        validation[language] = [entries[i] for i in sorted(order[:held_out])]
+        train[language] = [entries[i] for i in sorted(order[held_out:])]
+    return train, validation
+
+def make_batches(entries, batch_size):
+    """Découpe les fichiers en lots fixes (chemin .npy, début, fin) d'au plus batch_size trames"""
+    batches = []
+    for _, cache_path, frames in entries:
+        for start in range(0, frames, batch_size):
+            batches.append((cache_path, start, min(start + batch_size, frames)))
+    return batches
+
+def _read_batch(batch):
+    cache_path, start, stop = batch
+    return np.asarray(np.load(cache_path, mmap_mode='r')[start:stop], dtype=np.float64)
+
+def _sample_frames(entries, size, rng):
+    """Tirage uniforme d'au plus size trames du corpus d'une langue, fichier par fichier"""
+    total = sum(frames for _, _, frames in entries)
+    if total <= size:
+        return np.concatenate([np.load(cache_path) for _, cache_path, _ in entries]).astype(np.float64)
+    chosen = np.sort(rng.choice(total, size, replace=False))
+    samples, offset = [], 0
+    for _, cache_path, frames in entries:
+        local = chosen[(chosen >= offset) & (chosen < offset + frames)] - offset
+        if len(local):
+            samples.append(np.asarray(np.load(cache_path, mmap_mode='r')[local], dtype=np.float64))
+        offset += frames
+    return np.concatenate(samples)
+
+def _sufficient_statistics(weights, means, covariances, X):
+    """Étape E sur un lot : (Σγ, Σγx, Σγx², log-vraisemblance totale)"""
+    log_likelihoods = DiagonalGmm(weights, means, covariances).component_log_likelihoods(X)
+    log_norm = _logsumexp(log_likelihoods, axis=1)
+    responsibilities = np.exp(log_likelihoods - log_norm[:, None])
+    return (responsibilities.sum(axis=0), responsibilities.T @ X, responsibilities.T @ (X ** 2),
+            float(log_norm.sum()))
+
+def _maximize(counts, first, second, reg_covar):
+    """Étape M à partir des statistiques cumulées"""
+    counts = counts + 10 * np.finfo(np.float64).eps
+    weights = counts / counts.sum()
+    means = first / counts[:, None]
+    covariances = np.maximum(second / counts[:, None] - means ** 2, 0.0) + reg_covar
+    return weights, means, covariances
+
+def to_sklearn(weights, means, covariances, reg_covar, random_state, n_iter, lower_bound, converged):
+    """GaussianMixture diag ajusté, utilisable tel quel par LanguageDetector.load_models"""
+    from sklearn.mixture import GaussianMixture
+    model = GaussianMixture(n_components=len(weights), covariance_type='diag', reg_covar=reg_covar,
+                            random_state=random_state)
+    model.weights_ = weights
+    model.means_ = means
+    model.covariances_ = covariances
+    model.precisions_ = 1.0 / covariances
+    model.precisions_cholesky_ = 1.0 / np.sqrt(covariances)
+    model.converged_ = converged
+    model.n_iter_ = n_iter
+    model.lower_bound_ = lower_bound
+    model.n_features_in_ = means.shape[1]
+    return model
+
+def fit_language(entries, n_components=16, epochs=10, batch_size=8192, init_frames=50000, n_init=5,
+                 reg_covar=1e-6, tol=1e-3, random_state=42):
+    """
+    GMM diag d'une langue par EM incrémental sur des lots lus depuis le cache.
+
+    Initialisation : GaussianMixture sur un échantillon borné de trames. Première passe : statistiques
+    de chaque lot (une itération EM complète). Passes suivantes : pour chaque lot, ses statistiques
+    sont recalculées et remplacées dans le total, puis les paramètres mis à jour.
+
+    :param entries: Liste de (chemin source, chemin .npy, nombre de trames)
+    :param epochs: Nombre maximal de passes sur les données (au moins 1)
+    :param batch_size: Trames par lot (borne la mémoire)
+    :param init_frames: Trames de l'échantillon d'initialisation
+    :param tol: Arrêt quand la log-vraisemblance moyenne par trame progresse de moins de tol
+    :return: (GaussianMixture, rapport)
+    """
+    if epochs < 1:
+        raise ValueError(f"epochs doit valoir au moins 1 ({epochs})")
+    from sklearn.mixture import GaussianMixture
+    rng = np.random.default_rng(random_state)
+    sample = _sample_frames(entries, init_frames, rng)
+    initial = GaussianMixture(n_components=n_components, covariance_type='diag', max_iter=100, n_init=n_init,
+                              reg_covar=reg_covar, random_state=random_state).fit(sample)
+    weights, means, covariances = initial.weights_, initial.means_, initial.covariances_
+    del sample
+
+    batches = make_batches(entries, batch_size)
+    total_frames = sum(stop - start for _, start, stop in batches)
+    statistics = [None] * len(batches)
+    totals = None
+    history = []
+    converged = False
+    for epoch in range(epochs):
+        log_likelihood = 0.0
+        for index in (range(len(batches)) if epoch == 0 else rng.permutation(len(batches))):
+            counts, first, second, batch_log_likelihood = _sufficient_statistics(
+                weights, means, covariances, _read_batch(batches[index]))
+            log_likelihood += batch_log_likelihood
+            if epoch == 0:
+                statistics[index] = (counts, first, second)
+                continue
+            previous = statistics[index]
+            statistics[index] = (counts, first, second)
+            totals = (totals[0] + counts - previous[0], totals[1] + first - previous[1],
+                      totals[2] + second - previous[2])
+            weights, means, covariances = _maximize(*totals, reg_covar)
+        # Cumul exact à chaque passe : les mises à jour par différence accumulent des erreurs d'arrondi
+        totals = tuple(np.sum([batch[part] for batch in statistics], axis=0) for part in range(3))
+        if epoch == 0:
+            weights, means, covariances = _maximize(*totals, reg_covar)
+        history.append(log_likelihood / total_frames)
+        logger.debug("Passe %d : log-vraisemblance moyenne %.4f", epoch + 1, history[-1])
+        if len(history) > 1 and abs(history[-1] - history[-2]) < tol:
+            converged = True
+            break
+
+    model = to_sklearn(weights, means, covariances, reg_covar, random_state, len(history), history[-1], converged)
+    report = {'files': len(entries), 'frames': int(total_frames), 'batches': len(batches),
+              'epochs': len(history), 'converged': converged, 'log_likelihood': history}
+    return model, report
+
+def _fit_worker(language, entries, options):
+    start = time.perf_counter()
+    model, report = fit_language(entries, **options)
+    report['seconds'] = round(time.perf_counter() - start, 2)
+    return language, model, report
+
+def fit_languages(features, workers=None, **options):
+    """Ajuste chaque langue dans son propre processus ; dictionnaire langue -> (modèle, rapport)"""
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_fit_worker, language, entries, options) for language, entries in features.items()]
+        for future in as_completed(futures):
+            language, model, report = future.result()
+            results[language] = (model, report)
+            logger.info("%s : %d trames, %d passes, log-vraisemblance %.3f (%.1f s)", language, report['frames'],
+                        report['epochs'], report['log_likelihood'][-1], report['seconds'])
+    return results
+
+def save_model(model, output_dir, language):
+    """Écrit <langue>.pkl avec joblib, par renommage atomique (le détecteur ne lit jamais un fichier partiel)"""
+    import joblib
+    path = os.path.join(output_dir, f"{language}.pkl")
+    temporary = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, temporary)
+    os.replace(temporary, path)
+    return path
+
+def evaluate(models, validation, segment_seconds=5):
+    """
+    Taux de reconnaissance sur les fichiers mis de côté, par segments de la durée analysée à la détection.
+
+    :return: Dictionnaire langue -> (segments reconnus, segments)
+    """
+    from language_detector import SAMPLE_RATE
+    frames_per_segment = int(segment_seconds * SAMPLE_RATE / 512) + 1
+    results = {}
+    for language, entries in validation.items():
+        correct = total = 0
+        for _, cache_path, _ in entries:
+            mfcc = np.load(cache_path, mmap_mode='r')
+            for start in range(0, len(mfcc), frames_per_segment):
+                segment = np.asarray(mfcc[start:start + frames_per_segment], dtype=np.float64)
+                if len(segment) < frames_per_segment // 2:
+                    continue
+                scores = {candidate: model.score(segment) for candidate, model in models.items()}
+                correct += max(scores, key=scores.get) == language
+                total += 1
+        results[language] = (correct, total)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entraîne les modèles GMM de langue à partir d'un corpus étiqueté")
+    parser.add_argument('--corpus', required=True, help="Dossier contenant un sous-dossier de fichiers audio par langue")
+    parser.add_argument('--output', default="models_langues")
+    parser.add_argument('--cache-dir', default=".mfcc_cache", help="Cache des MFCC extraits")
+    parser.add_argument('--languages', default='', help="Langues à entraîner (séparées par des virgules, toutes par défaut)")
+    parser.add_argument('--workers', type=int, default=None, help="Processus d'extraction et d'ajustement")
+    parser.add_argument('--max-duration', type=float, default=None, help="Durée lue par fichier audio (s)")
+    parser.add_argument('--components', type=int, default=16)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=8192, help="Trames par lot")
+    parser.add_argument('--init-frames', type=int, default=50000, help="Trames de l'échantillon d'initialisation")
+    parser.add_argument('--validation', type=float, default=0.0, help="Part des fichiers mise de côté pour l'évaluation")
+    options = parser.parse_args(argv)
+    if options.epochs < 1:
+        parser.error("--epochs doit valoir au moins 1")
+
+    languages = {part.strip() for part in options.languages.split(',') if part.strip()}
+    corpus = scan_corpus(options.corpus, languages)
+    if not corpus:
+        logger.error("Aucun fichier audio dans %s", options.corpus)
+        return 1
+    start = time.perf_counter()
+    features = extract_corpus(corpus, options.cache_dir, options.max_duration, options.workers)
+    logger.info("Extraction : %.1f s", time.perf_counter() - start)
+    train, validation = split_validation(features, options.validation)
+
+    results = fit_languages(train, workers=options.workers, n_components=options.components, epochs=options.epochs,
+                            batch_size=options.batch_size, init_frames=options.init_frames)
+    os.makedirs(options.output, exist_ok=True)
+    report = {'corpus': os.path.abspath(options.corpus), 'components': options.components, 'languages': {}}
+    for language, (model, language_report) in sorted(results.items()):
+        save_model(model, options.output, language)
+        report['languages'][language] = language_report
+
+    if validation:
+        models = {language: model for language, (model, _) in results.items()}
+        for language, (correct, total) in sorted(evaluate(models, validation).items()):
+            logger.info("Validation %s : %d/%d segments reconnus", language, correct, total)
+            report['languages'][language]['validation'] = {'correct': correct, 'segments': total}
+    with open(os.path.join(options.output, REPORT_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info("%d modèles écrits dans %s (%.1f s)", len(results), options.output, time.perf_counter() - start)
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import os
+import sys
+import math
+import json
+import time
+import logging
+import threading
+import itertools
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """Étape d'un tour, bornée par deux instants time.monotonic()"""
+    __slots__ = ('turn', 'name', 'start', 'end', 'thread', 'attributes')
+
+    def __init__(self, turn, name, attributes):
+        self.turn = turn
+        self.name = name
+        self.start = time.monotonic()
+        self.end = None
+        self.thread = threading.get_ident()
+        self.attributes = attributes
+
+    @property
+    def duration(self):
+        """Durée en millisecondes (None tant que l'étape n'est pas terminée)"""
+        if self.end is None:
+            return None
+        return (self.end - self.start) * 1000
+
+class Turn:
+    """Un tour de conversation (voix ou texte) et ses étapes"""
+    __slots__ = ('id', 'kind', 'spans', 'root', 'finished')
+
+    def __init__(self, turn_id, kind):
+        self.id = turn_id
+        self.kind = kind
+        self.spans = []
+        self.root = Span(self, 'turn', {})
+        self.finished = False
+
+class _SpanContext:
+    def __init__(self, tracer, turn, name, attributes):
+        self.tracer = tracer
+        self.turn = turn
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.span = self.tracer.start_span(self.turn, self.name, **self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.tracer.end_span(self.span, error=exc_type.__name__)
+        else:
+            self.tracer.end_span(self.span)
+        return False
+
+class TurnTracer:
+    def __init__(self, path="turn_traces.json", window=500, max_file_size=20 * 1024 * 1024):
+        """
+        Trace chaque tour (capture, reconnaissance, LLM, synthèse) sous forme d'étapes horodatées.
+
+        Les durées des dernières étapes sont gardées en mémoire pour les percentiles ; les tours
+        terminés sont ajoutés au fichier au format Chrome Trace Event (chrome://tracing, Perfetto).
+
+        :param path: Fichier de traces (None pour ne rien écrire)
+        :param window: Nombre de durées gardées par étape pour les percentiles
+        :param max_file_size: Taille au-delà de laquelle le fichier est renommé en .1
+        """
+        self.path = path
+        self.window = window
+        self.max_file_size = max_file_size
+        self.durations = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def begin_turn(self, kind):
+        """Démarre un tour ; kind décrit son origine ('voix', 'texte'...)"""
+        return Turn(next(self._ids), kind)
+
+    def start_span(self, turn, name, **attributes):
+        """Ouvre une étape (sans effet si turn est None) ; à fermer avec end_span, depuis n'importe quel thread"""
+        if turn is None or turn.finished:
+            return None
+        span = Span(turn, name, attributes)
+        with self._lock:
+            turn.spans.append(span)
+        return span
+
+    def end_span(self, span, **attributes):
+        """Ferme une étape (une seule fois) et met à jour ses percentiles"""
+        if span is None or span.end is not None:
+            return
+        span.end = time.monotonic()
+        span.attributes.update(attributes)
+        self._record(span.name, span.duration)
+
+    def span(self, turn, name, **attributes):
+        """Contexte qui couvre une étape : with tracer.span(turn, 'stt'): ..."""
+        return _SpanContext(self, turn, name, attributes)
+
+    def end_turn(self, turn):
+        """Termine le tour et l'exporte ; les étapes restées ouvertes sont abandonnées"""
+        if turn is None:
+            return
+        with self._lock:
+            if turn.finished:
+                return
+            turn.finished = True
+            turn.root.end = time.monotonic()
+            spans = [span for span in turn.spans if span.end is not None]
+        self._record('turn', turn.root.duration)
+        if self.path:
+            self._export(turn, [turn.root] + spans)
+
+    def percentiles(self, stage):
+        """p50 / p95 / p99 (ms) sur les dernières durées de l'étape"""
+        with self._lock:
+            values = sorted(self.durations.get(stage, ()))
+        if not values:
+            return None
+        return {
+            'count': len(values),
+            'p50': self._percentile(values, 50),
+            'p95': self._percentile(values, 95),
+            'p99': self._percentile(values, 99),
+        }
+
+    def summary(self):
+        """Percentiles de toutes les étapes observées"""
+        with self._lock:
+            stages = list(self.durations)
+        return {stage: self.percentiles(stage) for stage in stages}
+
+    @staticmethod
+    def _percentile(sorted_values, percent):
+        # Rang le plus proche
+        rank = math.ceil(percent / 100 * len(sorted_values))
+        return round(sorted_values[max(0, rank - 1)], 3)
+
+    def _record(self, stage, duration):
+        with self._lock:
+            values = self.durations.get(stage)
+            if values is None:
+                values = self.durations[stage] = deque(maxlen=self.window)
+            values.append(duration)
+
+    def _export(self, turn, spans):
+        events = []
+        for span in spans:
+            args = {'turn': turn.id, 'kind': turn.kind}
+            args.update(span.attributes)
+            events.append({
+                'name': span.name,
+                'cat': turn.kind,
+                'ph': 'X',
+                'ts': round(span.start * 1e6, 1),
+                'dur': round((span.end - span.start) * 1e6, 1),
+                'pid': self._pid,
+                'tid': span.thread,
+                'args': args,
+            })
+
+        # Format tableau JSON de Chrome : le ']' final est facultatif, on peut donc ajouter en fin de fichier
+        lines = "".join(json.dumps(event, ensure_ascii=False, default=str) + ",\n" for event in events)
+        with self._lock:
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_file_size:
+                    os.replace(self.path, self.path + ".1")
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    if new_file:
+                        f.write("[\n")
+                    f.write(lines)
+            except OSError as e:
+                logger.error("Erreur lors de l'écriture des traces : %s", e)
+
+def load_trace(path):
+    """Relit un fichier de traces (tableau éventuellement non fermé)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read().strip()
+    if content.endswith(','):
+        content = content[:-1]
+    if not content.endswith(']'):
+        content += "\n]"
+    return json.loads(content)
+
+_shared_tracer = None
+
+def shared_tracer():
+    """Retourne le traceur commun de l'application (créé au premier appel)"""
+    global _shared_tracer
+    if _shared_tracer is None:
+        _shared_tracer = TurnTracer()
+    return _shared_tracer
+
+if __name__ == "__main__":
+    # python turn_tracer.py [turn_traces.json] : percentiles par étape à partir du fichier
+    tracer = TurnTracer(path=None, window=sys.maxsize)
+    for event in load_trace(sys.argv[1] if len(sys.argv) > 1 else "turn_traces.json"):
+        tracer._record(event['name'], event['dur'] / 1000)
+    for stage, stats in sorted(tracer.summary().items()):
+        print(f"{stage:20s} n={stats['count']:<6d} p50={stats['p50']:9.1f} ms  "
+              f"p95={stats['p95']:9.1f} ms  p99={stats['p99']:9.1f} ms")